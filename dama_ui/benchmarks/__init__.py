@@ -0,0 +1,12 @@
+"""
+Performance benchmarks for the Dama UI application.
+
+The benchmarks run against a local stand-in for the Groq chat completions
+endpoint (mock_groq.py), so they need no network access and no API key.
+Run them from the dama_ui directory with:
+
+    python benchmarks/run_benchmarks.py
+
+Results are written as JSON and can be compared with an earlier run via
+--compare.
+"""
@@ -0,0 +1,162 @@
+"""
+Local stand-in for the Groq chat completions endpoint.
+
+Answers POST /openai/v1/chat/completions like the real API, both as a single
+JSON body and as a server-sent event stream, with configurable latency and
+injected 5xx errors and 429 rate limits.
+
+Usage:
+    python benchmarks/mock_groq.py --port 8765 --latency 0.05 --rate-limit-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from aiohttp import web
+
+CHAT_COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+WORDS = ("the quick brown fox jumps over the lazy dog while streaming tokens "
+         "from a mock server that stands in for the real api").split()
+
+class MockGroqServer:
+    """
+    An aiohttp server imitating the Groq chat completions API.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.0, completion_tokens=50,
+                 chunk_delay=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=0.1, seed=None):
+        """
+        :param host: Interface to listen on
+        :param port: Port to listen on; 0 picks a free one
+        :param latency: Seconds before the response (or the first chunk) is sent
+        :param jitter: Up to this many seconds are added to the latency at random
+        :param completion_tokens: Words per response, each reported as one token
+        :param chunk_delay: Seconds between two streamed chunks
+        :param error_rate: Share of requests answered with a 500
+        :param rate_limit_rate: Share of requests answered with a 429
+        :param retry_after: Retry-After value sent with a 429, in seconds
+        :param seed: Optional seed for the random choices, for repeatable runs
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.completion_tokens = completion_tokens
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+        self._runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}{CHAT_COMPLETIONS_PATH}"
+
+    async def start(self):
+        """
+        Start listening.
+
+        :return: The URL of the chat completions endpoint
+        """
+        app = web.Application()
+        app.router.add_post(CHAT_COMPLETIONS_PATH, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request):
+        self.counts["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.counts["rate_limited"] += 1
+            return web.json_response({"error": {"message": "Rate limit reached (mock)"}}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.counts["errors"] += 1
+            return web.json_response({"error": {"message": "Internal server error (mock)"}}, status=500)
+
+        self.counts["ok"] += 1
+        words = [self.random.choice(WORDS) for _ in range(self.completion_tokens)]
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+        if body.get("stream"):
+            return await self.stream(request, body["model"], words, usage)
+
+        return web.json_response({
+            "id": f"chatcmpl-mock-{self.counts['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    async def stream(self, request, model, words, usage):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for position, word in enumerate(words):
+            chunk = {
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if position == 0 else f" {word}"}}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+
+        final = {"object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                 "x_groq": {"usage": usage}}
+        await response.write(f"data: {json.dumps(final)}\n\n".encode('utf-8'))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local mock of the Groq chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    parser.add_argument("--tokens", type=int, default=50, help="completion tokens per response")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After sent with a 429")
+    return parser.parse_args(argv)
+
+async def serve(args):
+    server = MockGroqServer(args.host, args.port, args.latency, args.jitter, args.tokens, args.chunk_delay,
+                            args.error_rate, args.rate_limit_rate, args.retry_after)
+    print(f"Mock Groq API listening on {await server.start()}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
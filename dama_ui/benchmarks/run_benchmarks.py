@@ -0,0 +1,323 @@
+"""
+Benchmarks for the hot paths of the Dama UI application.
+
+Measures request throughput and latency against a local mock of the Groq
+API, token counting, usage tracking, artifact highlighting and cold start
+time. Nothing touches the network or the real usage files: requests go to
+benchmarks/mock_groq.py and usage is recorded in a temporary directory.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --only requests,tokens --compare benchmarks/results/previous.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.mock_groq import MockGroqServer
+from utils.logging_config import setup_logging
+import utils.request_processor as request_processor
+import utils.usage_ledger as usage_ledger
+import utils.usage_tracking as usage_tracking
+
+RESULTS_DIR = os.path.join(project_root, 'benchmarks', 'results')
+BENCHMARKS = ("requests", "streaming", "tokens", "usage", "highlighting", "startup")
+MODEL = "llama-3.1-8b-instant"
+
+def percentiles(samples):
+    """
+    Summarize a list of latencies in seconds as milliseconds.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+def isolate_usage_files(directory):
+    """
+    Point usage tracking and the usage ledger at a scratch directory.
+    """
+    usage_tracking._aggregator = usage_tracking.UsageAggregator(os.path.join(directory, 'usage_stats.json'))
+    usage_ledger._ledger = usage_ledger.UsageLedger(os.path.join(directory, 'usage_ledger.db'), import_json=False)
+
+async def bench_requests(args, stream=False):
+    """
+    Send args.requests requests with args.concurrency in flight through the real request path.
+    """
+    from utils.http_client import HTTPClient
+
+    server = MockGroqServer(latency=args.latency, jitter=args.jitter, completion_tokens=args.tokens,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=1)
+    request_processor.GROQ_API_ENDPOINT = await server.start()
+    client = HTTPClient(pool_size=args.concurrency, per_host_limit=args.concurrency)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, first_chunks, failures = [], [], []
+
+    async def one(index):
+        messages = [{"role": "user", "content": f"Benchmark prompt number {index}"}]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if stream:
+                    first = None
+                    async for _ in request_processor.stream_request("mock-key", MODEL, messages, client=client):
+                        if first is None:
+                            first = time.perf_counter() - started
+                    first_chunks.append(first)
+                else:
+                    await request_processor.process_request("mock-key", MODEL, messages, client=client)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                failures.append(type(e).__name__)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+    finally:
+        await client.close()
+        await server.stop()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": args.requests,
+        "succeeded": len(latencies),
+        "failed": len(failures),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "server": dict(server.counts),
+        "latency": percentiles(latencies),
+    }
+    if stream:
+        result["time_to_first_chunk"] = percentiles([t for t in first_chunks if t is not None])
+    return result
+
+def bench_tokens(args):
+    """
+    Count tokens of short and long texts, the way the request path does.
+    """
+    from utils.token_counter import count_tokens, estimate_tokens_from_messages, get_encoding
+
+    encoding = get_encoding()
+    short_text = "What is the capital of France? Please answer in one sentence."
+    long_text = " ".join([short_text] * 400)
+    result = {"encoding": encoding.name if encoding else "fallback"}
+
+    for name, text, repeat in (("short", short_text, 20000), ("long", long_text, 200)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            tokens = count_tokens(text, MODEL)
+        elapsed = time.perf_counter() - started
+        result[name] = {
+            "calls_per_second": repeat / elapsed,
+            "tokens_per_second": repeat * tokens / elapsed,
+            "us_per_call": elapsed / repeat * 1e6,
+        }
+
+    history = [{"role": "user" if i % 2 else "assistant", "content": f"{short_text} {i}"} for i in range(30)]
+    started = time.perf_counter()
+    for _ in range(1000):
+        estimate_tokens_from_messages(history, MODEL)
+    result["history_30_messages_us"] = (time.perf_counter() - started) / 1000 * 1e6
+    return result
+
+def bench_usage(args):
+    """
+    Cost of update_usage on the request path and of one background flush.
+    """
+    calls = 100000
+    started = time.perf_counter()
+    for i in range(calls):
+        usage_tracking.update_usage(MODEL, i % 500)
+    elapsed = time.perf_counter() - started
+
+    flush_started = time.perf_counter()
+    usage_tracking.flush_usage()
+    return {
+        "calls": calls,
+        "us_per_call": elapsed / calls * 1e6,
+        "flush_ms": (time.perf_counter() - flush_started) * 1000,
+    }
+
+def bench_highlighting(args):
+    """
+    Lex a generated Python artifact and map its tokens to Tk tag ranges.
+    """
+    from ui.artifact_window import collect_tag_ranges, get_lexer, get_tag_table
+
+    function = (
+        "def handler_{n}(request, retries=3):\n"
+        "    \"\"\"Handle request {n}.\"\"\"\n"
+        "    for attempt in range(retries):\n"
+        "        if request.get('id') == {n}:  # match\n"
+        "            return {{'status': 'ok', 'value': {n} * 2.5}}\n"
+        "    raise ValueError(f\"request {{request!r}} failed\")\n\n"
+    )
+    code = "".join(function.format(n=n) for n in range(args.artifact_lines // 7))
+
+    # Guessing loads every lexer module on first use, so it is timed on its own
+    started = time.perf_counter()
+    get_lexer(None, code)
+    guess_ms = (time.perf_counter() - started) * 1000
+    lexer = get_lexer("python", code)
+    tag_table = get_tag_table()
+
+    started = time.perf_counter()
+    tokens = list(lexer.get_tokens(code))
+    lex_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    ranges, _, _ = collect_tag_ranges(iter(tokens), tag_table, [1, 0])
+    map_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "lines": code.count("\n"),
+        "tokens": len(tokens),
+        "lexer": lexer.name,
+        "guess_lexer_ms": guess_ms,
+        "lex_ms": lex_ms,
+        "tag_mapping_ms": map_ms,
+        "tag_ranges": sum(len(indices) // 2 for indices in ranges.values()),
+        "tokens_per_second": len(tokens) / ((lex_ms + map_ms) / 1000),
+    }
+
+def bench_startup(args):
+    """
+    Cold import time of the chat interface, in fresh interpreters.
+    """
+    code = ("import time; started = time.perf_counter(); import ui.chat_interface; "
+            "print(time.perf_counter() - started)")
+    import_times, process_times = [], []
+    for _ in range(args.startup_runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", code], cwd=project_root, capture_output=True,
+                                text=True, check=True).stdout
+        process_times.append(time.perf_counter() - started)
+        import_times.append(float(output.strip().splitlines()[-1]))
+    return {
+        "runs": args.startup_runs,
+        "import_ms": statistics.median(import_times) * 1000,
+        "process_ms": statistics.median(process_times) * 1000,
+    }
+
+def flatten(results, prefix=""):
+    """
+    Flatten nested results into {"a.b.c": number} for comparisons.
+    """
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(baseline_path, results):
+    """
+    Print every numeric result next to its value in an earlier run.
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = flatten(json.load(f)["results"])
+    print(f"\nCompared with {baseline_path}:")
+    for name, value in flatten(results).items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {name:<45} {old:>14.3f} -> {value:>14.3f}  {change}")
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Dama UI hot paths against a local mock API.")
+    parser.add_argument("--only", help=f"comma separated benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier JSON result to compare with")
+    parser.add_argument("--requests", type=int, default=500, help="requests per request benchmark")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--latency", type=float, default=0.02, help="mock server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="random extra mock latency in seconds")
+    parser.add_argument("--tokens", type=int, default=100, help="completion tokens per mock response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock responses that are 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of mock responses that are 429s")
+    parser.add_argument("--artifact-lines", type=int, default=20000, help="lines of the highlighted artifact")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters for the startup benchmark")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        print(f"Error: unknown benchmarks: {', '.join(sorted(unknown))}")
+        sys.exit(2)
+
+    # Per-request log lines would dominate the numbers being measured
+    setup_logging(logging.WARNING)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        isolate_usage_files(scratch)
+        runners = {
+            "requests": lambda: asyncio.run(bench_requests(args)),
+            "streaming": lambda: asyncio.run(bench_requests(args, stream=True)),
+            "tokens": lambda: bench_tokens(args),
+            "usage": lambda: bench_usage(args),
+            "highlighting": lambda: bench_highlighting(args),
+            "startup": lambda: bench_startup(args),
+        }
+        for name in selected:
+            print(f"Running {name}...", flush=True)
+            results[name] = runners[name]()
+        usage_tracking.shutdown_usage()
+        usage_ledger.shutdown_ledger()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Headless bulk mode for the Dama UI application.
+
+Runs every request of a JSONL file through process_request without starting
+the GUI and appends one JSON result per line to an output file. The output
+file doubles as the checkpoint: when the run is restarted, requests that
+already have a successful result are skipped.
+
+Each input line is a JSON object. The prompt is taken from "messages" (a
+full chat history), "prompt", or the "title" and "body" fields; "id" or
+"request_id" identify the request, and "model" and "system" optionally
+override the command line defaults.
+
+Usage:
+    python bulk_ai.py requests.jsonl results.jsonl --model llama-3.1-8b-instant --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from config.api_keys import GROQ_API_KEY
+from config.model_limits import is_model_supported
+from utils.logging_config import setup_logging
+from utils.http_client import HTTPClient
+from utils.rate_limiter import RequestScheduler
+from utils.response_cache import ResponseCache
+from utils.request_processor import process_request
+from utils.usage_tracking import shutdown_usage
+from utils.usage_ledger import get_ledger, shutdown_ledger
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+DEFAULT_SYSTEM_MESSAGE = "You are a helpful AI assistant."
+DEFAULT_CONCURRENCY = 4
+
+# Log a progress line every this many completed requests
+PROGRESS_INTERVAL = 50
+
+logger = logging.getLogger(__name__)
+
+def request_id_for(record, line_number):
+    """
+    Get the identifier of an input record, falling back to its line number.
+    """
+    for field in ("id", "request_id"):
+        if field in record:
+            return str(record[field])
+    return f"line-{line_number}"
+
+def build_messages(record, system_message):
+    """
+    Build the chat messages for an input record.
+
+    :param record: The decoded input line
+    :param system_message: The system message to use when the record has none
+    :return: A list of message dictionaries
+    """
+    if "messages" in record:
+        return record["messages"]
+
+    if "prompt" in record:
+        prompt = record["prompt"]
+    else:
+        prompt = "\n\n".join(str(record[field]) for field in ("title", "body") if record.get(field))
+    if not prompt:
+        raise ValueError("record has no messages, prompt, title or body")
+
+    return [
+        {"role": "system", "content": record.get("system", system_message)},
+        {"role": "user", "content": prompt},
+    ]
+
+def load_completed_ids(output_path):
+    """
+    Read the ids that already have a successful result in the output file.
+
+    A partially written last line, left behind by a crash, is ignored.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(result, dict) and result.get("status") == "ok":
+                completed.add(result["id"])
+    return completed
+
+def iter_requests(input_path):
+    """
+    Yield (line_number, record) for every non-empty line of the input file.
+
+    Lines that are not JSON objects are logged and skipped.
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error("Skipping line %d of %s: %s", line_number, input_path, e)
+                continue
+            if not isinstance(record, dict):
+                logger.warning("Skipping line %d of %s: expected a JSON object, got %s",
+                               line_number, input_path, type(record).__name__)
+                continue
+            yield line_number, record
+
+class ResultWriter:
+    """
+    Appends results to the output file, one flushed JSON line per request.
+    """
+
+    def __init__(self, path):
+        needs_newline = os.path.exists(path) and os.path.getsize(path) > 0 and not self._ends_with_newline(path)
+        self._file = open(path, 'a', encoding='utf-8')
+        if needs_newline:
+            # Terminate a line cut short by a crash so the next result starts cleanly
+            self._file.write("\n")
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def write(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+async def run_bulk(input_path, output_path, model=DEFAULT_MODEL, system_message=DEFAULT_SYSTEM_MESSAGE,
+                   concurrency=DEFAULT_CONCURRENCY, use_cache=False):
+    """
+    Run every request of a JSONL file and append the results to another.
+
+    :param input_path: The JSONL file of requests
+    :param output_path: The JSONL file results are appended to; also used as the checkpoint
+    :param model: The default model for records that do not name one
+    :param system_message: The default system message for records that do not have one
+    :param concurrency: Maximum number of requests in flight
+    :param use_cache: Whether identical requests may be answered from the response cache
+    :return: A dictionary with the number of requests that succeeded, failed and were skipped
+    """
+    completed = load_completed_ids(output_path)
+    if completed:
+        logger.info("Resuming: %d requests already completed in %s", len(completed), output_path)
+
+    client = HTTPClient(pool_size=concurrency, per_host_limit=concurrency)
+    scheduler = RequestScheduler()
+    cache = ResponseCache() if use_cache else None
+    writer = ResultWriter(output_path)
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    tasks = set()
+    started = time.monotonic()
+
+    async def run_one(request_id, request_model, messages):
+        request_start = time.monotonic()
+        try:
+            response = await process_request(GROQ_API_KEY, request_model, messages, client=client,
+                                              scheduler=scheduler, cache=cache, use_cache=use_cache)
+            result = {"id": request_id, "model": request_model, "status": "ok", "response": response}
+        except Exception as e:
+            result = {"id": request_id, "model": request_model, "status": "error", "error": str(e),
+                      "error_type": type(e).__name__}
+        finally:
+            semaphore.release()
+
+        result["latency"] = round(time.monotonic() - request_start, 3)
+        writer.write(result)
+        counts[result["status"]] += 1
+
+        done = counts["ok"] + counts["error"]
+        if done % PROGRESS_INTERVAL == 0:
+            elapsed = time.monotonic() - started
+            logger.info("Bulk progress: %d done (%d failed) in %.1fs", done, counts['error'], elapsed)
+
+    try:
+        for line_number, record in iter_requests(input_path):
+            request_id = request_id_for(record, line_number)
+            if request_id in completed:
+                counts["skipped"] += 1
+                continue
+
+            request_model = record.get("model", model)
+            try:
+                if not is_model_supported(request_model):
+                    raise ValueError(f"Unsupported model: {request_model}")
+                messages = build_messages(record, system_message)
+            except ValueError as e:
+                writer.write({"id": request_id, "model": request_model, "status": "error", "error": str(e)})
+                counts["error"] += 1
+                continue
+
+            # Only `concurrency` requests are created at a time, so memory stays
+            # bounded no matter how large the input file is
+            await semaphore.acquire()
+            task = asyncio.create_task(run_one(request_id, request_model, messages))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+        await client.close()
+
+    logger.info("Bulk run finished in %.1fs: %d succeeded, %d failed, %d skipped",
+                time.monotonic() - started, counts['ok'], counts['error'], counts['skipped'])
+    return counts
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the Groq API without the GUI.")
+    parser.add_argument("input", help="JSONL file of requests")
+    parser.add_argument("output", help="JSONL file to append results to; reused as the resume checkpoint")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"default model (default: {DEFAULT_MODEL})")
+    parser.add_argument("--system", default=DEFAULT_SYSTEM_MESSAGE, help="default system message")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"maximum requests in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--cache", action="store_true", help="answer identical requests from the response cache")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+
+    if not is_model_supported(args.model):
+        print(f"Error: Unsupported model: {args.model}")
+        sys.exit(2)
+    if args.concurrency < 1:
+        print("Error: --concurrency must be at least 1")
+        sys.exit(2)
+
+    # Requests are only queued for the ledger until it is open, so open it before the run
+    try:
+        get_ledger()
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Error opening usage ledger: %s", e)
+    try:
+        counts = asyncio.run(run_bulk(args.input, args.output, args.model, args.system,
+                                      args.concurrency, args.cache))
+    except KeyboardInterrupt:
+        logger.info("Bulk run interrupted; rerun the same command to resume.")
+        sys.exit(130)
+    finally:
+        shutdown_usage()
+        shutdown_ledger()
+
+    sys.exit(1 if counts["error"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 """
 Configuration settings for the Dama UI application.
-This package includes API keys and model limits.
+This package includes API keys, model limits and retention budgets.
 """
 
 from .api_keys import GROQ_API_KEY
-from .model_limits import MODEL_LIMITS
+from .model_limits import MODEL_LIMITS, get_context_window, get_completion_tokens, get_prompt_budget
+from .retention import RETENTION_POLICIES, get_retention_policy
 
-__all__ = ['GROQ_API_KEY', 'MODEL_LIMITS']
\ No newline at end of file
+__all__ = ['GROQ_API_KEY', 'MODEL_LIMITS', 'get_context_window', 'get_completion_tokens', 'get_prompt_budget',
+           'RETENTION_POLICIES', 'get_retention_policy']
\ No newline at end of file
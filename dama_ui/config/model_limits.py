@@ -1,40 +1,63 @@
 """
 Model limits configuration for the Dama UI application.
-This file defines the rate limits and token limits for different AI models.
+This file defines the rate limits, context windows and completion limits
+for different AI models.
 """
 
+# Context window assumed for models missing from MODEL_LIMITS
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Completion tokens requested (and reserved in the context window) per request
+DEFAULT_COMPLETION_TOKENS = 1000
+
 MODEL_LIMITS = {
     "gemma-7b-it": {
         "requests_per_minute": 30,
-        "tokens_per_minute": float('inf')
+        "tokens_per_minute": float('inf'),
+        "context_window": 8192,
+        "max_completion_tokens": 8192
     },
     "gemma2-9b-it": {
         "requests_per_minute": 30,
-        "tokens_per_minute": float('inf')
+        "tokens_per_minute": float('inf'),
+        "context_window": 8192,
+        "max_completion_tokens": 8192
     },
     "llama-3.1-70b-versatile": {
         "requests_per_minute": 100,
-        "tokens_per_minute": 131072
+        "tokens_per_minute": 131072,
+        "context_window": 131072,
+        "max_completion_tokens": 8000
     },
     "llama-3.1-8b-instant": {
         "requests_per_minute": 30,
-        "tokens_per_minute": 131072
+        "tokens_per_minute": 131072,
+        "context_window": 131072,
+        "max_completion_tokens": 8000
     },
     "llama-guard-3-8b": {
         "requests_per_minute": 30,
-        "tokens_per_minute": float('inf')
+        "tokens_per_minute": float('inf'),
+        "context_window": 8192,
+        "max_completion_tokens": 8192
     },
     "llama3-70b-8192": {
         "requests_per_minute": 30,
-        "tokens_per_minute": 6000
+        "tokens_per_minute": 6000,
+        "context_window": 8192,
+        "max_completion_tokens": 8192
     },
     "llama3-8b-8192": {
         "requests_per_minute": 30,
-        "tokens_per_minute": 30000
+        "tokens_per_minute": 30000,
+        "context_window": 8192,
+        "max_completion_tokens": 8192
     },
     "mixtral-8x7b-32768": {
         "requests_per_minute": 30,
-        "tokens_per_minute": 5000
+        "tokens_per_minute": 5000,
+        "context_window": 32768,
+        "max_completion_tokens": 32768
     }
 }
 
@@ -58,4 +81,32 @@ def is_model_supported(model_name):
     """
     return model_name in MODEL_LIMITS
 
+def get_context_window(model_name):
+    """
+    Get the context window of a model, prompt and completion together.
+
+    :param model_name: The name of the model
+    :return: The context window in tokens
+    """
+    return MODEL_LIMITS.get(model_name, {}).get("context_window", DEFAULT_CONTEXT_WINDOW)
+
+def get_completion_tokens(model_name):
+    """
+    Get the number of completion tokens to request from a model.
+
+    :param model_name: The name of the model
+    :return: DEFAULT_COMPLETION_TOKENS, capped at the model's max_completion_tokens
+    """
+    limit = MODEL_LIMITS.get(model_name, {}).get("max_completion_tokens", DEFAULT_COMPLETION_TOKENS)
+    return min(DEFAULT_COMPLETION_TOKENS, limit)
+
+def get_prompt_budget(model_name):
+    """
+    Get the number of tokens a prompt can use while leaving room for the completion.
+
+    :param model_name: The name of the model
+    :return: The context window minus the completion reservation
+    """
+    return get_context_window(model_name) - get_completion_tokens(model_name)
+
 # Add more helper functions as needed
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Retention settings for the Dama UI application.
+This file defines how long logs, artifacts, cached responses, sessions and
+usage records are kept, and how much disk space each of them may use.
+"""
+
+MB = 1024 * 1024
+
+# Hours between two runs of the retention engine
+RETENTION_INTERVAL_HOURS = 24
+
+# Seconds after startup before the first run, so cleanup does not compete with the cold start
+RETENTION_STARTUP_DELAY = 60
+
+# Per target, "max_age_days" deletes anything older and "max_bytes" deletes the
+# oldest entries until the rest fits. None disables that budget. The usage
+# ledger is a single database, so only its age budget applies.
+RETENTION_POLICIES = {
+    "logs": {
+        "max_age_days": 30,
+        "max_bytes": 200 * MB
+    },
+    "artifacts": {
+        "max_age_days": 180,
+        "max_bytes": 1024 * MB
+    },
+    "response_cache": {
+        "max_age_days": 7,
+        "max_bytes": 256 * MB
+    },
+    "sessions": {
+        "max_age_days": 365,
+        "max_bytes": 1024 * MB
+    },
+    "usage": {
+        "max_age_days": 365,
+        "max_bytes": None
+    }
+}
+
+def get_retention_policy(target):
+    """
+    Get the retention budgets of a target.
+
+    :param target: One of the keys of RETENTION_POLICIES
+    :return: A dictionary with max_age_days and max_bytes, both None if the target has no policy
+    """
+    return RETENTION_POLICIES.get(target, {"max_age_days": None, "max_bytes": None})
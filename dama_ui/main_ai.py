@@ -1,19 +1,31 @@
+import time
+
+# Taken before any other import so --profile-startup covers the whole cold start
+_PROCESS_START = time.perf_counter()
+
+import argparse
 import os
 import sys
 import logging
 import datetime
 import json
-import time
 import threading
 
 # Add the project root directory to the Python path
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
+from utils.startup import StartupProfiler
+
+profiler = StartupProfiler(_PROCESS_START)
+
 from ui.chat_interface import ChatGPTStyleInterface
 from config.api_keys import GROQ_API_KEY
 from utils.logging_config import setup_logging
-from utils.network_check import check_internet_connection
+from utils.metrics import get_metrics
+from config.retention import RETENTION_INTERVAL_HOURS, RETENTION_STARTUP_DELAY
+
+profiler.mark("imports")
 
 LAST_CLEAN_FILE = os.path.join(project_root, 'last_clean.json')
 
@@ -24,54 +36,81 @@ def load_last_clean_date():
             return datetime.datetime.fromisoformat(data['last_clean'])
     return None
 
-def save_last_clean_date():
+def save_last_clean_date(report=None):
+    data = {'last_clean': datetime.datetime.now().isoformat()}
+    if report is not None:
+        data['report'] = report.as_dict()
     with open(LAST_CLEAN_FILE, 'w') as f:
-        json.dump({'last_clean': datetime.datetime.now().isoformat()}, f)
+        json.dump(data, f, indent=2)
 
 def clean_data():
+    from utils.retention import run_retention
+
     logger = logging.getLogger(__name__)
     last_clean = load_last_clean_date()
     now = datetime.datetime.now()
 
-    if last_clean is None or (now - last_clean).days >= 7:
-        logger.info("Running weekly data cleanup...")
-        # Add your cleaning logic here
-        # For example:
-        # - Delete old log files
-        # - Clear temporary data
-        # - Remove cached files older than a certain date
-        logger.info("Weekly data cleanup completed.")
-        save_last_clean_date()
+    if last_clean is None or now - last_clean >= datetime.timedelta(hours=RETENTION_INTERVAL_HOURS):
+        logger.info("Running data cleanup...")
+        report = run_retention()
+        save_last_clean_date(report)
     else:
-        logger.info("Skipping cleanup, last cleanup was less than a week ago.")
+        logger.info("Skipping cleanup, last cleanup was less than %d hours ago.", RETENTION_INTERVAL_HOURS)
+
+def report_startup(warmup):
+    warmup.join()
+    print(profiler.report())
 
 def check_and_clean():
+    # Let the window come up before cleanup competes with it for the disk
+    time.sleep(RETENTION_STARTUP_DELAY)
     while True:
         clean_data()
-        time.sleep(86400)  # Sleep for 24 hours
+        time.sleep(RETENTION_INTERVAL_HOURS * 3600)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dama UI chat client for the Groq API.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase took once warm-up has finished")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="periodically write request metrics to PATH (JSON for .json files, "
+                             "Prometheus text format otherwise)")
+    return parser.parse_args(argv)
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     setup_logging()
     logger = logging.getLogger(__name__)
+    profiler.mark("logging")
 
     # Start the cleaning check thread
     cleaning_thread = threading.Thread(target=check_and_clean)
     cleaning_thread.daemon = True
     cleaning_thread.start()
+    profiler.mark("cleanup thread")
 
-    # Check for internet connection
-    if not check_internet_connection():
-        logger.error("No internet connection available. Exiting the program.")
-        print("Error: No internet connection available. Please check your connection and try again.")
-        sys.exit(1)
+    if args.metrics_file:
+        get_metrics().start_export(args.metrics_file)
 
     try:
         app = ChatGPTStyleInterface(GROQ_API_KEY)
+        profiler.mark("window created")
+
+        def on_shown():
+            # The API is probed from the event loop once warm-up starts,
+            # instead of blocking before the window is created
+            profiler.mark("window shown")
+            warmup = app.warm_up(profiler)
+            if args.profile_startup:
+                threading.Thread(target=report_startup, args=(warmup,), daemon=True).start()
+
+        app.after_idle(on_shown)
         app.mainloop()
     except Exception as e:
         logger.error(f"An error occurred while starting the application: {str(e)}")
         print(f"An error occurred: {str(e)}")
     finally:
+        get_metrics().stop_export()
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+import random
+import unittest
+from utils.artifacts import ArtifactParser, parse_artifacts
+
+# Pieces random responses are built from: fences, tags and the text around them
+PIECES = ["```", "````", "~~~", "    ```", "`", "~", "\n", " ", "\t", "x", "py", "<", ">",
+          "<html>", "</html>", "<code>", "</code>", "<text>", "</text>", "<htm", "l>",
+          "```python\n", "\n```\n"]
+
+def parse_chunked(text, size):
+    parser = ArtifactParser()
+    found = []
+    for position in range(0, len(text), size):
+        found.extend(parser.feed(text[position:position + size]))
+    found.extend(parser.close())
+    return [(artifact.content, artifact.content_type, artifact.language) for artifact in found]
+
+def parse_whole(text):
+    return [(artifact.content, artifact.content_type, artifact.language) for artifact in parse_artifacts(text)]
+
+class ArtifactParserTest(unittest.TestCase):
+    def assert_chunking_agrees(self, text):
+        expected = parse_whole(text)
+        for size in (1, 2, 3, 5, 7, 64):
+            self.assertEqual(parse_chunked(text, size), expected, f"chunks of {size} in {text!r}")
+
+    def test_blocks(self):
+        text = ("Here is a script:\n```python\nprint('hello')\n```\n"
+                "and a page: <html><p>Hi</p></html>\n~~~\nplain fenced block\n~~~")
+        self.assertEqual(parse_whole(text), [("print('hello')", "code", "python"),
+                                             ("<p>Hi</p>", "html", "html"),
+                                             ("plain fenced block", "code", None)])
+        self.assert_chunking_agrees(text)
+
+    def test_fence_must_start_a_line(self):
+        for text in (">```thon\nx\n```", "Run >```python\nprint(1)\n```\n"):
+            self.assertEqual(parse_whole(text), [])
+            self.assert_chunking_agrees(text)
+
+    def test_tag_in_fence_info_string(self):
+        for text in ("~~~<html>x\n</html>", "~~~<html>x</html>"):
+            self.assert_chunking_agrees(text)
+
+    def test_closing_fence_with_trailing_spaces(self):
+        self.assert_chunking_agrees("```python\n``` \npy<text>\n```\n")
+
+    def test_random_responses(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            self.assert_chunking_agrees("".join(rng.choice(PIECES) for _ in range(rng.randint(1, 25))))
+
+if __name__ == "__main__":
+    unittest.main()
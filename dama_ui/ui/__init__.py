@@ -8,10 +8,18 @@ user interactions in the Dama UI application.
 
 from .chat_interface import ChatGPTStyleInterface
 from .artifact_window import ArtifactWindow
+from .ui_dispatcher import UIDispatcher
+from .metrics_panel import MetricsPanel
+from .artifact_browser import ArtifactBrowser
+from .search_window import SearchWindow
 
 __all__ = [
     'ChatGPTStyleInterface',
     'ArtifactWindow',
+    'UIDispatcher',
+    'MetricsPanel',
+    'ArtifactBrowser',
+    'SearchWindow',
 ]
 
 # You can add any package-level initialization code here if needed.
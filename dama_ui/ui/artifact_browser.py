@@ -0,0 +1,73 @@
+import tkinter as tk
+from tkinter import ttk
+from datetime import datetime
+from utils.artifact_store import get_artifact_store
+
+# Artifacts listed at most, newest first
+BROWSER_LIMIT = 500
+
+def format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class ArtifactBrowser(tk.Toplevel):
+    """
+    Lists the stored artifacts from the artifact index and reopens them.
+
+    Only the index is queried to fill the list; an artifact's content is read
+    from disk when it is opened.
+    """
+
+    def __init__(self, parent, on_open, session_id=None):
+        """
+        :param parent: The chat interface window
+        :param on_open: Called with the ArtifactHandle of an artifact to open
+        :param session_id: Optional. Show only this session's artifacts at first.
+        """
+        super().__init__(parent)
+        self.title("Artifacts")
+        self.geometry("640x400")
+        self.on_open = on_open
+        self.session_id = session_id
+        self.handles = {}
+
+        frame = ttk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.session_only_var = tk.BooleanVar(value=session_id is not None)
+        session_check = ttk.Checkbutton(frame, text="This session only", variable=self.session_only_var,
+                                        command=self.refresh)
+        session_check.pack(anchor=tk.W, pady=(0, 5))
+
+        columns = (("time", "Created", 140), ("title", "Title", 200), ("type", "Type", 60),
+                   ("size", "Size", 80))
+        self.table = ttk.Treeview(frame, columns=[name for name, _, _ in columns], show="headings")
+        for name, heading, width in columns:
+            self.table.heading(name, text=heading)
+            self.table.column(name, width=width, anchor=tk.E if name == "size" else tk.W)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table.pack(fill=tk.BOTH, expand=True)
+        self.table.bind("<Double-1>", self.open_selected)
+        self.table.bind("<Return>", self.open_selected)
+
+        self.refresh()
+
+    def refresh(self):
+        session_id = self.session_id if self.session_only_var.get() else None
+        handles = get_artifact_store().list(session_id=session_id, limit=BROWSER_LIMIT)
+        self.table.delete(*self.table.get_children())
+        self.handles = {}
+        for handle in handles:
+            iid = str(handle.id)
+            self.handles[iid] = handle
+            created = datetime.fromtimestamp(handle.ts).strftime('%Y-%m-%d %H:%M:%S')
+            self.table.insert("", tk.END, iid=iid, values=(created, handle.title, handle.content_type,
+                                                           format_size(handle.size)))
+
+    def open_selected(self, event=None):
+        for iid in self.table.selection():
+            self.on_open(self.handles[iid])
@@ -2,31 +2,250 @@ import tkinter as tk
 from tkinter import ttk
 from ttkthemes import ThemedTk
 import tkinter.font as tkfont
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name
-from pygments.formatters import BBCodeFormatter
+import time
+
+CODE_FONT = ("Consolas", 10)
+HIGHLIGHT_STYLE = "monokai"
+
+# Characters of an artifact inspected when guessing its language
+LEXER_GUESS_SAMPLE = 10000
+
+# Lines inserted per after() callback while loading an artifact
+LOAD_CHUNK_LINES = 2000
+LOAD_INTERVAL_MS = 1
+
+# Milliseconds of lexing per highlighting pass, and how many tokens are
+# processed between two checks of the clock
+HIGHLIGHT_SLICE_MS = 15
+HIGHLIGHT_CHECK_EVERY = 200
+
+# Lines lexed together when highlighting the visible region ahead of the full
+# pass; LOAD_CHUNK_LINES is a multiple, so a loaded block is always complete
+VIEW_BLOCK_LINES = 100
+
+# Line number gutter
+GUTTER_REDRAW_DELAY_MS = 16
+GUTTER_DIGIT_WIDTH = 8
+
+# Default language for artifact types that are not plain code
+CONTENT_TYPE_LANGUAGES = {"html": "html"}
+
+def get_lexer(language=None, content=""):
+    """
+    Get a Pygments lexer for an artifact.
+
+    :param language: Optional language name or alias, e.g. "python" or "js"
+    :param content: The artifact's text, used to guess the language if needed
+    :return: A lexer instance; plain text if nothing matches
+    """
+    from pygments.lexers import get_lexer_by_name, guess_lexer
+    from pygments.lexers.special import TextLexer
+    from pygments.util import ClassNotFound
+
+    options = {"stripnl": False, "ensurenl": False}
+    if language:
+        try:
+            return get_lexer_by_name(language, **options)
+        except ClassNotFound:
+            pass
+    try:
+        return guess_lexer(content[:LEXER_GUESS_SAMPLE], **options)
+    except ClassNotFound:
+        return TextLexer(**options)
+
+class TokenTagTable:
+    """
+    Maps Pygments token types to Tk text tags for one style.
+
+    Token types that render identically share a tag, so a Text widget only
+    has one tag per distinct color/font combination in the style.
+    """
+
+    def __init__(self, style_name=HIGHLIGHT_STYLE, font=CODE_FONT):
+        from pygments.styles import get_style_by_name
+
+        self.style = get_style_by_name(style_name)
+        self.font = font
+        self.tag_options = {}
+        self._tags = {}
+
+        signatures = {}
+        for ttype, token_style in self.style:
+            signature = (token_style['color'], token_style['bgcolor'], token_style['bold'],
+                         token_style['italic'], token_style['underline'])
+            if signature == (None, None, False, False, False):
+                self._tags[ttype] = None
+                continue
+            if signature not in signatures:
+                tag = f"pyg_{len(signatures)}"
+                signatures[signature] = tag
+                self.tag_options[tag] = self._options_for(*signature)
+            self._tags[ttype] = signatures[signature]
+
+    def _options_for(self, color, bgcolor, bold, italic, underline):
+        options = {}
+        if color:
+            options["foreground"] = f"#{color}"
+        if bgcolor:
+            options["background"] = f"#{bgcolor}"
+        if bold or italic:
+            weight = " bold" if bold else ""
+            slant = " italic" if italic else ""
+            options["font"] = f"{{{self.font[0]}}} {self.font[1]}{weight}{slant}"
+        if underline:
+            options["underline"] = True
+        return options
+
+    def tag_for(self, ttype):
+        """
+        Get the tag for a token type, or None if it uses the default look.
+        """
+        try:
+            return self._tags[ttype]
+        except KeyError:
+            parent = ttype.parent
+            tag = self.tag_for(parent) if parent is not None else None
+            self._tags[ttype] = tag
+            return tag
+
+    def configure(self, text_widget):
+        """
+        Create the tags on a Text widget and apply the style's colors to it.
+        """
+        from pygments.token import Token
+
+        text_widget.configure(background=self.style.background_color,
+                              insertbackground=self.style.highlight_color)
+        default_color = self.style.style_for_token(Token)['color']
+        if default_color:
+            text_widget.configure(foreground=f"#{default_color}")
+        for tag, options in self.tag_options.items():
+            text_widget.tag_configure(tag, **options)
+
+_tag_tables = {}
+
+def get_tag_table(style_name=HIGHLIGHT_STYLE):
+    """
+    Get the shared tag table for a style, building it on first use.
+    """
+    table = _tag_tables.get(style_name)
+    if table is None:
+        table = _tag_tables[style_name] = TokenTagTable(style_name)
+    return table
+
+def warm_up_highlighter():
+    """
+    Import Pygments and build the default tag table ahead of the first artifact.
+
+    Guessing a lexer loads every lexer module, which is the slow part of
+    opening the first artifact, so this runs one guess on a small sample.
+    Safe to call from a background thread.
+    """
+    get_tag_table()
+    get_lexer(None, "def warm_up():\n    return None\n")
+
+def collect_tag_ranges(tokens, tag_table, position, deadline=None):
+    """
+    Convert Pygments tokens into Tk text index ranges, grouped by tag.
+
+    :param tokens: An iterator of (token type, value) pairs; consumed up to the deadline
+    :param tag_table: The TokenTagTable to map token types with
+    :param position: [line, column] of the first token's start
+    :param deadline: Optional time.monotonic() value after which to stop early
+    :return: A tuple (ranges, [line, column] reached, whether the tokens were exhausted),
+             where ranges maps each tag to a flat list of start and end indices
+    """
+    ranges = {}
+    line, column = position
+    count = 0
+
+    for ttype, value in tokens:
+        start = f"{line}.{column}"
+        newlines = value.count("\n")
+        if newlines:
+            line += newlines
+            column = len(value) - value.rfind("\n") - 1
+        else:
+            column += len(value)
+
+        tag = tag_table.tag_for(ttype)
+        if tag is not None:
+            ranges.setdefault(tag, []).extend((start, f"{line}.{column}"))
+
+        count += 1
+        if deadline is not None and count % HIGHLIGHT_CHECK_EVERY == 0 and time.monotonic() >= deadline:
+            return ranges, [line, column], False
+
+    return ranges, [line, column], True
 
 class LineNumbers(tk.Canvas):
+    """
+    Line number gutter that only draws the lines currently in view.
+
+    Redraws are debounced to one per frame and reuse the canvas text items
+    from the previous redraw instead of deleting and recreating them.
+    """
+
     def __init__(self, *args, **kwargs):
         tk.Canvas.__init__(self, *args, **kwargs)
         self.textwidget = None
+        self._items = []
+        self._redraw_job = None
+        self.bind("<Destroy>", self._cancel_redraw)
 
     def attach(self, text_widget):
         self.textwidget = text_widget
 
+    def schedule_redraw(self, *args):
+        if self._redraw_job is None:
+            self._redraw_job = self.after(GUTTER_REDRAW_DELAY_MS, self.redraw)
+
+    def _cancel_redraw(self, event=None):
+        if self._redraw_job is not None:
+            self.after_cancel(self._redraw_job)
+            self._redraw_job = None
+
     def redraw(self, *args):
-        self.delete("all")
+        self._redraw_job = None
+        if self.textwidget is None:
+            return
 
+        used = 0
         i = self.textwidget.index("@0,0")
         while True:
             dline = self.textwidget.dlineinfo(i)
-            if dline is None: break
+            if dline is None:
+                break
             y = dline[1]
-            linenum = str(i).split(".")[0]
-            self.create_text(2, y, anchor="nw", text=linenum, fill="#606366")
+            linenum = i.split(".")[0]
+            if used < len(self._items):
+                item = self._items[used]
+                self.coords(item, 2, y)
+                self.itemconfigure(item, text=linenum, state=tk.NORMAL)
+            else:
+                self._items.append(self.create_text(2, y, anchor="nw", text=linenum, fill="#606366"))
+            used += 1
             i = self.textwidget.index(f"{i}+1line")
 
+        for item in self._items[used:]:
+            self.itemconfigure(item, state=tk.HIDDEN)
+
+        # Widen the gutter when the file has more digits than fit
+        digits = len(self.textwidget.index("end-1c").split(".")[0])
+        width = max(30, digits * GUTTER_DIGIT_WIDTH + 8)
+        if int(self.cget("width")) != width:
+            self.configure(width=width)
+
 class CodeArtifactDisplay(ttk.Frame):
+    """
+    Text view for an artifact with a line number gutter.
+
+    Content is inserted in chunks scheduled with after(), so the window is
+    shown and scrollable right away. Syntax highlighting is applied to the
+    lines in view first, again whenever the view scrolls, while a full pass
+    in time-sliced steps from the top of the file fills in the rest.
+    """
+
     def __init__(self, parent, *args, **kwargs):
         ttk.Frame.__init__(self, parent, *args, **kwargs)
         self.grid_columnconfigure(1, weight=1)
@@ -35,69 +254,147 @@ class CodeArtifactDisplay(ttk.Frame):
         self.line_numbers = LineNumbers(self, width=30)
         self.line_numbers.grid(row=0, column=0, sticky="nsew")
 
-        self.code_display = tk.Text(self, wrap=tk.NONE, font=("Consolas", 10))
+        self.code_display = tk.Text(self, wrap=tk.NONE, font=CODE_FONT)
         self.code_display.grid(row=0, column=1, sticky="nsew")
 
-        self.code_display.bind("<KeyRelease>", self.on_key_release)
-        self.code_display.bind("<ButtonRelease>", self.on_key_release)
-
         self.line_numbers.attach(self.code_display)
 
         scrollbar_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.code_display.yview)
         scrollbar_y.grid(row=0, column=2, sticky="ns")
-        self.code_display.configure(yscrollcommand=scrollbar_y.set)
+        self.scrollbar_y = scrollbar_y
+        self.code_display.configure(yscrollcommand=self.on_yscroll)
 
         scrollbar_x = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.code_display.xview)
         scrollbar_x.grid(row=1, column=1, sticky="ew")
         self.code_display.configure(xscrollcommand=scrollbar_x.set)
 
-    def on_key_release(self, event):
-        self.line_numbers.redraw()
+        self.code_display.bind("<<Modified>>", self.on_modified)
+        self.code_display.bind("<Configure>", self.line_numbers.schedule_redraw)
+        self.bind("<Destroy>", self.cancel_pending_work)
+
+        self._load_job = None
+        self._highlight_job = None
+        self._view_job = None
+        self._lexer = None
+        # Line the full pass has reached; the lines before it are highlighted
+        self._highlighted_line = 0
+        self._view_blocks = set()
+
+    def on_yscroll(self, first, last):
+        self.scrollbar_y.set(first, last)
+        self.line_numbers.schedule_redraw()
+        self.schedule_view_highlighting()
+
+    def on_modified(self, event):
+        self.line_numbers.schedule_redraw()
+        # <<Modified>> only fires again once the flag has been reset
+        self.code_display.edit_modified(False)
 
-    def set_content(self, content, content_type):
+    def cancel_pending_work(self, event=None):
+        for job in (self._load_job, self._highlight_job, self._view_job):
+            if job is not None:
+                self.after_cancel(job)
+        self._load_job = None
+        self._highlight_job = None
+        self._view_job = None
+
+    def set_content(self, content, content_type, language=None):
+        self.cancel_pending_work()
         self.code_display.delete(1.0, tk.END)
-        if content_type == "code":
-            self.apply_syntax_highlighting(content)
+        self._highlighted_line = 0
+        self._view_blocks.clear()
+
+        lexer = None
+        if content_type in ("code", "html"):
+            tag_table = get_tag_table()
+            tag_table.configure(self.code_display)
+            lexer = get_lexer(language or CONTENT_TYPE_LANGUAGES.get(content_type), content)
+        self._lexer = lexer
+
+        # Pygments normalizes line endings, so the text widget must hold the same characters
+        content = content.replace("\r\n", "\n")
+        lines = content.splitlines(keepends=True)
+        chunks = ["".join(lines[i:i + LOAD_CHUNK_LINES]) for i in range(0, len(lines), LOAD_CHUNK_LINES)]
+        self._load_chunks(chunks, 0, lexer, content)
+
+    def _load_chunks(self, chunks, index, lexer, content):
+        """
+        Insert one chunk of content, then schedule the next one.
+        """
+        self._load_job = None
+        if index < len(chunks):
+            self.code_display.insert(tk.END, chunks[index])
+            self.schedule_view_highlighting()
+            self._load_job = self.after(LOAD_INTERVAL_MS, self._load_chunks, chunks, index + 1, lexer, content)
+        elif lexer is not None:
+            self.apply_syntax_highlighting(content, lexer)
+
+    def schedule_view_highlighting(self):
+        """
+        Highlight the lines in view once Tk is idle, unless the full pass already has.
+        """
+        if self._lexer is not None and self._view_job is None:
+            self._view_job = self.after_idle(self._highlight_view)
+
+    def _highlight_view(self):
+        """
+        Highlight the blocks of lines in view that neither the full pass nor an earlier view pass has reached.
+
+        Each block is lexed on its own, so a construct spanning blocks, such
+        as a long string, may look wrong until the full pass retags it.
+        """
+        self._view_job = None
+        first = int(self.code_display.index("@0,0").split(".")[0])
+        last = int(self.code_display.index(f"@0,{self.code_display.winfo_height()}").split(".")[0])
+        loaded = int(self.code_display.index("end-1c").split(".")[0])
+        tag_table = get_tag_table()
+
+        for block in range((first - 1) // VIEW_BLOCK_LINES, (min(last, loaded) - 1) // VIEW_BLOCK_LINES + 1):
+            start = block * VIEW_BLOCK_LINES + 1
+            if block in self._view_blocks or start + VIEW_BLOCK_LINES <= self._highlighted_line:
+                continue
+            self._view_blocks.add(block)
+            # Lines the full pass has finished are left alone, as they are tagged correctly
+            start, end = max(start, self._highlighted_line + 1), start + VIEW_BLOCK_LINES
+            code = self.code_display.get(f"{start}.0", f"{end}.0")
+            ranges, _, _ = collect_tag_ranges(self._lexer.get_tokens(code), tag_table, [start, 0])
+            for tag, indices in ranges.items():
+                self.code_display.tag_add(tag, *indices)
+
+    def apply_syntax_highlighting(self, code, lexer):
+        """
+        Tag already inserted code with one Tk tag per Pygments token style.
+
+        The token stream is consumed in slices of about HIGHLIGHT_SLICE_MS,
+        and each slice adds all of its ranges with one tag_add call per tag,
+        replacing whatever the view passes tagged there.
+        """
+        tag_table = get_tag_table()
+        tokens = lexer.get_tokens(code)
+        self._highlight_slice(tokens, tag_table, [1, 0])
+
+    def _highlight_slice(self, tokens, tag_table, position):
+        self._highlight_job = None
+        deadline = time.monotonic() + HIGHLIGHT_SLICE_MS / 1000
+        start = f"{position[0]}.{position[1]}"
+        ranges, position, finished = collect_tag_ranges(tokens, tag_table, position, deadline)
+        end = f"{position[0]}.{position[1]}"
+
+        if any(block * VIEW_BLOCK_LINES < position[0] for block in self._view_blocks):
+            for tag in tag_table.tag_options:
+                self.code_display.tag_remove(tag, start, end)
+        for tag, indices in ranges.items():
+            self.code_display.tag_add(tag, *indices)
+        self._highlighted_line = position[0]
+
+        if not finished:
+            self._highlight_job = self.after(1, self._highlight_slice, tokens, tag_table, position)
         else:
-            self.code_display.insert(tk.END, content)
-        self.line_numbers.redraw()
-
-    def apply_syntax_highlighting(self, code):
-        lexer = get_lexer_by_name("python", stripall=True)
-        formatter = BBCodeFormatter(style='monokai')
-        highlighted_code = highlight(code, lexer, formatter)
-
-        self.code_display.tag_configure("bold", font=("Consolas", 10, "bold"))
-        self.code_display.tag_configure("italic", font=("Consolas", 10, "italic"))
-        self.code_display.tag_configure("keyword", foreground="#66D9EF")
-        self.code_display.tag_configure("string", foreground="#E6DB74")
-        self.code_display.tag_configure("comment", foreground="#75715E")
-        self.code_display.tag_configure("function", foreground="#A6E22E")
-
-        for line in highlighted_code.split('\n'):
-            for segment in line.split('['):
-                if ']' in segment:
-                    style, text = segment.split(']', 1)
-                    if 'b' in style:
-                        self.code_display.insert(tk.END, text, "bold")
-                    elif 'i' in style:
-                        self.code_display.insert(tk.END, text, "italic")
-                    elif 'color="#66D9EF"' in style:
-                        self.code_display.insert(tk.END, text, "keyword")
-                    elif 'color="#E6DB74"' in style:
-                        self.code_display.insert(tk.END, text, "string")
-                    elif 'color="#75715E"' in style:
-                        self.code_display.insert(tk.END, text, "comment")
-                    elif 'color="#A6E22E"' in style:
-                        self.code_display.insert(tk.END, text, "function")
-                    else:
-                        self.code_display.insert(tk.END, text)
-                else:
-                    self.code_display.insert(tk.END, segment)
-            self.code_display.insert(tk.END, '\n')
+            self._lexer = None  # Nothing is left for the view passes
+            self._view_blocks.clear()
 
 class ArtifactWindow(ThemedTk):
-    def __init__(self, parent, title, content, content_type):
+    def __init__(self, parent, title, content, content_type, language=None):
         super().__init__(theme="equilux")
         self.title(title)
         self.geometry("800x600")
@@ -105,6 +402,7 @@ class ArtifactWindow(ThemedTk):
         self.parent = parent
         self.content = content
         self.content_type = content_type
+        self.language = language
         
         self.create_widgets()
 
@@ -126,7 +424,7 @@ class ArtifactWindow(ThemedTk):
     def create_content_display(self, parent):
         self.code_artifact_display = CodeArtifactDisplay(parent)
         self.code_artifact_display.pack(fill=tk.BOTH, expand=True)
-        self.code_artifact_display.set_content(self.content, self.content_type)
+        self.code_artifact_display.set_content(self.content, self.content_type, self.language)
 
     def create_button_area(self, parent):
         button_frame = ttk.Frame(parent)
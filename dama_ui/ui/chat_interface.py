@@ -2,14 +2,42 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 from ttkthemes import ThemedTk
 import asyncio
+import functools
 import threading
 from collections import deque
-import os
 
-from .artifact_window import ArtifactWindow
-from utils.request_processor import process_request
-from utils.token_counter import count_tokens
-from config.model_limits import MODEL_LIMITS
+from .artifact_window import ArtifactWindow, warm_up_highlighter
+from .ui_dispatcher import UIDispatcher
+from .comparison_window import ComparisonWindow
+from .metrics_panel import MetricsPanel
+from .artifact_browser import ArtifactBrowser
+from .search_window import SearchWindow, SessionViewer
+from utils.request_processor import process_request, stream_request
+from utils.fanout import fan_out
+from utils.hedging import HedgePolicy
+from utils.http_client import HTTPClient
+from utils.rate_limiter import RequestScheduler
+from utils.response_cache import ResponseCache
+from utils.logging_config import get_logger
+from utils.token_counter import get_encoding
+from utils.conversation_history import ConversationHistory
+from utils.artifacts import ArtifactParser, parse_artifacts
+from utils.artifact_store import get_artifact_store, store_artifact, shutdown_artifact_store
+from utils.search_index import get_search_index, index_message, index_artifact, shutdown_search_index
+from utils.usage_tracking import shutdown_usage
+from utils.usage_ledger import get_ledger, shutdown_ledger
+from utils.session_store import SessionTranscript
+from utils.startup import start_warmup
+from utils.health import CircuitBreaker, HealthMonitor, ONLINE, DEGRADED, OFFLINE
+from config.model_limits import MODEL_LIMITS, get_prompt_budget
+
+logger = get_logger(__name__)
+
+# Bounds of the on-screen transcript; messages are paged out to the session
+# file and loaded back HISTORY_PAGE_SIZE at a time when scrolling up or back down
+MAX_DISPLAYED_MESSAGES = 200
+MAX_DISPLAYED_CHARS = 256 * 1024
+HISTORY_PAGE_SIZE = 50
 
 class ChatGPTStyleInterface(ThemedTk):
     def __init__(self, api_key):
@@ -18,17 +46,56 @@ class ChatGPTStyleInterface(ThemedTk):
         self.geometry("1280x720")
 
         self.api_key = api_key
-        self.conversation_history = deque(maxlen=30)
-        self.total_tokens = 0
-        self.max_tokens = 4000
+        # Trimmed to each request's model budget when the request is built
+        self.conversation_history = ConversationHistory()
+        # Open artifact windows by content hash; contents live in the artifact store
         self.artifacts = {}
 
+        # On-screen messages in display order, as [mark, transcript index, length].
+        # The last session is resumed from its journal
+        self.transcript = SessionTranscript.latest() or SessionTranscript()
+        self.displayed_messages = deque()
+        self.displayed_chars = 0
+        self._display_seq = 0
+        self._older_load_pending = False
+        self._newer_load_pending = False
+        # False once paging back has trimmed the newest messages off the display
+        self._showing_latest = True
+        # Requests get their own placeholder and stream marks, so several can be in flight
+        self._request_seq = 0
+        # Messages being streamed, by request, as [mark, transcript index, length]
+        self.streaming_messages = {}
+
         self.create_widgets()
 
+        # Every UI update requested from the event loop thread goes through here
+        self.dispatcher = UIDispatcher(self)
+        self.dispatcher.start()
+        self.metrics_panel.dispatcher = self.dispatcher
+        self.metrics_panel.start()
+
         self.loop = asyncio.new_event_loop()
         self.loop_thread = threading.Thread(target=self._run_event_loop, daemon=True)
         self.loop_thread.start()
 
+        # Pooled HTTP client shared by every request made on self.loop
+        self.http_client = HTTPClient()
+        # Client-side enforcement of MODEL_LIMITS for requests made on self.loop
+        self.scheduler = RequestScheduler()
+        self.response_cache = ResponseCache()
+        # Latencies of recent requests; slow ones get a hedged copy when enabled
+        self.hedge_policy = HedgePolicy(enabled=False)
+        # Requests are held while the API is unreachable, instead of each timing out
+        self.breaker = CircuitBreaker()
+        self.health_monitor = HealthMonitor(self.http_client, self.breaker, on_change=self.report_api_health)
+        # Futures of the requests in flight, cancelled by the Stop button
+        self.active_requests = set()
+
+        if len(self.transcript):
+            self.resume_session()
+
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
     def create_widgets(self):
         main_frame = ttk.Frame(self)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -47,6 +114,7 @@ class ChatGPTStyleInterface(ThemedTk):
         self.chat_display = scrolledtext.ScrolledText(parent, wrap=tk.WORD, height=30)
         self.chat_display.pack(fill=tk.BOTH, expand=True, padx=(0, 10))
         self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.configure(yscrollcommand=self.on_chat_scroll)
 
     def create_input_area(self, parent):
         input_frame = ttk.Frame(parent)
@@ -56,6 +124,9 @@ class ChatGPTStyleInterface(ThemedTk):
         self.user_input.pack(side=tk.LEFT, fill=tk.X, expand=True)
         self.user_input.bind("<Return>", self.send_message)
 
+        stop_button = ttk.Button(input_frame, text="Stop", command=self.stop_requests)
+        stop_button.pack(side=tk.RIGHT, padx=(10, 0))
+
         send_button = ttk.Button(input_frame, text="Send", command=self.send_message)
         send_button.pack(side=tk.RIGHT, padx=(10, 0))
 
@@ -66,6 +137,31 @@ class ChatGPTStyleInterface(ThemedTk):
         model_menu = ttk.OptionMenu(parent, self.model_var, "gemma-7b-it", *MODEL_LIMITS.keys())
         model_menu.pack(fill=tk.X, pady=(0, 10))
 
+        self.stream_var = tk.BooleanVar(value=True)
+        stream_check = ttk.Checkbutton(parent, text="Stream responses", variable=self.stream_var)
+        stream_check.pack(fill=tk.X, pady=(0, 10))
+
+        self.cache_var = tk.BooleanVar(value=False)
+        cache_check = ttk.Checkbutton(parent, text="Reuse cached responses", variable=self.cache_var)
+        cache_check.pack(fill=tk.X, pady=(0, 10))
+
+        self.hedge_var = tk.BooleanVar(value=False)
+        hedge_check = ttk.Checkbutton(parent, text="Hedge slow requests", variable=self.hedge_var)
+        hedge_check.pack(fill=tk.X, pady=(0, 10))
+
+        self.compare_var = tk.BooleanVar(value=False)
+        compare_check = ttk.Checkbutton(parent, text="Compare models", variable=self.compare_var)
+        compare_check.pack(fill=tk.X, pady=(0, 5))
+
+        self.first_wins_var = tk.BooleanVar(value=False)
+        first_wins_check = ttk.Checkbutton(parent, text="First answer wins", variable=self.first_wins_var)
+        first_wins_check.pack(fill=tk.X, pady=(0, 5))
+
+        self.compare_models = tk.Listbox(parent, selectmode=tk.MULTIPLE, height=6, exportselection=False)
+        for model in MODEL_LIMITS:
+            self.compare_models.insert(tk.END, model)
+        self.compare_models.pack(fill=tk.X, pady=(0, 10))
+
         self.system_message = scrolledtext.ScrolledText(parent, wrap=tk.WORD, height=10, width=30)
         self.system_message.pack(fill=tk.X, pady=(0, 10))
         self.system_message.insert(tk.END, "You are a helpful AI assistant.")
@@ -73,96 +169,659 @@ class ChatGPTStyleInterface(ThemedTk):
         clear_button = ttk.Button(parent, text="Clear Chat", command=self.clear_chat)
         clear_button.pack(fill=tk.X)
 
+        artifacts_button = ttk.Button(parent, text="Artifacts...", command=self.open_artifact_browser)
+        artifacts_button.pack(fill=tk.X, pady=(5, 0))
+
+        search_button = ttk.Button(parent, text="Search...", command=self.open_search)
+        search_button.pack(fill=tk.X, pady=(5, 0))
+
+        self.health_var = tk.StringVar(value="API: checking...")
+        health_label = ttk.Label(parent, textvariable=self.health_var, wraplength=200)
+        health_label.pack(fill=tk.X, pady=(10, 0))
+
+        self.status_var = tk.StringVar(value="")
+        status_label = ttk.Label(parent, textvariable=self.status_var, wraplength=200)
+        status_label.pack(fill=tk.X, pady=(10, 0))
+
+        metrics_label = ttk.Label(parent, text="Request metrics:")
+        metrics_label.pack(fill=tk.X, pady=(10, 5))
+        self.metrics_panel = MetricsPanel(parent)
+        self.metrics_panel.pack(fill=tk.X)
+
     def send_message(self, event=None):
         user_message = self.user_input.get()
         if user_message.strip() == "":
             return
 
-        self.display_message("You", user_message)
+        self.display_message("You", user_message, role="user")
         self.user_input.delete(0, tk.END)
 
-        self.add_to_history({"role": "user", "content": user_message})
-        self.get_ai_response_async(self.model_var.get(), user_message, self.system_message.get("1.0", tk.END).strip())
+        system_message = self.system_message.get("1.0", tk.END).strip()
+        models = [self.compare_models.get(i) for i in self.compare_models.curselection()]
+        if self.compare_var.get() and models:
+            self.compare_models_async(models, user_message, system_message)
+        else:
+            self.get_ai_response_async(self.model_var.get(), system_message)
+
+    def display_message(self, sender, message, role=None):
+        """
+        Show a message and journal it.
+
+        :param sender: Who sent the message, as displayed
+        :param message: The message text
+        :param role: Optional. "user" or "assistant" to also add the message to the conversation history.
+        """
+        # Before the message is journaled, or the last page would include it already
+        self.show_latest_messages()
+        tokens = self.conversation_history.add(role, message) if role else None
+        index = self.transcript.append(sender, message, role, tokens)
+        index_message(self.transcript.session_id, index, sender, message)
+        text = f"{sender}: {message}\n\n"
+        self.chat_display.config(state=tk.NORMAL)
+        mark = self.new_message_mark("end-1c")
+        self.chat_display.insert(tk.END, text)
+        self.chat_display.config(state=tk.DISABLED)
+        self.displayed_messages.append([mark, index, len(text)])
+        self.displayed_chars += len(text)
+        self.trim_chat_display()
+        self.chat_display.see(tk.END)
 
-    def display_message(self, sender, message):
+    def display_placeholder(self, sender, message, mark):
+        """
+        Show a transient line, such as "Thinking...", that is not kept in the transcript.
+
+        :param mark: Name of the marks set around the line, "<mark>" and "<mark>_end",
+                     for remove_placeholder()
+        """
+        self.show_latest_messages()
         self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.mark_set(mark, "end-1c")
+        self.chat_display.mark_gravity(mark, tk.LEFT)
         self.chat_display.insert(tk.END, f"{sender}: {message}\n\n")
+        self.chat_display.mark_set(f"{mark}_end", "end-1c")
+        self.chat_display.mark_gravity(f"{mark}_end", tk.LEFT)
         self.chat_display.config(state=tk.DISABLED)
         self.chat_display.see(tk.END)
 
-    def add_to_history(self, message):
-        self.conversation_history.append(message)
-        self.total_tokens += count_tokens(message["content"])
-        while self.total_tokens > self.max_tokens and len(self.conversation_history) > 1:
-            removed_message = self.conversation_history.popleft()
-            self.total_tokens -= count_tokens(removed_message["content"])
+    def remove_placeholder(self, mark):
+        """
+        Remove a line shown by display_placeholder(), if it is still there.
+        """
+        if mark not in self.chat_display.mark_names():  # Gone if the chat was cleared
+            return
+        self.chat_display.config(state=tk.NORMAL)
+        # Both marks end up together at the top if trimming already removed the line
+        self.chat_display.delete(mark, f"{mark}_end")
+        self.chat_display.mark_unset(mark, f"{mark}_end")
+        self.chat_display.config(state=tk.DISABLED)
+
+    def new_message_mark(self, index):
+        self._display_seq += 1
+        mark = f"msg_{self._display_seq}"
+        self.chat_display.mark_set(mark, index)
+        self.chat_display.mark_gravity(mark, tk.LEFT)
+        return mark
+
+    def trim_chat_display(self, newest=False):
+        """
+        Drop on-screen messages until the display is within its bounds.
+
+        The messages stay in the session transcript and are loaded back when
+        the user scrolls to them. Trimming stops at a message still streaming.
+
+        :param newest: Drop the newest messages instead of the oldest, while paging back.
+                       Nothing is dropped while a request shows a placeholder or streams.
+        """
+        if newest and self.requests_on_screen():
+            return
+        self.chat_display.config(state=tk.NORMAL)
+        while len(self.displayed_messages) > 1 and (
+                len(self.displayed_messages) > MAX_DISPLAYED_MESSAGES
+                or self.displayed_chars > MAX_DISPLAYED_CHARS):
+            if newest:
+                mark, _, length = self.displayed_messages.pop()
+                self.chat_display.delete(mark, tk.END)
+                self._showing_latest = False
+            else:
+                if self.displayed_messages[0][1] is None:
+                    break
+                mark, _, length = self.displayed_messages.popleft()
+                self.chat_display.delete("1.0", self.displayed_messages[0][0])
+            self.chat_display.mark_unset(mark)
+            self.displayed_chars -= length
+        self.chat_display.config(state=tk.DISABLED)
+
+    def requests_on_screen(self):
+        """
+        Whether a placeholder or a streaming message is shown after the messages.
+        """
+        return bool(self.streaming_messages) or any(
+            mark.startswith(("response_", "comparison_")) for mark in self.chat_display.mark_names())
+
+    def first_displayed_index(self):
+        indices = [index for _, index, _ in self.displayed_messages if index is not None]
+        return min(indices) if indices else len(self.transcript)
+
+    def last_displayed_index(self):
+        """
+        Get the transcript index one past the newest message on screen.
+        """
+        indices = [index for _, index, _ in self.displayed_messages if index is not None]
+        return max(indices) + 1 if indices else len(self.transcript)
+
+    def on_chat_scroll(self, first, last):
+        self.chat_display.vbar.set(first, last)
+        if float(first) <= 0.0 and self.first_displayed_index() > 0 and not self._older_load_pending:
+            self._older_load_pending = True
+            self.after_idle(self.load_older_messages)
+        elif float(last) >= 1.0 and not self._showing_latest and not self._newer_load_pending:
+            self._newer_load_pending = True
+            self.after_idle(self.load_newer_messages)
+
+    def load_older_messages(self):
+        """
+        Page the previous HISTORY_PAGE_SIZE messages back in from the session file.
+        """
+        self._older_load_pending = False
+        end = self.first_displayed_index()
+        if end <= 0:
+            return
+        start = max(0, end - HISTORY_PAGE_SIZE)
+        texts = [f"{sender}: {message}\n\n" for sender, message in self.transcript.read(start, end)]
+
+        self.chat_display.config(state=tk.NORMAL)
+        anchor = self.displayed_messages[0][0] if self.displayed_messages else None
+        if anchor:
+            # Let the current first message's mark move past the inserted page
+            self.chat_display.mark_gravity(anchor, tk.RIGHT)
+        self.chat_display.insert("1.0", "".join(texts))
+        if anchor:
+            self.chat_display.mark_gravity(anchor, tk.LEFT)
+
+        offset = sum(len(text) for text in texts)
+        for index, text in zip(range(end - 1, start - 1, -1), reversed(texts)):
+            offset -= len(text)
+            mark = self.new_message_mark(f"1.0 + {offset} chars")
+            self.displayed_messages.appendleft([mark, index, len(text)])
+            self.displayed_chars += len(text)
+        self.chat_display.config(state=tk.DISABLED)
 
-    def get_ai_response_async(self, model, prompt, system_message):
-        self.display_message("AI", "Thinking...")
-        asyncio.run_coroutine_threadsafe(self.get_ai_response(model, prompt, system_message), self.loop)
+        # Keep the message the user was looking at in place
+        if anchor:
+            self.trim_chat_display(newest=True)
+            self.chat_display.yview(anchor)
+
+    def load_newer_messages(self):
+        """
+        Page the next HISTORY_PAGE_SIZE messages back in after paging back trimmed them.
+        """
+        self._newer_load_pending = False
+        if self._showing_latest:
+            return
+        start = self.last_displayed_index()
+        end = min(len(self.transcript), start + HISTORY_PAGE_SIZE)
+        # The line at the top of the view, kept in place while older messages are trimmed
+        self.chat_display.mark_set("view_top", "@0,0")
+        self.chat_display.config(state=tk.NORMAL)
+        for index, (sender, message) in zip(range(start, end), self.transcript.read(start, end)):
+            text = f"{sender}: {message}\n\n"
+            mark = self.new_message_mark("end-1c")
+            self.chat_display.insert(tk.END, text)
+            self.displayed_messages.append([mark, index, len(text)])
+            self.displayed_chars += len(text)
+        self.chat_display.config(state=tk.DISABLED)
+        self._showing_latest = end >= len(self.transcript)
+        self.trim_chat_display()
+        self.chat_display.yview("view_top")
+        self.chat_display.mark_unset("view_top")
+
+    def show_latest_messages(self):
+        """
+        Show the last page of messages again if paging back trimmed them, before anything is added at the end.
+        """
+        if self._showing_latest:
+            return
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.delete("1.0", tk.END)
+        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.mark_unset(*[mark for mark, _, _ in self.displayed_messages])
+        self.displayed_messages.clear()
+        self.displayed_chars = 0
+        self._showing_latest = True
+        self.load_older_messages()
+        self.chat_display.see(tk.END)
+
+    def resume_session(self):
+        """
+        Restore the conversation history and the last page of messages from the session journal.
 
-    async def get_ai_response(self, model, prompt, system_message):
-        messages = [{"role": "system", "content": system_message}] + list(self.conversation_history)
+        Only the tail of the journal is read; older messages are paged in when scrolling up.
+        """
+        for role, content, tokens in self.transcript.history_tail(self.conversation_history.max_tokens):
+            self.conversation_history.add(role, content, tokens)
+        self.load_older_messages()
+        self.chat_display.see(tk.END)
+        logger.info("Resumed session %s with %d messages", self.transcript.session_id, len(self.transcript))
+
+    def get_ai_response_async(self, model, system_message):
+        stream = self.stream_var.get()
+        use_cache = self.cache_var.get()
+        messages, prompt_tokens = self.build_messages(system_message, model)
+        self._request_seq += 1
+        request_id = self._request_seq
+        self.display_placeholder("AI", "Thinking...", f"response_{request_id}")
+        self.hedge_policy.enabled = self.hedge_var.get()
+        self.track_request(asyncio.run_coroutine_threadsafe(
+            self.get_ai_response(request_id, model, messages, prompt_tokens, stream, use_cache), self.loop))
+
+    def track_request(self, future):
+        """
+        Remember a request's future so the Stop button can cancel it.
+        """
+        self.active_requests.add(future)
+        future.add_done_callback(self.active_requests.discard)
+        return future
+
+    def stop_requests(self):
+        """
+        Cancel every request in flight. Partial answers stay on screen.
+        """
+        for future in list(self.active_requests):
+            future.cancel()
+
+    def build_messages(self, system_message, model):
+        """
+        Build the messages for a request from the conversation history.
+
+        Called on the main thread, which is the only thread that changes the history.
+
+        :param system_message: The system prompt
+        :param model: The model the request is for, whose context window limits the history sent
+        :return: (messages, their token count)
+        """
+        return self.conversation_history.messages_for(model, system_message)
+
+    def compare_models_async(self, models, prompt, system_message):
+        """
+        Send the prompt to several models at once and show the answers side by side.
+        """
+        # Every model gets the same messages, sized for the smallest context window
+        messages, prompt_tokens = self.build_messages(system_message, min(models, key=get_prompt_budget))
+        first_wins = self.first_wins_var.get()
+        window = ComparisonWindow(self, prompt, models)
+        placeholder_mark = f"comparison_{id(window)}"
+        self.display_placeholder("AI", f"Comparing {len(models)} models...", placeholder_mark)
+
+        def on_chunk(model, text):
+            self.dispatcher.append((id(window), model), lambda merged: window.append_text(model, merged), text)
+
+        def on_done(run):
+            self.dispatcher.call(window.show_result, run)
+
+        future = self.track_request(asyncio.run_coroutine_threadsafe(
+            self.compare_models(models, messages, prompt_tokens, first_wins, on_chunk, on_done, placeholder_mark),
+            self.loop))
+        # Closing the window cancels whatever is still running
+        window.on_close = future.cancel
+
+    async def compare_models(self, models, messages, prompt_tokens, first_wins, on_chunk, on_done, placeholder_mark):
+        runs = []
+        try:
+            runs = await fan_out(self.api_key, models, messages, client=self.http_client, scheduler=self.scheduler,
+                                 first_wins=first_wins, on_chunk=on_chunk, on_done=on_done, breaker=self.breaker,
+                                 prompt_tokens=prompt_tokens)
+        finally:
+            self.dispatcher.call(self.complete_comparison, runs, placeholder_mark)
+
+    def complete_comparison(self, runs, placeholder_mark):
+        """
+        Continue the conversation with the fastest successful answer of a comparison.
+        """
+        self.remove_placeholder(placeholder_mark)
+
+        succeeded = sorted((run for run in runs if run.status == "ok"), key=lambda run: run.latency)
+        if not runs:
+            self.display_message("AI", "Comparison stopped.")
+            return
+        if not succeeded:
+            self.display_message("AI", "An error occurred: none of the compared models answered.")
+            return
+        best = succeeded[0]
+        self.display_message(f"AI ({best.model})", best.response, role="assistant")
+        self.loop.call_soon_threadsafe(self.extract_artifacts, best.response)
+
+    async def get_ai_response(self, request_id, model, messages, prompt_tokens=None, stream=False, use_cache=False):
+        """
+        Request a response on the event loop thread and hand it to the main thread.
+
+        :param request_id: Identifies the request's placeholder and streamed message on screen
+        :param model: The model to use for the request
+        :param messages: The messages to send, including the system message
+        :param prompt_tokens: Optional. The messages' token count, as counted by the conversation history
+        :param stream: Whether to stream the response into the chat display
+        :param use_cache: Whether a cached response may be used
+        """
+        if stream:
+            response = await self.stream_ai_response(request_id, model, messages, prompt_tokens, use_cache)
+        else:
+            try:
+                response = await process_request(self.api_key, model, messages, client=self.http_client,
+                                                 scheduler=self.scheduler, on_wait=self.report_queue_wait,
+                                                 cache=self.response_cache, use_cache=use_cache,
+                                                 hedge=self.hedge_policy, breaker=self.breaker,
+                                                 prompt_tokens=prompt_tokens)
+            except asyncio.CancelledError:
+                self.dispatcher.call(self.show_response, request_id, "Request stopped.")
+                self.dispatcher.call(self.status_var.set, "")
+                raise
+            except Exception as e:
+                response = f"An error occurred: {str(e)}"
+            else:
+                self.extract_artifacts(response)
+
+            self.dispatcher.call(self.show_response, request_id, response, "assistant")
+
+        self.dispatcher.call(self.complete_response)
+
+    def show_response(self, request_id, response, role=None):
+        self.remove_placeholder(f"response_{request_id}")
+        self.display_message("AI", response, role)
+
+    def complete_response(self):
+        self.status_var.set("")
+
+    async def stream_ai_response(self, request_id, model, messages, prompt_tokens=None, use_cache=False):
+        """
+        Stream a response into the chat display as it arrives.
+
+        :param request_id: Identifies the request's placeholder and streamed message on screen
+        :param model: The model to use for the request
+        :param messages: The messages to send, including the system message
+        :param prompt_tokens: Optional. The messages' token count, as counted by the conversation history
+        :param use_cache: Whether a cached response may be used
+        :return: The complete response text once the stream has ended
+        """
+        parts = []
+        started = False
+        # Artifacts open as soon as their block is complete, while the rest still streams
+        parser = ArtifactParser()
+        # Chunks are merged per request, so concurrent streams never mix
+        append_text = functools.partial(self.append_stream_text, request_id)
+        stream_key = ("stream", request_id)
         try:
-            response = await process_request(self.api_key, model, messages)
+            async for chunk in stream_request(self.api_key, model, messages, client=self.http_client,
+                                              scheduler=self.scheduler, on_wait=self.report_queue_wait,
+                                              cache=self.response_cache, use_cache=use_cache,
+                                              breaker=self.breaker, prompt_tokens=prompt_tokens):
+                if not started:
+                    self.dispatcher.call(self.start_stream_display, request_id)
+                    started = True
+                parts.append(chunk)
+                self.dispatcher.append(stream_key, append_text, chunk)
+                self.publish_artifacts(parser.feed(chunk))
+            self.publish_artifacts(parser.close())
+            response = "".join(parts)
+        except asyncio.CancelledError:
+            if not started:
+                self.dispatcher.call(self.start_stream_display, request_id)
+            stopped = "\n\n[Stopped]" if parts else "[Stopped]"
+            self.dispatcher.append(stream_key, append_text, stopped)
+            self.dispatcher.call(self.finish_stream_display, request_id, "".join(parts) + stopped)
+            self.dispatcher.call(self.status_var.set, "")
+            raise
         except Exception as e:
-            response = f"An error occurred: {str(e)}"
+            error_message = f"An error occurred: {str(e)}"
+            if parts:
+                response = "".join(parts)
+                error_message = f"\n\n{error_message}"
+            else:
+                response = error_message
+            if not started:
+                self.dispatcher.call(self.start_stream_display, request_id)
+                started = True
+            self.dispatcher.append(stream_key, append_text, error_message)
+
+        if not started:  # The stream ended without any content
+            self.dispatcher.call(self.start_stream_display, request_id)
+        self.dispatcher.call(self.finish_stream_display, request_id, response, "assistant")
+        return response
+
+    def report_queue_wait(self, position, wait):
+        """
+        Show the request's place in the rate limit queue. Called from the event loop thread.
+
+        :param position: Number of requests queued ahead of this one
+        :param wait: Expected wait in seconds
+        """
+        if position:
+            status = f"Queued: position {position + 1}, about {wait:.1f}s wait"
+        else:
+            status = f"Rate limited: sending in about {wait:.1f}s"
+        self.dispatcher.call(self.status_var.set, status)
+
+    def report_api_health(self, monitor):
+        """
+        Show whether the API is reachable. Called from the event loop thread.
+
+        :param monitor: The HealthMonitor whose state changed
+        """
+        if monitor.state == ONLINE:
+            status = f"API: online ({monitor.latency * 1000:.0f} ms)"
+        elif monitor.state == DEGRADED:
+            status = f"API: degraded, {monitor.error}"
+        elif monitor.state == OFFLINE:
+            status = "API: offline. Messages are held until it is reachable again."
+        else:
+            status = "API: checking..."
+        self.dispatcher.call(self.health_var.set, status)
+
+    def start_stream_display(self, request_id):
+        self.remove_placeholder(f"response_{request_id}")
+        self.show_latest_messages()
+        self.chat_display.config(state=tk.NORMAL)
+        mark = self.new_message_mark("end-1c")
+        self.chat_display.insert(tk.END, "AI: \n\n")
+        # The transcript index is assigned once the stream has finished
+        message = self.streaming_messages[request_id] = [mark, None, 0]
+        self.displayed_messages.append(message)
+        # Streamed text is inserted at this mark, which moves right as text is added
+        self.chat_display.mark_set(f"stream_{request_id}", "end-3c")
+        self.chat_display.mark_gravity(f"stream_{request_id}", tk.RIGHT)
+        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.see(tk.END)
+
+    def finish_stream_display(self, request_id, response, role=None):
+        """
+        Record a completed streamed message in the transcript, replacing its partial records.
 
+        :param request_id: The request whose message was streamed
+        :param role: Optional. "assistant" to also add the message to the conversation history.
+        """
+        message = self.streaming_messages.pop(request_id, None)
+        if message is None:  # The chat was cleared while streaming
+            return
+        self.chat_display.mark_unset(f"stream_{request_id}")
+        tokens = self.conversation_history.add(role, response) if role else None
+        message[1] = self.transcript.append("AI", response, role, tokens, stream=request_id)
+        index_message(self.transcript.session_id, message[1], "AI", response)
+        message[2] = len(f"AI: {response}\n\n")
+        self.displayed_chars += message[2]
+        self.trim_chat_display()
+
+    def append_stream_text(self, request_id, text):
+        """
+        Insert streamed text into a request's message; the dispatcher merges the chunks of a frame into one call.
+
+        The text is journaled too, so an answer cut off by a crash survives a restart.
+        """
+        if request_id not in self.streaming_messages:  # The chat was cleared while streaming
+            return
+        self.transcript.append_partial("AI", text, request_id)
         self.chat_display.config(state=tk.NORMAL)
-        self.chat_display.delete("end-2l", "end-1c")  # Remove "AI is thinking..." message
+        self.chat_display.insert(f"stream_{request_id}", text)
         self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.see(tk.END)
+
+    def extract_artifacts(self, response):
+        """
+        Find the artifacts of a complete response. Called from the event loop thread.
+        """
+        self.publish_artifacts(parse_artifacts(response))
+
+    def publish_artifacts(self, artifacts):
+        """
+        Store artifacts in the background and show each in a window. Called from the event loop thread.
+        """
+        session_id = self.transcript.session_id
+        for artifact in artifacts:
+            future = self.loop.run_in_executor(None, store_artifact, artifact, session_id)
+            future.add_done_callback(functools.partial(self._artifact_stored, artifact))
+
+    def _artifact_stored(self, artifact, future):
+        # Runs on the event loop thread once the artifact is on disk
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error("Error storing artifact: %s", future.exception())
+            return
+        handle = future.result()
+        if handle.new:
+            # Content produced again is already indexed under its digest
+            index_artifact(handle.digest, handle.title, artifact.content, handle.session_id, handle.ts)
+        self.dispatcher.call(self.display_artifact, handle)
+
+    def open_artifact_browser(self):
+        ArtifactBrowser(self, self.display_artifact, self.transcript.session_id)
 
-        self.display_message("AI", response)
-        self.add_to_history({"role": "assistant", "content": response})
-
-        self.check_for_artifacts(response)
-
-    def check_for_artifacts(self, response):
-        artifact_types = {"code": "code", "text": "text", "html": "html"}
-        for artifact_type, content_type in artifact_types.items():
-            if f"<{artifact_type}>" in response and f"</{artifact_type}>" in response:
-                start = response.index(f"<{artifact_type}>") + len(artifact_type) + 2
-                end = response.index(f"</{artifact_type}>")
-                content = response[start:end].strip()
-                artifact_id = f"{artifact_type}_artifact_{len(self.artifacts) + 1}"
-                
-                # Save artifact to file
-                artifacts_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'artifacts')
-                os.makedirs(artifacts_dir, exist_ok=True)
-                file_path = os.path.join(artifacts_dir, f"{artifact_id}.{content_type}")
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                self.artifacts[artifact_id] = {"type": content_type, "content": content, "file_path": file_path}
-                self.display_artifact(artifact_id, f"{artifact_type.capitalize()} Artifact", content, content_type)
-
-    def display_artifact(self, artifact_id, title, content, content_type):
-        artifact_window = ArtifactWindow(self, title, content, content_type)
-        artifact_window.protocol("WM_DELETE_WINDOW", lambda: self.close_artifact_window(artifact_id, artifact_window))
+    def open_search(self):
+        SearchWindow(self, self.dispatcher, self.open_session_position, self.open_artifact_by_digest)
+
+    def open_session_position(self, session_id, position):
+        SessionViewer(self, session_id, position, on_continue=self.switch_session)
+
+    def open_artifact_by_digest(self, digest):
+        handle = get_artifact_store().get(digest)
+        if handle is None:
+            messagebox.showerror("Artifact unavailable", "This artifact is no longer stored.")
+            return
+        self.display_artifact(handle)
+
+    def display_artifact(self, handle):
+        """
+        Open a stored artifact, reading its content from disk.
+
+        :param handle: The ArtifactHandle of the artifact
+        """
+        window = self.artifacts.get(handle.digest)
+        if window is not None:  # The same content may already be open
+            try:
+                window.lift()
+                return
+            except tk.TclError:  # Closed with its Close button
+                pass
+        try:
+            content = handle.read()
+        except OSError as e:
+            logger.error("Error reading artifact %s: %s", handle.path, e)
+            messagebox.showerror("Artifact unavailable", f"Could not read {handle.path}: {e}")
+            return
+        window = ArtifactWindow(self, handle.title, content, handle.content_type, handle.language)
+        window.protocol("WM_DELETE_WINDOW", lambda: self.close_artifact_window(handle.digest, window))
+        self.artifacts[handle.digest] = window
 
     def close_artifact_window(self, artifact_id, window):
         window.destroy()
-        if artifact_id in self.artifacts:
+        if self.artifacts.get(artifact_id) is window:
             del self.artifacts[artifact_id]
 
-    def clear_chat(self):
+    def clear_chat(self, transcript=None):
+        """
+        Empty the chat and start a new session.
+
+        :param transcript: Optional. A SessionTranscript to continue instead of a new session.
+        """
         self.chat_display.config(state=tk.NORMAL)
         self.chat_display.delete("1.0", tk.END)
         self.chat_display.config(state=tk.DISABLED)
+        # Message, placeholder and stream marks alike; requests still running find theirs gone
+        self.chat_display.mark_unset(*[mark for mark in self.chat_display.mark_names()
+                                       if mark.startswith(("msg_", "response_", "comparison_", "stream_"))])
+        self.streaming_messages.clear()
+        self.displayed_messages.clear()
+        self.displayed_chars = 0
+        self._showing_latest = True
+        self.transcript.close()
+        self.transcript = transcript or SessionTranscript()
         self.conversation_history.clear()
-        self.total_tokens = 0
+
+    def switch_session(self, session_id):
+        """
+        Continue a past session in the chat, as if it had been resumed at startup.
+        """
+        if session_id == self.transcript.session_id:
+            return
+        self.stop_requests()
+        self.clear_chat(SessionTranscript(session_id))
+        if len(self.transcript):
+            self.resume_session()
+
+    def warm_up(self, profiler=None):
+        """
+        Load the tokenizer, the highlighter, the HTTP session and the local databases in the background.
+
+        Called once the window is on screen, so none of this delays the first
+        paint. Anything not yet warmed up when it is first needed is loaded then.
+
+        :param profiler: Optional. A StartupProfiler that records each task.
+        :return: The warm-up thread
+        """
+        tasks = [
+            ("tiktoken encoding", get_encoding),
+            ("pygments highlighter", warm_up_highlighter),
+            ("http session", self._open_http_session),
+            ("usage ledger", get_ledger),
+            ("search index", get_search_index),
+            ("health monitor", self.start_health_monitor),
+            ("search catch-up", self._catch_up_search_index),
+        ]
+        return start_warmup(tasks, profiler)
+
+    def _catch_up_search_index(self):
+        get_search_index().catch_up(artifact_store=get_artifact_store())
+
+    def _open_http_session(self):
+        asyncio.run_coroutine_threadsafe(self.http_client.get_session(), self.loop).result()
+
+    def start_health_monitor(self):
+        """
+        Start probing the API in the background; the sidebar shows whether it is reachable.
+        """
+        self.health_monitor.start(self.loop)
 
     def _run_event_loop(self):
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
     def on_closing(self):
+        self.metrics_panel.stop()
+        self.health_monitor.stop()
+        self.http_client.close_threadsafe(self.loop)
         self.loop.call_soon_threadsafe(self.loop.stop)
         self.loop_thread.join()
+        # Nothing is queued after the loop has stopped; run what is left so the transcript is complete
+        self.dispatcher.flush()
+        self.dispatcher.stop()
+        shutdown_usage()
+        shutdown_ledger()
+        shutdown_artifact_store()
+        shutdown_search_index()
+        self.transcript.close()
         self.destroy()
 
 if __name__ == "__main__":
     from config.api_keys import GROQ_API_KEY
+    from utils.logging_config import setup_logging
+    setup_logging()
     app = ChatGPTStyleInterface(GROQ_API_KEY)
-    app.protocol("WM_DELETE_WINDOW", app.on_closing)
+    app.after_idle(app.warm_up)
     app.mainloop()
\ No newline at end of file
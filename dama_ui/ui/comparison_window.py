@@ -0,0 +1,108 @@
+import tkinter as tk
+from tkinter import ttk, scrolledtext
+
+def format_run_stats(run):
+    """
+    Format the timings and token usage of a ModelRun for display.
+
+    :param run: A utils.fanout.ModelRun
+    :return: A short multi-line summary
+    """
+    def seconds(value):
+        return f"{value:.2f}s" if value is not None else "-"
+
+    tokens_per_second = run.tokens_per_second
+    usage = f"{run.prompt_tokens} + {run.completion_tokens} = {run.total_tokens}"
+    if run.estimated:
+        usage += " (estimated)"
+    return (
+        f"Status: {run.status}\n"
+        f"First token: {seconds(run.ttft)}   Total: {seconds(run.latency)}\n"
+        f"Speed: {f'{tokens_per_second:.1f} tok/s' if tokens_per_second else '-'}\n"
+        f"Tokens: {usage}"
+    )
+
+class ComparisonWindow(tk.Toplevel):
+    """
+    Shows the responses of several models to the same prompt side by side.
+
+    All methods must be called on the main thread; the chat interface routes
+    updates from the event loop thread through its UIDispatcher.
+    """
+
+    def __init__(self, parent, prompt, models, on_close=None):
+        """
+        :param parent: The chat interface window
+        :param prompt: The prompt sent to every model, shown in the header
+        :param models: The models being compared, one column each
+        :param on_close: Optional. Called without arguments when the window is closed.
+        """
+        super().__init__(parent)
+        self.title("Model Comparison")
+        self.geometry(f"{min(1600, 380 * len(models))}x720")
+
+        self.prompt = prompt
+        self.models = list(models)
+        self.on_close = on_close
+        self.closed = False
+        self.columns = {}
+
+        self.create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        prompt_label = ttk.Label(main_frame, text=f"Prompt: {self.prompt}", wraplength=1000)
+        prompt_label.pack(fill=tk.X, pady=(0, 10))
+
+        columns_frame = ttk.Frame(main_frame)
+        columns_frame.pack(fill=tk.BOTH, expand=True)
+
+        for position, model in enumerate(self.models):
+            columns_frame.columnconfigure(position, weight=1, uniform="model")
+            column = ttk.Frame(columns_frame)
+            column.grid(row=0, column=position, sticky="nsew", padx=5)
+            columns_frame.rowconfigure(0, weight=1)
+
+            ttk.Label(column, text=model, font=("Helvetica", 12, "bold")).pack(anchor=tk.W)
+            stats_var = tk.StringVar(value="Status: pending")
+            ttk.Label(column, textvariable=stats_var, justify=tk.LEFT).pack(anchor=tk.W, pady=(0, 5))
+
+            response_display = scrolledtext.ScrolledText(column, wrap=tk.WORD, width=40)
+            response_display.pack(fill=tk.BOTH, expand=True)
+            response_display.config(state=tk.DISABLED)
+
+            self.columns[model] = (stats_var, response_display)
+
+    def append_text(self, model, text):
+        """
+        Add streamed text to a model's column.
+        """
+        if self.closed:
+            return
+        _, response_display = self.columns[model]
+        response_display.config(state=tk.NORMAL)
+        response_display.insert(tk.END, text)
+        response_display.config(state=tk.DISABLED)
+        response_display.see(tk.END)
+
+    def show_result(self, run):
+        """
+        Show a model's final timings, and its error if it failed.
+
+        :param run: The finished utils.fanout.ModelRun
+        """
+        if self.closed:
+            return
+        stats_var, _ = self.columns[run.model]
+        stats_var.set(format_run_stats(run))
+        if run.error:
+            self.append_text(run.model, f"\n\nAn error occurred: {run.error}")
+
+    def close(self):
+        self.closed = True
+        if self.on_close:
+            self.on_close()
+        self.destroy()
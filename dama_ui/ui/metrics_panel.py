@@ -0,0 +1,96 @@
+import tkinter as tk
+from tkinter import ttk
+from utils.metrics import get_metrics
+
+# Milliseconds between two refreshes of the panel
+REFRESH_INTERVAL_MS = 2000
+
+COLUMNS = (
+    ("model", "Model", 110),
+    ("requests", "Req", 40),
+    ("ttft", "TTFT p50/p95", 90),
+    ("latency", "Latency p50/p95", 100),
+    ("speed", "tok/s p50", 60),
+)
+
+def format_seconds(entry):
+    """
+    Format the p50 and p95 of a latency histogram summary.
+
+    :param entry: One histogram of MetricsRegistry.summary(), or None
+    :return: "p50/p95" in seconds, or "-" when nothing was recorded
+    """
+    if not entry or entry.get("p50") is None:
+        return "-"
+    return f"{entry['p50']:.2f}/{entry['p95']:.2f}"
+
+class MetricsPanel(ttk.Frame):
+    """
+    Sidebar table of per-model request latencies plus the UI dispatcher lag.
+
+    Refreshes itself on the main thread every REFRESH_INTERVAL_MS from the
+    in-memory histograms of utils.metrics; it never waits on a request.
+    """
+
+    def __init__(self, parent, dispatcher=None, interval_ms=REFRESH_INTERVAL_MS):
+        """
+        :param parent: The sidebar frame
+        :param dispatcher: Optional. The UIDispatcher whose lag is shown below the table.
+        :param interval_ms: Milliseconds between two refreshes
+        """
+        super().__init__(parent)
+        self.dispatcher = dispatcher
+        self.interval_ms = interval_ms
+        self._after_id = None
+
+        self.table = ttk.Treeview(self, columns=[name for name, _, _ in COLUMNS], show="headings", height=4)
+        for name, heading, width in COLUMNS:
+            self.table.heading(name, text=heading)
+            self.table.column(name, width=width, anchor=tk.W if name == "model" else tk.E, stretch=False)
+        self.table.pack(fill=tk.X)
+
+        self.lag_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.lag_var).pack(fill=tk.X, pady=(2, 0))
+
+    def start(self):
+        if self._after_id is None:
+            self.refresh()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def refresh(self):
+        """
+        Redraw the table from the current metrics and schedule the next refresh.
+        """
+        summary = get_metrics().summary((0.5, 0.95))
+        rows = []
+        for model, metrics in sorted(summary.items()):
+            speed = metrics.get("tokens_per_second", {}).get("p50")
+            rows.append((
+                model,
+                sum(metrics["requests"].values()),
+                format_seconds(metrics.get("ttft_seconds")),
+                format_seconds(metrics.get("latency_seconds")),
+                f"{speed:.0f}" if speed is not None else "-",
+            ))
+
+        # Update rows in place so the selection and scroll position survive
+        existing = set(self.table.get_children())
+        for row in rows:
+            if row[0] in existing:
+                self.table.item(row[0], values=row)
+                existing.discard(row[0])
+            else:
+                self.table.insert("", tk.END, iid=row[0], values=row)
+        if existing:
+            self.table.delete(*existing)
+
+        if self.dispatcher is not None:
+            stats = self.dispatcher.stats()
+            self.lag_var.set(f"UI lag: {stats['last_lag_ms']:.0f} ms (max {stats['max_lag_ms']:.0f} ms), "
+                             f"queued: {stats['depth']}")
+
+        self._after_id = self.after(self.interval_ms, self.refresh)
@@ -0,0 +1,175 @@
+import time
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, scrolledtext
+from datetime import datetime
+from utils.search_index import get_search_index
+from utils.session_store import SessionTranscript
+
+# Milliseconds to wait after the last keystroke before searching
+SEARCH_DELAY_MS = 150
+
+# Results shown at most
+SEARCH_LIMIT = 100
+
+# Messages shown before and after a matching message
+CONTEXT_MESSAGES = 10
+
+# Queries run here, one at a time, so the Tk thread never waits for the index
+_search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+
+def run_search(text, kind=None):
+    """
+    Query the search index. Runs on the search worker thread.
+
+    :return: (results, milliseconds taken)
+    """
+    started = time.perf_counter()
+    results = get_search_index().search(text, SEARCH_LIMIT, kind)
+    return results, (time.perf_counter() - started) * 1000
+
+class SessionViewer(tk.Toplevel):
+    """
+    Read-only view of the messages around a position of a past session.
+    """
+
+    def __init__(self, parent, session_id, position, on_continue=None):
+        """
+        :param parent: The chat interface window
+        :param session_id: The session to show
+        :param position: Index of the message to highlight
+        :param on_continue: Optional. Called with the session id to continue the session in the chat.
+        """
+        super().__init__(parent)
+        self.title(f"Session {session_id}")
+        self.geometry("720x500")
+        self.session_id = session_id
+        self.on_continue = on_continue
+
+        frame = ttk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.text = scrolledtext.ScrolledText(frame, wrap=tk.WORD)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.text.tag_configure("match", background="#44475a")
+
+        if on_continue is not None:
+            continue_button = ttk.Button(frame, text="Continue this session", command=self.continue_session)
+            continue_button.pack(anchor=tk.E, pady=(10, 0))
+
+        transcript = SessionTranscript(session_id, read_only=True)
+        try:
+            start = max(0, position - CONTEXT_MESSAGES)
+            messages = transcript.read(start, position + CONTEXT_MESSAGES + 1)
+        finally:
+            transcript.close()
+
+        for index, (sender, message) in enumerate(messages, start):
+            tags = ("match",) if index == position else ()
+            if index == position:
+                self.text.mark_set("match_start", "end-1c")
+            self.text.insert(tk.END, f"{sender}: {message}\n\n", tags)
+        self.text.config(state=tk.DISABLED)
+        if "match_start" in self.text.mark_names():
+            self.text.see("match_start")
+
+    def continue_session(self):
+        self.on_continue(self.session_id)
+        self.destroy()
+
+class SearchWindow(tk.Toplevel):
+    """
+    Searches past messages and artifacts as the user types.
+
+    Queries go to the full-text index on a worker thread and the results come
+    back through the dispatcher; a message or artifact is only read when its
+    result is opened.
+    """
+
+    def __init__(self, parent, dispatcher, on_open_message, on_open_artifact):
+        """
+        :param parent: The chat interface window
+        :param dispatcher: The UIDispatcher that delivers results to the Tk thread
+        :param on_open_message: Called with (session id, position) of a message result
+        :param on_open_artifact: Called with the content hash of an artifact result
+        """
+        super().__init__(parent)
+        self.title("Search")
+        self.geometry("760x460")
+        self.dispatcher = dispatcher
+        self.on_open_message = on_open_message
+        self.on_open_artifact = on_open_artifact
+        self.results = {}
+        self._search_job = None
+        # Only the results of the latest query are shown
+        self._search_seq = 0
+
+        frame = ttk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        top = ttk.Frame(frame)
+        top.pack(fill=tk.X, pady=(0, 5))
+        self.query_var = tk.StringVar()
+        entry = ttk.Entry(top, textvariable=self.query_var)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        entry.focus_set()
+        self.kind_var = tk.StringVar(value="all")
+        kind_menu = ttk.OptionMenu(top, self.kind_var, "all", "all", "message", "artifact",
+                                   command=lambda _: self.search())
+        kind_menu.pack(side=tk.RIGHT, padx=(10, 0))
+        self.query_var.trace_add("write", self.schedule_search)
+
+        columns = (("time", "When", 130), ("kind", "Kind", 70), ("title", "From", 110), ("snippet", "Match", 420))
+        self.table = ttk.Treeview(frame, columns=[name for name, _, _ in columns], show="headings")
+        for name, heading, width in columns:
+            self.table.heading(name, text=heading)
+            self.table.column(name, width=width, stretch=name == "snippet")
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table.pack(fill=tk.BOTH, expand=True)
+        self.table.bind("<Double-1>", self.open_selected)
+        self.table.bind("<Return>", self.open_selected)
+
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.status_var).pack(fill=tk.X, padx=10, pady=(0, 10))
+
+    def schedule_search(self, *args):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(SEARCH_DELAY_MS, self.search)
+
+    def search(self):
+        self._search_job = None
+        self._search_seq += 1
+        seq = self._search_seq
+        text = self.query_var.get()
+        kind = self.kind_var.get()
+        future = _search_executor.submit(run_search, text, None if kind == "all" else kind)
+        future.add_done_callback(lambda future: self.dispatcher.call(self.show_results, seq, text, future))
+
+    def show_results(self, seq, text, future):
+        if seq != self._search_seq or not self.winfo_exists():
+            return
+        if future.exception() is not None:
+            self.status_var.set(f"Search failed: {future.exception()}")
+            return
+        results, elapsed_ms = future.result()
+
+        self.table.delete(*self.table.get_children())
+        self.results = {}
+        for number, result in enumerate(results):
+            iid = str(number)
+            self.results[iid] = result
+            when = datetime.fromtimestamp(result["ts"]).strftime('%Y-%m-%d %H:%M')
+            snippet = " ".join(result["snippet"].split())
+            self.table.insert("", tk.END, iid=iid, values=(when, result["kind"], result["title"], snippet))
+        self.status_var.set(f"{len(results)} results in {elapsed_ms:.1f} ms" if text.strip() else "")
+
+    def open_selected(self, event=None):
+        for iid in self.table.selection():
+            result = self.results[iid]
+            if result["kind"] == "artifact":
+                self.on_open_artifact(result["ref"])
+            else:
+                self.on_open_message(result["session_id"], result["position"])
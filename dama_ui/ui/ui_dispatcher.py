@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+FRAME_INTERVAL_MS = 33  # Drain queued UI work about 30 times per second
+FRAME_BUDGET_MS = 12  # Stop draining and yield to Tk once a frame has used this much time
+LAG_WARNING_MS = 250  # Log a warning when queued work waits longer than this
+LAG_WARNING_INTERVAL = 5  # Seconds between two lag warnings
+
+class UIDispatcher:
+    """
+    Runs UI updates requested from worker threads on the Tk main loop.
+
+    Tk widgets may only be touched from the thread running mainloop(). Worker
+    threads queue callables with call() or text with append(); the main loop
+    drains the queue on a fixed after() timer, so worker threads never call
+    into Tk themselves. Consecutive appends for the same key are merged into a
+    single call per frame.
+    """
+
+    def __init__(self, root, interval_ms=FRAME_INTERVAL_MS, budget_ms=FRAME_BUDGET_MS):
+        """
+        :param root: The Tk root whose after() timer drives the dispatcher
+        :param interval_ms: Milliseconds between two drains of the queue
+        :param budget_ms: Milliseconds of work a single drain may use before yielding
+        """
+        self.root = root
+        self.interval_ms = interval_ms
+        self.budget = budget_ms / 1000
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._after_id = None
+        self._last_lag_warning = 0.0
+        self.executed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        """
+        Start draining the queue. Must be called from the main thread.
+        """
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        """
+        Stop draining the queue. Work still queued is dropped; call flush() first to run it.
+        """
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        with self._lock:
+            self._queue.clear()
+
+    def flush(self):
+        """
+        Run everything queued so far, without a time budget. Must be called from the main thread.
+        """
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return
+                entry = self._queue.popleft()
+            self._run(entry)
+
+    def call(self, func, *args):
+        """
+        Queue func(*args) to run on the main thread. Safe to call from any thread.
+        """
+        with self._lock:
+            self._queue.append([None, func, args, time.monotonic()])
+
+    def append(self, key, func, text):
+        """
+        Queue func(text) to run on the main thread, merging it with the previous
+        append if that one is for the same key and has not run yet.
+
+        :param key: Identifies the target, e.g. the message being streamed into
+        :param func: Called with the merged text
+        :param text: The text to add
+        """
+        with self._lock:
+            if key is not None and self._queue and self._queue[-1][0] == key:
+                self._queue[-1][2].append(text)
+            else:
+                self._queue.append([key, func, [text], time.monotonic()])
+
+    def stats(self):
+        """
+        Get the dispatcher's queue depth and lag.
+
+        :return: A dictionary with the queued entries, the lag of the oldest one
+                 and of the last drained one in milliseconds, the largest lag seen
+                 and the number of entries executed
+        """
+        now = time.monotonic()
+        with self._lock:
+            depth = len(self._queue)
+            oldest = self._queue[0][3] if self._queue else now
+        return {
+            "depth": depth,
+            "oldest_ms": (now - oldest) * 1000,
+            "last_lag_ms": self.last_lag * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+            "executed": self.executed,
+        }
+
+    def _drain(self):
+        started = time.monotonic()
+        while time.monotonic() - started < self.budget:
+            with self._lock:
+                if not self._queue:
+                    break
+                entry = self._queue.popleft()
+            self._run(entry)
+
+        if self.last_lag * 1000 > LAG_WARNING_MS and started - self._last_lag_warning > LAG_WARNING_INTERVAL:
+            self._last_lag_warning = started
+            logger.warning("UI updates are lagging: %.0f ms behind, %d queued", self.last_lag * 1000, len(self._queue))
+
+        self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _run(self, entry):
+        key, func, args, enqueued_at = entry
+        self.last_lag = time.monotonic() - enqueued_at
+        self.max_lag = max(self.max_lag, self.last_lag)
+        try:
+            if key is None:
+                func(*args)
+            else:
+                func("".join(args))
+        except Exception:
+            logger.exception("Error in queued UI update %r", func)
+        self.executed += 1
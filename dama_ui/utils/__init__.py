@@ -4,32 +4,52 @@ Utility functions and modules for the Dama UI application.
 This package contains various utility functions and modules that are used
 throughout the Dama UI application, including logging configuration,
 request processing, token counting, and usage tracking.
+
+Exported names are imported on first access, so importing a single utils
+module does not pull in aiohttp, tiktoken and the other heavy dependencies.
+Logging is configured explicitly by the entry points via setup_logging().
 """
 
-from .logging_config import setup_logging
-from .request_processor import process_request
-from .token_counter import count_tokens
-from .usage_tracking import update_usage, get_usage
+import importlib
 
-__all__ = [
-    'setup_logging',
-    'process_request',
-    'count_tokens',
-    'update_usage',
-    'get_usage',
-]
+_EXPORTS = {
+    'setup_logging': 'logging_config',
+    'HTTPClient': 'http_client',
+    'process_request': 'request_processor',
+    'ResponseCache': 'response_cache',
+    'count_tokens': 'token_counter',
+    'update_usage': 'usage_tracking',
+    'get_usage': 'usage_tracking',
+    'get_total_usage': 'usage_tracking',
+    'flush_usage': 'usage_tracking',
+    'shutdown_usage': 'usage_tracking',
+    'UsageLedger': 'usage_ledger',
+    'get_ledger': 'usage_ledger',
+    'record_request': 'usage_ledger',
+    'shutdown_ledger': 'usage_ledger',
+    'StartupProfiler': 'startup',
+    'start_warmup': 'startup',
+    'get_metrics': 'metrics',
+    'ArtifactParser': 'artifacts',
+    'parse_artifacts': 'artifacts',
+    'ArtifactStore': 'artifact_store',
+    'get_artifact_store': 'artifact_store',
+    'SearchIndex': 'search_index',
+    'get_search_index': 'search_index',
+    'CircuitBreaker': 'health',
+    'HealthMonitor': 'health',
+    'run_retention': 'retention',
+}
 
-# Initialize logging when the utils package is imported
-setup_logging()
+__all__ = list(_EXPORTS)
 
-# You can add any package-level initialization code here if needed.
-# For example:
-#
-# def initialize_utils():
-#     """Initialize any utility-related resources or settings."""
-#     pass
-#
-# initialize_utils()
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
 
 # If you have any shared constants or utility functions that don't fit
 # into any specific module, you can define them here:
@@ -0,0 +1,288 @@
+import atexit
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from .artifacts import EXTENSIONS
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+ARTIFACTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'artifacts')
+
+# Files at least this large are read through mmap instead of a buffered read
+MMAP_THRESHOLD = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    language TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES blobs (digest),
+    session_id TEXT,
+    title TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_ts ON artifacts (ts);
+CREATE INDEX IF NOT EXISTS idx_artifacts_session_ts ON artifacts (session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_artifacts_digest ON artifacts (digest);
+"""
+
+LIST_COLUMNS = ("a.id", "a.digest", "a.session_id", "a.title", "a.ts", "b.filename", "b.content_type",
+                "b.language", "b.size")
+
+class ArtifactHandle:
+    """
+    Metadata of a stored artifact; the content is only read from disk on demand.
+    """
+
+    def __init__(self, digest, path, content_type, language=None, size=0, title=None, session_id=None,
+                 ts=None, artifact_id=None):
+        self.digest = digest
+        self.path = path
+        self.content_type = content_type
+        self.language = language
+        self.size = size
+        self.title = title or f"{(language or content_type).capitalize()} Artifact"
+        self.session_id = session_id
+        self.ts = ts
+        self.id = artifact_id
+        # Set by ArtifactStore.put() when the content was not stored before
+        self.new = False
+
+    def read(self):
+        """
+        Read the artifact's content, through mmap for large files.
+
+        :return: The content as a string
+        """
+        with open(self.path, 'rb') as f:
+            if self.size < MMAP_THRESHOLD:
+                return f.read().decode('utf-8')
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, 'utf-8')
+
+class ArtifactStore:
+    """
+    Content-addressed artifact files with a SQLite index.
+
+    Each distinct content is stored once, in a file named after its SHA-256;
+    every time it is produced an index row records the session, title and
+    time, so listing artifacts never scans the directory. Safe to use from
+    several threads; writes are meant to happen off the UI thread.
+    """
+
+    def __init__(self, directory=ARTIFACTS_DIR):
+        """
+        :param directory: The directory holding the artifact files and index.db
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def put(self, artifact, session_id=None):
+        """
+        Store an artifact, writing its file only if the content is new.
+
+        Runs under the store lock, like delete(), so a file is never written
+        while retention deletes the same content.
+
+        :param artifact: A utils.artifacts.Artifact
+        :param session_id: Optional. The session the artifact was produced in.
+        :return: An ArtifactHandle for it
+        """
+        extension = EXTENSIONS.get((artifact.language or "").lower(), artifact.content_type)
+        filename = os.path.join(artifact.digest[:2], f"{artifact.digest}.{extension}")
+        path = os.path.join(self.directory, filename)
+        data = artifact.content.encode('utf-8')
+
+        now = time.time()
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (artifact.digest,)).fetchone()
+            # A file without a blob row may be left over from a deletion, so it is written again
+            if known is None or not os.path.exists(path):
+                self._write_file(path, data)
+            with self._conn:
+                blob = self._conn.execute(
+                    "INSERT OR IGNORE INTO blobs (digest, filename, content_type, language, size, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (artifact.digest, filename, artifact.content_type, artifact.language, len(data), now)
+                )
+                cursor = self._conn.execute(
+                    "INSERT INTO artifacts (digest, session_id, title, ts) VALUES (?, ?, ?, ?)",
+                    (artifact.digest, session_id, artifact.title, now)
+                )
+        handle = ArtifactHandle(artifact.digest, path, artifact.content_type, artifact.language, len(data),
+                                artifact.title, session_id, now, cursor.lastrowid)
+        handle.new = blob.rowcount == 1
+        return handle
+
+    def get(self, digest):
+        """
+        Get the most recent handle for a content hash.
+
+        :return: An ArtifactHandle, or None if the content is not stored
+        """
+        rows = self._select("WHERE a.digest = ?", [digest], 1)
+        return rows[0] if rows else None
+
+    def list(self, session_id=None, content_type=None, since=None, before=None, limit=None):
+        """
+        List stored artifacts, newest first, from the index alone.
+
+        :param session_id: Optional. Only artifacts produced in this session.
+        :param content_type: Optional. Only "code", "text" or "html" artifacts.
+        :param since: Optional. Unix timestamp; only artifacts produced at or after it.
+        :param before: Optional. Unix timestamp; only artifacts produced before it, e.g.
+                       the ones a retention policy would expire.
+        :param limit: Optional. Maximum number of handles to return.
+        :return: A list of ArtifactHandle
+        """
+        clauses, params = [], []
+        for clause, value in (("a.session_id = ?", session_id), ("b.content_type = ?", content_type),
+                              ("a.ts >= ?", since), ("a.ts < ?", before)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(where, params, limit)
+
+    def blobs_by_age(self, limit=None):
+        """
+        List the stored contents by when they were last produced, oldest first.
+
+        A content produced again recently is not old, even if its file is.
+
+        :param limit: Optional. Maximum number of contents to return.
+        :return: A list of (digest, last produced timestamp, size in bytes)
+        """
+        sql = ("SELECT b.digest, COALESCE(MAX(a.ts), b.created) AS last_ts, b.size FROM blobs b "
+               "LEFT JOIN artifacts a ON a.digest = b.digest GROUP BY b.digest ORDER BY last_ts")
+        params = []
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(row["digest"], row["last_ts"], row["size"]) for row in rows]
+
+    def delete(self, digest):
+        """
+        Remove a content hash from the index and delete its file.
+
+        :return: The number of bytes freed
+        """
+        with self._lock:
+            with self._conn:
+                row = self._conn.execute("SELECT filename, size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+                if row is None:
+                    return 0
+                self._conn.execute("DELETE FROM artifacts WHERE digest = ?", (digest,))
+                self._conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            # Still under the lock, so a put() of the same content waits for the file to be gone
+            try:
+                os.remove(os.path.join(self.directory, row["filename"]))
+            except FileNotFoundError:
+                pass
+        return row["size"]
+
+    def stats(self):
+        """
+        Get the number of stored contents, index rows and bytes on disk.
+        """
+        with self._lock:
+            blobs, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            artifacts = self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+        return {"blobs": blobs, "artifacts": artifacts, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _select(self, where, params, limit):
+        sql = (f"SELECT {', '.join(LIST_COLUMNS)} FROM artifacts a JOIN blobs b ON b.digest = a.digest "
+               f"{where} ORDER BY a.ts DESC")
+        if limit:
+            sql += " LIMIT ?"
+            params = list(params) + [limit]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [ArtifactHandle(row["digest"], os.path.join(self.directory, row["filename"]), row["content_type"],
+                               row["language"], row["size"], row["title"], row["session_id"], row["ts"], row["id"])
+                for row in rows]
+
+    @staticmethod
+    def _write_file(path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.debug("Stored artifact %s", path)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_artifact_store():
+    """
+    Get the application's artifact store, opening it on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArtifactStore()
+    return _store
+
+def store_artifact(artifact, session_id=None):
+    """
+    Store an artifact in the application's artifact store.
+
+    :return: An ArtifactHandle for it
+    """
+    return get_artifact_store().put(artifact, session_id)
+
+def shutdown_artifact_store():
+    """
+    Close the artifact index.
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+atexit.register(shutdown_artifact_store)
+
+# Example usage and testing
+if __name__ == "__main__":
+    from .artifacts import parse_artifacts
+
+    store = ArtifactStore(tempfile.mkdtemp())
+    response = "```python\nprint('hello')\n```\nAgain:\n```python\nprint('hello')\n```\n<html><p>Hi</p></html>"
+    for artifact in parse_artifacts(response):
+        handle = store.put(artifact, session_id="example")
+        print(f"Stored {handle.title} at {handle.path}")
+    print("Stats:", store.stats())
+    for handle in store.list(session_id="example"):
+        print(handle.id, handle.title, handle.size, repr(handle.read()))
+    store.close()
@@ -0,0 +1,220 @@
+import hashlib
+import re
+
+# <tag> artifacts and their content types
+ARTIFACT_TAGS = {"code": "code", "text": "text", "html": "html"}
+
+# Languages of fenced blocks that are shown as something other than code
+FENCE_CONTENT_TYPES = {"html": "html", "text": "text", "txt": "text", "plaintext": "text"}
+
+# File extensions by language for stored artifacts; anything else gets its content type as extension
+EXTENSIONS = {
+    "python": "py", "py": "py", "javascript": "js", "js": "js", "typescript": "ts", "ts": "ts",
+    "html": "html", "css": "css", "json": "json", "bash": "sh", "sh": "sh", "shell": "sh",
+    "sql": "sql", "java": "java", "c": "c", "cpp": "cpp", "c++": "cpp", "go": "go", "rust": "rs",
+    "ruby": "rb", "yaml": "yaml", "yml": "yaml", "markdown": "md", "md": "md", "text": "txt",
+}
+
+# An opening <tag>, or a fence line such as ```python with its newline
+_OPENING = re.compile(r"<(code|text|html)>|^ {0,3}(`{3,}|~{3,})[ \t]*([^\s`]*)[^\n]*\n", re.MULTILINE)
+
+# The start of a line that opens a fence once it is complete
+_FENCE_START = re.compile(r" {0,3}(`{3,}|~{3,})")
+
+# Longest opening tag minus one: how much of the buffer end may be an incomplete tag
+_TAG_LOOKBEHIND = max(len(tag) for tag in ARTIFACT_TAGS) + 1
+
+class Artifact:
+    """
+    A code, text or HTML block found in a response.
+    """
+
+    def __init__(self, content, content_type, language=None):
+        self.content = content
+        self.content_type = content_type
+        self.language = language
+        self.digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @property
+    def title(self):
+        kind = self.language.capitalize() if self.language else self.content_type.capitalize()
+        return f"{kind} Artifact"
+
+class ArtifactParser:
+    """
+    Incremental parser for the artifacts of a response.
+
+    Recognizes <code>, <text> and <html> blocks and fenced ``` or ~~~ blocks
+    with an optional language. Text is fed as it streams in; only the
+    unresolved tail of it is searched again when the next chunk arrives, so
+    the cost of a response is linear in its length however many blocks it
+    has. Blocks inside another block are part of its content; blocks still
+    open when the response ends are dropped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan = 0       # Where the next search of the buffer starts
+        self._block = None   # (closing tag or pattern, content type, language, fence character)
+        self._parts = []     # Content of the open block that precedes the buffer
+        self._mid_line = False  # Whether the buffer starts with a kept character, mid-line
+        self._final = False  # Set by close(), when the last line is complete whatever its end
+
+    def feed(self, text):
+        """
+        Add the next chunk of the response.
+
+        :param text: The chunk
+        :return: The artifacts completed by this chunk, in order
+        """
+        self._buffer += text
+        artifacts = []
+        while True:
+            artifact = self._close_block() if self._block else self._open_block()
+            if artifact is False:
+                break
+            if artifact is not None:
+                artifacts.append(artifact)
+        return artifacts
+
+    def close(self):
+        """
+        Finish the response, completing a fenced block closed on its last line.
+
+        :return: The artifacts completed by the end of the response
+        """
+        self._final = True
+        artifacts = self.feed("\n" if self._block and self._block[3] else "")
+        self._buffer = ""
+        self._scan = 0
+        self._block = None
+        self._parts = []
+        self._mid_line = False
+        self._final = False
+        return artifacts
+
+    def _open_block(self):
+        """
+        Look for the start of a block; returns False when more text is needed.
+        """
+        match = _OPENING.search(self._buffer, self._scan)
+        if match is None:
+            # Keep the last line if it may still become a fence, otherwise
+            # only the characters that may be the start of a tag
+            line_start = self._buffer.rfind("\n") + 1
+            head = self._buffer[line_start:].lstrip(" ")[:3]
+            if self._at_line_start(line_start) and ("```".startswith(head) or "~~~".startswith(head)):
+                self._advance(line_start)
+            else:
+                self._advance(max(line_start, len(self._buffer) - _TAG_LOOKBEHIND))
+            return False
+
+        if match.group(1) and not self._final and self._buffer.find("\n", match.end()) < 0:
+            # A tag on a line that becomes a fence once it ends is part of the fence's info string
+            line_start = self._buffer.rfind("\n", 0, match.start()) + 1
+            if self._at_line_start(line_start) and _FENCE_START.match(self._buffer, line_start):
+                self._advance(line_start)
+                return False
+
+        if match.group(1):
+            tag = match.group(1)
+            self._block = (f"</{tag}>", ARTIFACT_TAGS[tag], "html" if tag == "html" else None, None)
+        else:
+            fence, language = match.group(2), match.group(3) or None
+            closing = re.compile(rf"^ {{0,3}}{re.escape(fence[0])}{{{len(fence)},}}[ \t]*\n", re.MULTILINE)
+            content_type = FENCE_CONTENT_TYPES.get((language or "").lower(), "code")
+            self._block = (closing, content_type, language, fence[0])
+        self._parts = []
+        self._buffer = self._buffer[match.end():]
+        self._scan = 0
+        self._mid_line = False
+        return None
+
+    def _close_block(self):
+        """
+        Look for the end of the open block; returns False when more text is needed.
+        """
+        closing, content_type, language, fence_char = self._block
+        if isinstance(closing, str):
+            end = self._buffer.find(closing, self._scan)
+            if end < 0:
+                self._keep(len(self._buffer) - len(closing) + 1)
+                return False
+            after = end + len(closing)
+        else:
+            match = closing.search(self._buffer, self._scan)
+            if match is None:
+                line_start = self._buffer.rfind("\n") + 1
+                head = self._buffer[line_start:].lstrip(" ")
+                # A last line that may still become the closing fence is kept whole
+                if not head.rstrip(" \t").strip(fence_char):
+                    self._keep(line_start)
+                else:
+                    self._keep(len(self._buffer) - 1)
+                return False
+            end, after = match.start(), match.end()
+
+        self._parts.append(self._buffer[:end])
+        content = "".join(self._parts)
+        content = content.strip() if isinstance(closing, str) else content.rstrip("\n")
+        self._block = None
+        self._parts = []
+        self._advance(after)
+        return Artifact(content, content_type, language) if content.strip() else None
+
+    def _keep(self, position):
+        """
+        Move the open block's content before position out of the buffer.
+        """
+        if position > 0:
+            # _advance() keeps the character before a mid-line position in the buffer
+            line_start = self._buffer[position - 1] == "\n"
+            self._parts.append(self._buffer[:position if line_start else position - 1])
+            self._advance(position)
+
+    def _advance(self, position):
+        """
+        Drop the buffer before position and search again from there.
+
+        When position is mid-line the character before it is kept, so that
+        ^ in the patterns does not match at the new start of the buffer.
+        """
+        if position == 0:
+            # Nothing to drop; a kept character is still not searched
+            self._scan = 1 if self._mid_line else 0
+        elif self._buffer[position - 1] == "\n":
+            self._buffer = self._buffer[position:]
+            self._scan = 0
+            self._mid_line = False
+        else:
+            self._buffer = self._buffer[position - 1:]
+            self._scan = 1
+            self._mid_line = True
+
+    def _at_line_start(self, position):
+        """
+        Whether a position of the buffer is the start of a line of the response.
+        """
+        return position > 0 or not self._mid_line
+
+def parse_artifacts(text):
+    """
+    Get every artifact of a complete response.
+    """
+    parser = ArtifactParser()
+    return parser.feed(text) + parser.close()
+
+# Example usage and testing
+if __name__ == "__main__":
+    response = (
+        "Here is a script:\n```python\nprint('hello')\n```\n"
+        "and a page: <html><p>Hi</p></html>\n"
+        "~~~\nplain fenced block\n~~~\n"
+    )
+    parser = ArtifactParser()
+    found = []
+    for position in range(0, len(response), 7):
+        found.extend(parser.feed(response[position:position + 7]))
+    found.extend(parser.close())
+    for artifact in found:
+        print(f"{artifact.title} ({artifact.digest[:16]}): {artifact.content!r}")
@@ -0,0 +1,130 @@
+from bisect import bisect_left
+from config.model_limits import MODEL_LIMITS, DEFAULT_CONTEXT_WINDOW, get_prompt_budget
+from .token_counter import count_tokens, get_message_overhead
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Dropped messages at the head of the lists that trigger removing them for good
+COMPACT_MIN_DROPPED = 1024
+
+class ConversationHistory:
+    """
+    The messages of a conversation, each with its token count.
+
+    Every message is tokenized once, when it is added, and the history keeps a
+    running prefix sum of its tokens. Messages older than the largest prompt
+    budget of any model are dropped as new ones arrive; each request then
+    takes the newest messages that fit its model's budget, after the system
+    prompt and the completion reservation, found by a binary search of the
+    prefix sums, and gets the prompt's token count along with them, so the
+    request path does not tokenize the history again.
+
+    Only the main thread of the chat interface uses a history, so it has no lock.
+    """
+
+    def __init__(self, max_tokens=None):
+        """
+        :param max_tokens: Optional. Tokens to keep at most; defaults to the largest
+                           prompt budget in MODEL_LIMITS.
+        """
+        self.max_tokens = max_tokens or max([get_prompt_budget(model) for model in MODEL_LIMITS]
+                                            or [DEFAULT_CONTEXT_WINDOW])
+        self.total_tokens = 0
+        self._entries = []
+        # Tokens of all the messages added before each one; dropped messages are before _head
+        self._before = []
+        self._added = 0
+        self._head = 0
+        self._system = (None, 0)
+
+    def __len__(self):
+        return len(self._entries) - self._head
+
+    def add(self, role, content, tokens=None):
+        """
+        Append a message and drop the oldest ones beyond max_tokens.
+
+        :param role: "user" or "assistant"
+        :param content: The message text
+        :param tokens: Optional. The message's token count, if already known.
+        :return: The message's token count
+        """
+        if tokens is None:
+            tokens = count_tokens(content)
+        self._entries.append((role, content, tokens))
+        self._before.append(self._added)
+        self._added += tokens
+        self.total_tokens += tokens
+        # The newest message is always kept, even when it alone is too long
+        while self.total_tokens > self.max_tokens and len(self) > 1:
+            self.total_tokens -= self._entries[self._head][2]
+            self._head += 1
+        if self._head >= COMPACT_MIN_DROPPED and self._head * 2 >= len(self._entries):
+            del self._entries[:self._head]
+            del self._before[:self._head]
+            self._head = 0
+        return tokens
+
+    def clear(self):
+        self._entries.clear()
+        self._before.clear()
+        self._added = 0
+        self._head = 0
+        self.total_tokens = 0
+
+    def system_tokens(self, system_message):
+        """
+        Count the tokens of the system message, reusing the last count if it is unchanged.
+        """
+        if self._system[0] != system_message:
+            self._system = (system_message, count_tokens(system_message))
+        return self._system[1]
+
+    def messages_for(self, model, system_message):
+        """
+        Build the messages for a request: the system prompt plus the newest history that fits.
+
+        :param model: The model the request is for; its context window and completion
+                      reservation set the budget
+        :param system_message: The system prompt, always included
+        :return: (a list of message dictionaries, oldest first; their token count,
+                 per-message overhead included)
+        """
+        overhead = get_message_overhead(model)
+        system_tokens = self.system_tokens(system_message) + overhead
+        budget = get_prompt_budget(model) - system_tokens
+
+        end = len(self._entries)
+        if self.total_tokens + overhead * len(self) <= budget:
+            selected = self._entries[self._head:]
+            used = self.total_tokens + overhead * len(self)
+        else:
+            # Messages from i on cost _added - _before[i] + overhead * (end - i), which
+            # shrinks as i grows: find the first i where that fits the budget
+            target = self._added + overhead * end - budget
+            first = bisect_left(range(self._head, end), target,
+                                key=lambda i: self._before[i] + overhead * i) + self._head
+            first = min(first, end - 1)  # The newest message is always sent
+            selected = self._entries[first:]
+            used = self._added - self._before[first] + overhead * (end - first)
+            if used > budget:
+                logger.warning("Latest message (%d tokens) exceeds the prompt budget of %s (%d tokens)",
+                               used, model, budget)
+            logger.debug("Sending %d of %d messages to %s", len(selected), len(self), model)
+
+        messages = [{"role": "system", "content": system_message}] + [
+            {"role": role, "content": content} for role, content, _ in selected
+        ]
+        return messages, system_tokens + used
+
+# Example usage and testing
+if __name__ == "__main__":
+    history = ConversationHistory()
+    for i in range(20):
+        history.add("user", f"Question number {i}: " + "lorem ipsum " * 500)
+        history.add("assistant", f"Answer number {i}: " + "dolor sit amet " * 500)
+    print(f"Kept {len(history)} messages, {history.total_tokens} tokens")
+    for model in ("llama3-8b-8192", "mixtral-8x7b-32768", "llama-3.1-70b-versatile"):
+        messages, tokens = history.messages_for(model, "You are a helpful AI assistant.")
+        print(f"{model}: {len(messages)} messages, {tokens} tokens")
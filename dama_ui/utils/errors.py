@@ -0,0 +1,75 @@
+"""
+Exceptions raised by the request path of the Dama UI application.
+
+All of them derive from RequestError, so callers can catch every failed
+request with one except clause and still tell timeouts, rate limits and
+server errors apart when they need to.
+"""
+
+class RequestError(Exception):
+    """
+    A request to the Groq API failed.
+    """
+
+    def __init__(self, message, model=None):
+        super().__init__(message)
+        self.model = model
+
+class RequestTimeoutError(RequestError, TimeoutError):
+    """
+    The request did not complete before its deadline.
+    """
+
+class NetworkError(RequestError):
+    """
+    The API could not be reached, or the connection failed mid-request.
+    """
+
+class CircuitOpenError(NetworkError):
+    """
+    The API has been unreachable, so the request was not sent.
+    """
+
+class APIError(RequestError):
+    """
+    The API answered with an error status.
+    """
+
+    def __init__(self, message, model=None, status=None, retry_after=None):
+        """
+        :param message: The error message
+        :param model: The model the request was for
+        :param status: The HTTP status code
+        :param retry_after: Seconds the server asked to wait before retrying, if it said
+        """
+        super().__init__(message, model)
+        self.status = status
+        self.retry_after = retry_after
+
+class RateLimitError(APIError):
+    """
+    The API rejected the request with 429 Too Many Requests.
+    """
+
+class ServerError(APIError):
+    """
+    The API failed with a 5xx status.
+    """
+
+def error_for_status(status, message, model=None, retry_after=None):
+    """
+    Build the exception matching an HTTP error status.
+
+    :param status: The HTTP status code
+    :param message: The response body
+    :param model: The model the request was for
+    :param retry_after: Seconds from the Retry-After header, if any
+    :return: A RateLimitError, ServerError or APIError
+    """
+    if status == 429:
+        error_class = RateLimitError
+    elif status >= 500:
+        error_class = ServerError
+    else:
+        error_class = APIError
+    return error_class(f"API request failed: {message}", model, status, retry_after)
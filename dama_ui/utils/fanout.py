@@ -0,0 +1,124 @@
+import asyncio
+import time
+from .logging_config import get_logger
+from .request_processor import stream_request
+
+logger = get_logger(__name__)
+
+class ModelRun:
+    """
+    The response and timings of one model in a fan-out.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.status = "pending"  # pending, streaming, ok, error or cancelled
+        self.response = ""
+        self.error = None
+        self.ttft = None  # Seconds until the first chunk arrived
+        self.latency = None  # Seconds until the stream ended
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.estimated = False
+
+    @property
+    def tokens_per_second(self):
+        """
+        Completion tokens per second of generation, measured from the first chunk.
+        """
+        if self.latency is None or not self.completion_tokens:
+            return None
+        generation_time = self.latency - (self.ttft or 0)
+        if generation_time <= 0:
+            generation_time = self.latency
+        return self.completion_tokens / generation_time if generation_time > 0 else None
+
+    def as_dict(self):
+        return {
+            "model": self.model,
+            "status": self.status,
+            "error": self.error,
+            "ttft": self.ttft,
+            "latency": self.latency,
+            "tokens_per_second": self.tokens_per_second,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "estimated": self.estimated,
+        }
+
+async def fan_out(api_key, models, messages, client=None, scheduler=None, first_wins=False,
+                  on_chunk=None, on_done=None, breaker=None, prompt_tokens=None):
+    """
+    Send the same messages to several models concurrently.
+
+    Responses are always streamed, so the time to the first token can be
+    measured. The response cache is not used, since cached answers would
+    make the timings meaningless.
+
+    :param api_key: The API key for authentication
+    :param models: The models to send the messages to
+    :param messages: The conversation history
+    :param client: Optional shared HTTPClient
+    :param scheduler: Optional RequestScheduler enforcing MODEL_LIMITS
+    :param first_wins: Cancel the remaining requests once one has completed successfully
+    :param on_chunk: Optional callback called as on_chunk(model, text) for every chunk
+    :param on_done: Optional callback called as on_done(run) when a model has finished,
+                    failed or was cancelled
+    :param breaker: Optional CircuitBreaker shared by the requests to the API
+    :param prompt_tokens: Optional. The prompt's token count, if already known.
+    :return: A list of ModelRun, in the order of models
+    """
+    runs = [ModelRun(model) for model in models]
+
+    async def run_one(run):
+        start_time = time.monotonic()
+        usage = {}
+        parts = []
+        try:
+            async for chunk in stream_request(api_key, run.model, messages, client=client,
+                                              scheduler=scheduler, usage_out=usage, breaker=breaker,
+                                              prompt_tokens=prompt_tokens):
+                if run.ttft is None:
+                    run.ttft = time.monotonic() - start_time
+                    run.status = "streaming"
+                parts.append(chunk)
+                if on_chunk:
+                    on_chunk(run.model, chunk)
+            run.status = "ok"
+        except asyncio.CancelledError:
+            run.status = "cancelled"
+            raise
+        except Exception as e:
+            run.status = "error"
+            run.error = str(e)
+        finally:
+            run.latency = time.monotonic() - start_time
+            run.response = "".join(parts)
+            run.prompt_tokens = usage.get("prompt_tokens", 0)
+            run.completion_tokens = usage.get("completion_tokens", 0)
+            run.total_tokens = usage.get("total_tokens", 0)
+            run.estimated = usage.get("estimated", False)
+            if on_done:
+                on_done(run)
+
+    tasks = {asyncio.create_task(run_one(run)): run for run in runs}
+    try:
+        if first_wins:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((tasks[task] for task in done if tasks[task].status == "ok"), None)
+                if winner is not None:
+                    logger.info("Fan-out won by %s after %.2fs", winner.model, winner.latency)
+                    break
+        else:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        # Cancels the losers of a first-wins race, or everything if the fan-out itself was cancelled
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return runs
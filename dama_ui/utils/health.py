@@ -0,0 +1,264 @@
+import asyncio
+import time
+from .logging_config import get_logger
+from .errors import CircuitOpenError
+from .request_processor import GROQ_API_ENDPOINT
+
+logger = get_logger(__name__)
+
+# Consecutive failed requests or probes that open the circuit
+FAILURE_THRESHOLD = 3
+
+# Seconds the circuit stays open before requests may try the API again
+RESET_TIMEOUT = 30
+
+# Seconds a request waits for an open circuit to close before it fails
+QUEUE_TIMEOUT = 30
+
+# Seconds between two probes while the API is online, and while it is not
+PROBE_INTERVAL = 30
+RETRY_INTERVAL = 5
+
+# Seconds a probe may take before the API is considered offline
+PROBE_TIMEOUT = 5
+
+# Probes slower than this, in seconds, report the API as degraded
+DEGRADED_LATENCY = 2.0
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# API health states
+UNKNOWN = "unknown"
+ONLINE = "online"
+DEGRADED = "degraded"
+OFFLINE = "offline"
+
+class CircuitBreaker:
+    """
+    Keeps requests off the network while the API is unreachable.
+
+    Consecutive failures open the circuit. While it is open, requests wait in
+    acquire() instead of each going through their own connection timeouts and
+    retries, and fail with CircuitOpenError if it does not close in time.
+    After reset_timeout the circuit is half open and requests are let through
+    again: a success closes it, a failure opens it for another reset_timeout.
+    A HealthMonitor closes it as soon as one of its probes gets through.
+
+    Meant to be used from the thread running the event loop.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 queue_timeout=QUEUE_TIMEOUT):
+        """
+        :param failure_threshold: Consecutive failures that open the circuit
+        :param reset_timeout: Seconds the circuit stays open before requests are let through again
+        :param queue_timeout: Seconds a request waits for an open circuit before failing
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.queue_timeout = queue_timeout
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self._closed_event = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def record_success(self):
+        """
+        Record that the API answered, closing the circuit.
+        """
+        self.failures = 0
+        if self.opened_at is not None:
+            self.opened_at = None
+            logger.info("Circuit closed: the API is reachable again")
+            if self._closed_event is not None:
+                self._closed_event.set()
+
+    def record_failure(self):
+        """
+        Record that the API could not be reached or failed with a server error.
+        """
+        self.failures += 1
+        state = self.state
+        if state == HALF_OPEN or (state == CLOSED and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            if self._closed_event is not None:
+                self._closed_event.clear()
+            if state == CLOSED:
+                self.trips += 1
+                logger.warning("Circuit opened after %d consecutive failures; holding requests for %gs",
+                               self.failures, self.reset_timeout)
+
+    async def acquire(self, deadline=None, model=None):
+        """
+        Wait until a request may be sent.
+
+        Returns at once unless the circuit is open. Otherwise the request is
+        queued until the circuit closes or becomes half open.
+
+        :param deadline: Optional time.monotonic() value after which the request stops waiting
+        :param model: The model the request is for, reported in the error
+        :raises CircuitOpenError: If the circuit is still open at the deadline or after queue_timeout
+        """
+        if self.state != OPEN:
+            return
+        wait_until = time.monotonic() + self.queue_timeout
+        if deadline is not None:
+            wait_until = min(wait_until, deadline)
+        if self._closed_event is None:
+            self._closed_event = asyncio.Event()
+
+        while self.state == OPEN:
+            now = time.monotonic()
+            if now >= wait_until:
+                raise CircuitOpenError("The API is unreachable; the request was not sent", model)
+            try:
+                await asyncio.wait_for(self._closed_event.wait(),
+                                       min(wait_until, self.opened_at + self.reset_timeout) - now)
+            except asyncio.TimeoutError:
+                pass
+
+class HealthMonitor:
+    """
+    Probes the API endpoint in the background and reports whether it is reachable.
+
+    Probes run on the event loop through the shared HTTPClient, so they never
+    block the UI and reuse its pooled connections. Any HTTP answer below 500
+    means the API is reachable: it is online, or degraded when the answer was
+    slow. A 5xx answer is degraded too, and a failed connection is offline.
+    Results are fed to the circuit breaker, if any. Probes are more frequent
+    while the API is not online or the circuit is not closed.
+    """
+
+    def __init__(self, client, breaker=None, url=GROQ_API_ENDPOINT, interval=PROBE_INTERVAL,
+                 retry_interval=RETRY_INTERVAL, timeout=PROBE_TIMEOUT, degraded_latency=DEGRADED_LATENCY,
+                 on_change=None):
+        """
+        :param client: The HTTPClient to probe with
+        :param breaker: Optional CircuitBreaker that receives the probe results
+        :param url: The endpoint to probe
+        :param interval: Seconds between two probes while the API is online
+        :param retry_interval: Seconds between two probes otherwise
+        :param timeout: Seconds a probe may take
+        :param degraded_latency: Seconds above which a successful probe reports the API as degraded
+        :param on_change: Optional callback called as on_change(monitor) from the event loop
+                          thread whenever the state changes
+        """
+        self.client = client
+        self.breaker = breaker
+        self.url = url
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.degraded_latency = degraded_latency
+        self.on_change = on_change
+        self.state = UNKNOWN
+        self.latency = None
+        self.error = None
+        self._future = None
+
+    async def probe(self):
+        """
+        Probe the endpoint once and update the state.
+
+        :return: The new state
+        """
+        import aiohttp
+
+        session = await self.client.get_session()
+        start_time = time.monotonic()
+        try:
+            async with session.head(self.url, allow_redirects=False,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.latency = None
+            if self.breaker:
+                self.breaker.record_failure()
+            self._set_state(OFFLINE, str(e) or type(e).__name__)
+            return self.state
+
+        self.latency = time.monotonic() - start_time
+        if status >= 500:
+            if self.breaker:
+                self.breaker.record_failure()
+            self._set_state(DEGRADED, f"HTTP {status}")
+        else:
+            if self.breaker:
+                self.breaker.record_success()
+            slow = self.latency > self.degraded_latency
+            self._set_state(DEGRADED if slow else ONLINE, f"slow ({self.latency:.1f}s)" if slow else None)
+        return self.state
+
+    async def run(self):
+        """
+        Probe the endpoint until cancelled.
+        """
+        last_probe = None
+        while True:
+            now = time.monotonic()
+            interval = self.interval if self.state == ONLINE else self.retry_interval
+            circuit_closed = self.breaker is None or self.breaker.state == CLOSED
+            if last_probe is None or now - last_probe >= interval or not circuit_closed:
+                last_probe = now
+                try:
+                    await self.probe()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error("Health probe failed: %s", e)
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self, loop):
+        """
+        Start probing in the background on `loop`, from any thread.
+        """
+        if self._future is None or self._future.done():
+            self._future = asyncio.run_coroutine_threadsafe(self.run(), loop)
+
+    def stop(self):
+        """
+        Stop probing.
+        """
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _set_state(self, state, error=None):
+        self.error = error
+        previous, self.state = self.state, state
+        if state == previous:
+            return
+        if state == ONLINE:
+            logger.info("API is online (%.0f ms)", self.latency * 1000)
+        else:
+            logger.warning("API is %s: %s", state, error)
+        if self.on_change:
+            self.on_change(self)
+
+# Example usage and testing
+if __name__ == "__main__":
+    from .http_client import HTTPClient
+    from .logging_config import setup_logging
+
+    async def main():
+        client = HTTPClient()
+        breaker = CircuitBreaker()
+        monitor = HealthMonitor(client, breaker)
+        state = await monitor.probe()
+        print(f"API is {state}", f"({monitor.error})" if monitor.error else f"({monitor.latency * 1000:.0f} ms)")
+        print("Circuit:", breaker.state)
+        await client.close()
+
+    setup_logging()
+    asyncio.run(main())
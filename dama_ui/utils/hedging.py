@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from collections import deque
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+HEDGE_PERCENTILE = 0.95  # Send a second request once the first is slower than this share of recent ones
+HEDGE_MIN_SAMPLES = 20  # Latencies needed for a model before it is hedged at all
+HEDGE_WINDOW = 200  # Recent latencies kept per model
+HEDGE_MIN_DELAY = 0.5  # Never hedge sooner than this, in seconds
+
+class HedgePolicy:
+    """
+    Decides when a slow request gets a second, hedged copy.
+
+    The policy keeps the latencies of recent successful requests per model and
+    hedges a request once it has been running longer than the configured
+    percentile of them. Only the slowest few percent of requests are sent
+    twice, which cuts the tail latency for a small amount of extra load.
+    """
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES, window=HEDGE_WINDOW,
+                 min_delay=HEDGE_MIN_DELAY, enabled=True):
+        """
+        :param percentile: Latency percentile, between 0 and 1, after which a request is hedged
+        :param min_samples: Latencies needed for a model before its requests are hedged
+        :param window: Number of recent latencies kept per model
+        :param min_delay: Lower bound of the hedging delay in seconds
+        :param enabled: Whether requests are hedged; latencies are recorded either way
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.enabled = enabled
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model, latency):
+        """
+        Record the latency of a successful request.
+        """
+        with self._lock:
+            samples = self._latencies.get(model)
+            if samples is None:
+                samples = self._latencies[model] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def delay_for(self, model):
+        """
+        Get how long to wait before hedging a request for `model`.
+
+        :return: Seconds, or None if requests for this model are not hedged
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, samples[int(self.percentile * (len(samples) - 1))])
+
+async def run_hedged(attempt, delay, policy=None, model=None):
+    """
+    Run attempt(), starting a second copy if the first takes longer than `delay`.
+
+    The first copy to succeed wins and the other is cancelled. If one copy
+    fails, the other is still awaited; the error is only raised if both fail.
+
+    :param attempt: A coroutine function performing one request
+    :param delay: Seconds to wait before hedging
+    :param policy: Optional. The HedgePolicy whose counters are updated.
+    :param model: Optional. The model the request is for, used in log messages.
+    :return: The result of the winning attempt
+    """
+    primary = asyncio.ensure_future(attempt())
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            logger.info("Hedging request for %s after %.2fs", model, delay)
+            if policy:
+                policy.hedged += 1
+            tasks.add(asyncio.ensure_future(attempt()))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary and policy:
+                        policy.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,110 @@
+import asyncio
+from .logging_config import get_logger
+from .metrics import trace_config
+
+logger = get_logger(__name__)
+
+# Connection pool defaults
+DEFAULT_POOL_SIZE = 20
+DEFAULT_PER_HOST_LIMIT = 10
+DEFAULT_DNS_CACHE_TTL = 300  # seconds
+DEFAULT_KEEPALIVE_TIMEOUT = 30  # seconds
+
+# Timeout defaults
+DEFAULT_CONNECT_TIMEOUT = 10  # seconds
+DEFAULT_READ_TIMEOUT = 60  # seconds
+
+class HTTPClient:
+    """
+    A long-lived, pooled HTTP client shared by all requests on one event loop.
+
+    The underlying aiohttp session is created lazily on first use, from inside
+    the event loop that will own it, so keep-alive connections, DNS lookups and
+    TLS sessions are reused across chat turns.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 dns_cache_ttl=DEFAULT_DNS_CACHE_TTL, keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT, trace=True):
+        """
+        :param pool_size: Maximum number of open connections in the pool
+        :param per_host_limit: Maximum number of open connections to a single host
+        :param connect_timeout: Seconds allowed to establish a connection
+        :param read_timeout: Seconds allowed between two reads of the response
+        :param dns_cache_ttl: Seconds to keep resolved addresses cached
+        :param keepalive_timeout: Seconds to keep an idle connection open
+        :param trace: Whether to time DNS lookups, connects and the first byte for utils.metrics
+        """
+        self.pool_size = pool_size
+        self.per_host_limit = per_host_limit
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.trace = trace
+        self._session = None
+        self._lock = None
+
+    @property
+    def closed(self):
+        """Whether the client currently has no open session."""
+        return self._session is None or self._session.closed
+
+    async def get_session(self):
+        """
+        Get the shared session, creating it on first use.
+
+        :return: An aiohttp.ClientSession bound to the running event loop
+        """
+        if not self.closed:
+            return self._session
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self.closed:
+                import aiohttp
+
+                connector = aiohttp.TCPConnector(
+                    limit=self.pool_size,
+                    limit_per_host=self.per_host_limit,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    keepalive_timeout=self.keepalive_timeout
+                )
+                timeout = aiohttp.ClientTimeout(
+                    total=None,
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.read_timeout
+                )
+                self._session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                                      trace_configs=[trace_config()] if self.trace else None)
+                logger.info("HTTP client session opened (pool size: %d, per host: %d)",
+                            self.pool_size, self.per_host_limit)
+        return self._session
+
+    async def close(self):
+        """
+        Close the shared session and release all pooled connections.
+        """
+        if self.closed:
+            return
+        session = self._session
+        self._session = None
+        await session.close()
+        logger.info("HTTP client session closed.")
+
+    def close_threadsafe(self, loop, timeout=5):
+        """
+        Close the client from a thread other than the one running its loop.
+
+        :param loop: The event loop that owns the client
+        :param timeout: Seconds to wait for the session to close
+        """
+        if self.closed or not loop.is_running():
+            return
+        future = asyncio.run_coroutine_threadsafe(self.close(), loop)
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            logger.error("Error closing HTTP client: %s", e)
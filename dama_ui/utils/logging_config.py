@@ -1,47 +1,157 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 
-def setup_logging(log_level=logging.INFO):
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
+
+# Environment variables read when setup_logging() is not told otherwise, e.g.
+# DAMA_LOG_JSON=1 and DAMA_LOG_LEVELS="utils.request_processor=DEBUG,aiohttp=WARNING"
+JSON_ENV_VAR = 'DAMA_LOG_JSON'
+LEVELS_ENV_VAR = 'DAMA_LOG_LEVELS'
+
+_queue_handler = None
+_listener = None
+_setup_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a single JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on the queue unformatted, so the listener thread formats them.
+
+    QueueHandler.prepare() formats each record on the thread that logs. Only
+    the message's arguments are merged here, since they may change once the
+    logging call returns; timestamps and tracebacks are formatted later.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def parse_logger_levels(spec):
+    """
+    Parse per-logger levels from a string like "utils.request_processor=DEBUG,aiohttp=WARNING".
+
+    :param spec: Comma separated name=LEVEL pairs
+    :return: A dictionary mapping logger names to levels
+    """
+    levels = {}
+    for item in (spec or "").split(','):
+        name, sep, level = item.strip().partition('=')
+        if sep and name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def _make_formatter(json_format):
+    return JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+
+def setup_logging(log_level=logging.INFO, json_format=None, logger_levels=None):
     """
     Set up logging for the Dama UI application.
 
     This function configures logging to output to both console and a file.
     The log file is stored in a 'logs' directory within the application's root directory.
 
+    Loggers only put records on a queue; a background listener thread does
+    the formatting and the console and file I/O, so logging never blocks the
+    request path or the UI thread. Calling this again only updates the levels
+    and the output format, it does not add more handlers.
+
     :param log_level: The logging level to use (default: logging.INFO)
+    :param json_format: Optional. Write one JSON object per line, defaults to the DAMA_LOG_JSON environment variable.
+    :param logger_levels: Optional. A dictionary of per-logger levels, defaults to DAMA_LOG_LEVELS.
     """
-    # Create a logs directory if it doesn't exist
-    log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
-    os.makedirs(log_dir, exist_ok=True)
+    global _queue_handler, _listener
 
-    # Generate a filename based on the current date
-    log_filename = f"dama_ui_{datetime.now().strftime('%Y-%m-%d')}.log"
-    log_filepath = os.path.join(log_dir, log_filename)
+    if json_format is None:
+        json_format = os.environ.get(JSON_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+    if logger_levels is None:
+        logger_levels = parse_logger_levels(os.environ.get(LEVELS_ENV_VAR))
 
     # Create a logger
     logger = logging.getLogger()
     logger.setLevel(log_level)
+    for name, level in logger_levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    with _setup_lock:
+        if _listener is not None:
+            formatter = _make_formatter(json_format)
+            for handler in _listener.handlers:
+                handler.setFormatter(formatter)
+            return
+
+        # Create a logs directory if it doesn't exist
+        os.makedirs(LOG_DIR, exist_ok=True)
+
+        # Generate a filename based on the current date
+        log_filename = f"dama_ui_{datetime.now().strftime('%Y-%m-%d')}.log"
+        log_filepath = os.path.join(LOG_DIR, log_filename)
 
-    # Create handlers
-    console_handler = logging.StreamHandler()
-    file_handler = RotatingFileHandler(
-        log_filepath, maxBytes=10*1024*1024, backupCount=5
-    )
+        # Create handlers
+        console_handler = logging.StreamHandler()
+        file_handler = RotatingFileHandler(
+            log_filepath, maxBytes=10*1024*1024, backupCount=5, encoding='utf-8'
+        )
 
-    # Create formatters and add it to handlers
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    formatter = logging.Formatter(log_format)
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
+        formatter = _make_formatter(json_format)
+        console_handler.setFormatter(formatter)
+        file_handler.setFormatter(formatter)
 
-    # Add handlers to the logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+        # The handlers are driven by the listener thread, not by the loggers
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        _listener.start()
+
+        _queue_handler = DeferredQueueHandler(log_queue)
+        logger.addHandler(_queue_handler)
 
     logger.info("Logging setup complete.")
 
+def shutdown_logging():
+    """
+    Write out queued records and stop the listener thread.
+    """
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _queue_handler = None
+        _listener = None
+
+# Registered when this module is first imported, before the modules that log
+# from their own exit handlers, so it runs after them and keeps their records
+atexit.register(shutdown_logging)
+
 def get_logger(name):
     """
     Get a logger with the specified name.
@@ -53,6 +163,7 @@ def get_logger(name):
 
 # Example usage and testing
 if __name__ == "__main__":
+    setup_logging(logging.DEBUG)
     setup_logging(logging.DEBUG)
     logger = get_logger(__name__)
 
@@ -62,4 +173,7 @@ if __name__ == "__main__":
     logger.error("This is an error message")
     logger.critical("This is a critical message")
 
-    print(f"Log file should be created in: {os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')}")
\ No newline at end of file
+    setup_logging(logging.DEBUG, json_format=True)
+    logger.info("This message is written as JSON by %s", "the listener thread")
+
+    print(f"Log file should be created in: {LOG_DIR}")
\ No newline at end of file
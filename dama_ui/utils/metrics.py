@@ -0,0 +1,319 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Values kept per histogram for percentiles; bucket counts cover every observation
+RESERVOIR_SIZE = 1000
+
+# Seconds between two writes of the metrics file
+EXPORT_INTERVAL = 15
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+RATE_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+RETRY_BUCKETS = (0, 1, 2, 3)
+
+# Name, description and buckets of every per-model histogram
+HISTOGRAMS = {
+    "dns_seconds": ("DNS resolution time of new connections", TIME_BUCKETS),
+    "connect_seconds": ("Time to open a new connection, DNS and TLS included", TIME_BUCKETS),
+    "ttfb_seconds": ("Time from sending the request to the response headers", TIME_BUCKETS),
+    "ttft_seconds": ("Time from starting the request to the first token", TIME_BUCKETS),
+    "latency_seconds": ("Total request latency, queueing and retries included", TIME_BUCKETS),
+    "prompt_tokens": ("Prompt tokens per request", TOKEN_BUCKETS),
+    "completion_tokens": ("Completion tokens per request", TOKEN_BUCKETS),
+    "tokens_per_second": ("Completion tokens per second of generation", RATE_BUCKETS),
+    "retries": ("Retries per request", RETRY_BUCKETS),
+}
+
+class Histogram:
+    """
+    Cumulative bucket counts plus a reservoir of recent values for percentiles.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentile(self, fraction):
+        """
+        Get a percentile of the recent values.
+
+        :param fraction: The percentile, between 0 and 1
+        :return: The value, or None if nothing was observed
+        """
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class RequestTiming:
+    """
+    Timings and token counts of one request, filled in along the request path.
+
+    An instance is passed to aiohttp as the trace_request_ctx of each attempt,
+    so the trace callbacks from trace_config() can add DNS, connect and
+    time-to-first-byte measurements to it.
+    """
+
+    def __init__(self, model, stream=False):
+        self.model = model
+        self.stream = stream
+        self.start = time.monotonic()
+        self.status = "ok"
+        self.dns = None
+        self.connect = None
+        self.ttfb = None
+        self.ttft = None
+        self.latency = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self._dns_start = None
+        self._connect_start = None
+        self._request_start = None
+
+    def first_token(self):
+        """
+        Note the arrival of the first token; later calls are ignored.
+        """
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.start
+
+    def finish(self, status=None):
+        """
+        Note the end of the request.
+
+        :param status: Optional. "ok", "error", "timeout" or "cancelled"; keeps the current status if omitted.
+        """
+        self.latency = time.monotonic() - self.start
+        if status:
+            self.status = status
+
+    @property
+    def tokens_per_second(self):
+        if not self.completion_tokens or self.latency is None:
+            return None
+        generation_time = self.latency - (self.ttft or 0) if self.stream else self.latency
+        return self.completion_tokens / generation_time if generation_time > 0 else None
+
+class MetricsRegistry:
+    """
+    Per-model request histograms and status counters.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+        self._export_thread = None
+        self._stop_event = threading.Event()
+
+    def record(self, timing):
+        """
+        Add a finished request to the histograms.
+
+        :param timing: The RequestTiming of the request
+        """
+        values = {
+            "dns_seconds": timing.dns,
+            "connect_seconds": timing.connect,
+            "ttfb_seconds": timing.ttfb,
+            "ttft_seconds": timing.ttft,
+            "latency_seconds": timing.latency,
+            "retries": timing.retries,
+        }
+        if timing.status == "ok":
+            values.update({
+                "prompt_tokens": timing.prompt_tokens,
+                "completion_tokens": timing.completion_tokens,
+                "tokens_per_second": timing.tokens_per_second,
+            })
+
+        with self._lock:
+            key = (timing.model, timing.status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for name, value in values.items():
+                if value is None:
+                    continue
+                histogram = self._histograms.get((timing.model, name))
+                if histogram is None:
+                    histogram = self._histograms[(timing.model, name)] = Histogram(HISTOGRAMS[name][1])
+                histogram.observe(value)
+
+    def summary(self, fractions=(0.5, 0.95)):
+        """
+        Get the count and percentiles of every histogram, per model.
+
+        :param fractions: The percentiles to compute, between 0 and 1
+        :return: {model: {"requests": {status: count}, metric: {"count", "p50", "p95", ...}}}
+        """
+        with self._lock:
+            result = {}
+            for (model, status), count in self._requests.items():
+                result.setdefault(model, {"requests": {}})["requests"][status] = count
+            for (model, name), histogram in self._histograms.items():
+                entry = {"count": histogram.count, "sum": histogram.sum}
+                for fraction in fractions:
+                    entry[f"p{round(fraction * 100)}"] = histogram.percentile(fraction)
+                result.setdefault(model, {"requests": {}})[name] = entry
+            return result
+
+    def to_json(self):
+        return json.dumps({"generated_at": time.time(), "models": self.summary((0.5, 0.9, 0.95, 0.99))}, indent=2)
+
+    def to_prometheus(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP dama_requests_total Requests by model and outcome",
+            "# TYPE dama_requests_total counter",
+        ]
+        with self._lock:
+            for (model, status), count in sorted(self._requests.items()):
+                lines.append(f'dama_requests_total{{model="{model}",status="{status}"}} {count}')
+
+            for name, (description, _) in HISTOGRAMS.items():
+                series = sorted((model, histogram) for (model, metric), histogram in self._histograms.items()
+                                if metric == name)
+                if not series:
+                    continue
+                lines.append(f"# HELP dama_request_{name} {description}")
+                lines.append(f"# TYPE dama_request_{name} histogram")
+                for model, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.bucket_counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                        lines.append(f'dama_request_{name}_bucket{{model="{model}",le="{le}"}} {cumulative}')
+                    lines.append(f'dama_request_{name}_sum{{model="{model}"}} {histogram.sum:g}')
+                    lines.append(f'dama_request_{name}_count{{model="{model}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path, fmt=None):
+        """
+        Write the metrics to a file, atomically.
+
+        :param path: The file to write
+        :param fmt: "prometheus" or "json"; defaults to json for .json files and prometheus otherwise
+        """
+        fmt = fmt or ("json" if path.endswith(".json") else "prometheus")
+        text = self.to_json() if fmt == "json" else self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def start_export(self, path, interval=EXPORT_INTERVAL, fmt=None):
+        """
+        Write the metrics file every `interval` seconds from a background thread.
+        """
+        if self._export_thread is not None:
+            return
+
+        def run():
+            while not self._stop_event.wait(interval):
+                self._export_once(path, fmt)
+            self._export_once(path, fmt)
+
+        self._stop_event.clear()
+        self._export_thread = threading.Thread(target=run, name="metrics-export", daemon=True)
+        self._export_thread.start()
+
+    def stop_export(self):
+        """
+        Stop the export thread after a final write.
+        """
+        thread = self._export_thread
+        if thread is not None:
+            self._stop_event.set()
+            thread.join()
+            self._export_thread = None
+
+    def _export_once(self, path, fmt):
+        try:
+            self.export(path, fmt)
+        except OSError as e:
+            logger.error("Error exporting metrics to %s: %s", path, e)
+
+_metrics = MetricsRegistry()
+
+def get_metrics():
+    """
+    Get the application's metrics registry.
+    """
+    return _metrics
+
+def trace_config():
+    """
+    Build an aiohttp TraceConfig that fills in the RequestTiming passed as trace_request_ctx.
+
+    Only new connections have DNS and connect times; reused ones leave them unset.
+    """
+    import aiohttp
+
+    def timing_of(context):
+        timing = context.trace_request_ctx
+        return timing if isinstance(timing, RequestTiming) else None
+
+    async def on_request_start(session, context, params):
+        timing = timing_of(context)
+        if timing:
+            timing._request_start = time.monotonic()
+
+    async def on_request_end(session, context, params):
+        timing = timing_of(context)
+        if timing and timing._request_start is not None:
+            timing.ttfb = time.monotonic() - timing._request_start
+
+    async def on_dns_start(session, context, params):
+        timing = timing_of(context)
+        if timing:
+            timing._dns_start = time.monotonic()
+
+    async def on_dns_end(session, context, params):
+        timing = timing_of(context)
+        if timing and timing._dns_start is not None:
+            timing.dns = time.monotonic() - timing._dns_start
+
+    async def on_connection_start(session, context, params):
+        timing = timing_of(context)
+        if timing:
+            timing._connect_start = time.monotonic()
+
+    async def on_connection_end(session, context, params):
+        timing = timing_of(context)
+        if timing and timing._connect_start is not None:
+            timing.connect = time.monotonic() - timing._connect_start
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_end)
+    config.on_dns_resolvehost_start.append(on_dns_start)
+    config.on_dns_resolvehost_end.append(on_dns_end)
+    config.on_connection_create_start.append(on_connection_start)
+    config.on_connection_create_end.append(on_connection_end)
+    return config
@@ -1,4 +1,7 @@
 import socket
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
 
 def check_internet_connection(host="8.8.8.8", port=53, timeout=3):
     """
@@ -6,11 +9,14 @@ def check_internet_connection(host="8.8.8.8", port=53, timeout=3):
     Host: 8.8.8.8 (google-public-dns-a.google.com)
     OpenPort: 53/tcp
     Service: domain (DNS/TCP)
+
+    This blocks for up to `timeout` seconds. The UI uses utils.health.HealthMonitor
+    instead, which probes the API itself without blocking.
     """
     try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return True
-    except socket.error as ex:
-        print(f"No internet connection available: {ex}")
-        return False
\ No newline at end of file
+        # The timeout applies to this socket only, not to every socket in the process
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError as ex:
+        logger.warning("No internet connection available: %s", ex)
+        return False
@@ -0,0 +1,245 @@
+import asyncio
+import math
+import time
+from collections import deque
+from .logging_config import get_logger
+from config.model_limits import get_model_limit
+
+logger = get_logger(__name__)
+
+# Share of a per-minute limit that may be spent in a single burst. The buckets
+# refill at the remaining share per minute, so no rolling 60 second window can
+# ever see more than the declared limit.
+BURST_FRACTION = 0.2
+
+# Fallback wait when a 429 response carries no usable Retry-After header
+DEFAULT_RETRY_AFTER = 5.0  # seconds
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously and may be overdrawn.
+
+    Requests larger than the bucket's capacity wait for a full bucket and then
+    drive the level negative, so they are delayed instead of blocked forever.
+    """
+
+    def __init__(self, capacity, refill_per_second):
+        """
+        :param capacity: Maximum number of tokens the bucket can hold
+        :param refill_per_second: Number of tokens added per second
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self):
+        return math.isinf(self.capacity)
+
+    def _refill(self, now):
+        if self.unlimited:
+            return
+        elapsed = now - self.updated
+        self.updated = now
+        self.level = min(self.capacity, self.level + elapsed * self.refill_per_second)
+
+    def time_until(self, amount, now=None):
+        """
+        Get the number of seconds until `amount` tokens can be taken.
+
+        :param amount: The number of tokens needed
+        :param now: Optional monotonic timestamp to evaluate at
+        :return: Seconds to wait, 0 if the tokens are available now
+        """
+        if self.unlimited:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.refill_per_second
+
+    def consume(self, amount):
+        if not self.unlimited:
+            self._refill(time.monotonic())
+            self.level -= amount
+
+    def refund(self, amount):
+        """
+        Return tokens to the bucket, or take more if `amount` is negative.
+        """
+        if not self.unlimited:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+class Reservation:
+    """
+    Capacity taken from a model's buckets for one request.
+    """
+
+    def __init__(self, model, estimated_tokens):
+        self.model = model
+        self.estimated_tokens = estimated_tokens
+        self.reconciled = False
+
+class ModelRateLimiter:
+    """
+    Request and token buckets plus a FIFO wait queue for a single model.
+    """
+
+    def __init__(self, model, requests_per_minute, tokens_per_minute):
+        self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = self._make_bucket(requests_per_minute)
+        self.token_bucket = self._make_bucket(tokens_per_minute)
+        self.blocked_until = 0.0
+        self.queue = deque()
+        self.lock = None
+
+    @staticmethod
+    def _make_bucket(per_minute):
+        if math.isinf(per_minute):
+            return TokenBucket(per_minute, per_minute)
+        capacity = max(1.0, per_minute * BURST_FRACTION)
+        return TokenBucket(capacity, per_minute * (1 - BURST_FRACTION) / 60)
+
+    def time_until_ready(self, tokens):
+        now = time.monotonic()
+        return max(
+            self.blocked_until - now,
+            self.request_bucket.time_until(1, now),
+            self.token_bucket.time_until(tokens, now),
+        )
+
+    def estimate_wait(self, position, tokens):
+        """
+        Estimate how long a request at `position` in the queue will wait.
+
+        :param position: Number of requests queued ahead of this one
+        :param tokens: Estimated token cost of this request
+        :return: Expected wait in seconds
+        """
+        wait = self.time_until_ready(tokens)
+        if position and not self.request_bucket.unlimited:
+            wait += position / self.request_bucket.refill_per_second
+        return wait
+
+class RequestScheduler:
+    """
+    Client-side rate limiting for all models declared in MODEL_LIMITS.
+
+    Requests for the same model are admitted in FIFO order once both the
+    request and token buckets allow them. Token estimates are reconciled
+    against the real usage reported by the API, and Retry-After hints from
+    429 responses pause the model until the server is ready again.
+    """
+
+    def __init__(self):
+        self._limiters = {}
+
+    def get_limiter(self, model):
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limits = get_model_limit(model)
+            if not limits:
+                raise ValueError(f"Unsupported model: {model}")
+            limiter = ModelRateLimiter(model, limits['requests_per_minute'], limits['tokens_per_minute'])
+            self._limiters[model] = limiter
+        return limiter
+
+    def queue_length(self, model):
+        return len(self.get_limiter(model).queue)
+
+    async def acquire(self, model, estimated_tokens, on_wait=None):
+        """
+        Wait until a request for `model` may be sent and reserve its capacity.
+
+        :param model: The model the request is for
+        :param estimated_tokens: Estimated total tokens (prompt and completion)
+        :param on_wait: Optional callback called as on_wait(position, seconds)
+                        whenever the request has to wait
+        :return: A Reservation to pass to reconcile() once usage is known
+        """
+        limiter = self.get_limiter(model)
+        if limiter.lock is None:
+            limiter.lock = asyncio.Lock()
+
+        ticket = object()
+        limiter.queue.append(ticket)
+        try:
+            position = len(limiter.queue) - 1
+            if position and on_wait:
+                on_wait(position, limiter.estimate_wait(position, estimated_tokens))
+
+            async with limiter.lock:
+                while True:
+                    wait = limiter.time_until_ready(estimated_tokens)
+                    if wait <= 0:
+                        break
+                    if on_wait:
+                        on_wait(0, wait)
+                    logger.debug("Rate limit reached for %s, waiting %.2fs", model, wait)
+                    await asyncio.sleep(wait)
+
+                limiter.request_bucket.consume(1)
+                limiter.token_bucket.consume(estimated_tokens)
+        finally:
+            limiter.queue.remove(ticket)
+
+        return Reservation(model, estimated_tokens)
+
+    def reconcile(self, reservation, actual_tokens):
+        """
+        Correct a reservation with the number of tokens the request really used.
+
+        :param reservation: The Reservation returned by acquire()
+        :param actual_tokens: Total tokens reported by the API (0 if the request failed)
+        """
+        if reservation is None or reservation.reconciled:
+            return
+        reservation.reconciled = True
+        limiter = self.get_limiter(reservation.model)
+        limiter.token_bucket.refund(reservation.estimated_tokens - actual_tokens)
+
+    def hold(self, model, seconds):
+        """
+        Pause all requests for `model`, e.g. after a 429 with Retry-After.
+
+        :param model: The model to pause
+        :param seconds: How long to pause for
+        """
+        limiter = self.get_limiter(model)
+        limiter.blocked_until = max(limiter.blocked_until, time.monotonic() + seconds)
+        logger.warning("Pausing requests for %s for %.1fs", model, seconds)
+
+def parse_retry_after(headers, default=DEFAULT_RETRY_AFTER):
+    """
+    Read the Retry-After header of a response.
+
+    :param headers: The response headers
+    :param default: Value to use when the header is missing or not a number of seconds
+    :return: Seconds to wait before retrying
+    """
+    value = headers.get("Retry-After")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+# Example usage and testing
+if __name__ == "__main__":
+    async def demo():
+        scheduler = RequestScheduler()
+
+        def report(position, wait):
+            print(f"  queued at position {position}, expected wait {wait:.2f}s")
+
+        for i in range(8):
+            reservation = await scheduler.acquire("gemma-7b-it", 100, on_wait=report)
+            scheduler.reconcile(reservation, 80)
+            print(f"Request {i + 1} admitted")
+
+    asyncio.run(demo())
@@ -1,66 +1,515 @@
-import aiohttp
 import asyncio
+import json
+import random
+import time
+from contextlib import asynccontextmanager
 from .logging_config import get_logger
 from .usage_tracking import update_usage
-from config.model_limits import get_model_limit
+from .usage_ledger import record_request
+from .http_client import HTTPClient
+from .token_counter import count_tokens, estimate_tokens_from_messages
+from .rate_limiter import parse_retry_after
+from .errors import (RequestError, RequestTimeoutError, NetworkError, RateLimitError, ServerError,
+                     error_for_status)
+from .hedging import run_hedged
+from .metrics import RequestTiming, get_metrics
+from .response_cache import make_cache_key
+from config.model_limits import get_model_limit, get_completion_tokens
 
 logger = get_logger(__name__)
 
 GROQ_API_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 
-async def process_request(api_key, model, messages):
+# Seconds a request may take, retries included, unless the caller says otherwise
+REQUEST_TIMEOUT = 60
+
+# How many times a request is retried after a 429, a 5xx or a failed connection
+MAX_RETRIES = 3
+
+# Bounds of the exponential backoff between retries, in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20
+
+def build_headers(api_key):
     """
-    Process a request to the Groq API.
+    Build the HTTP headers for a Groq API request.
 
     :param api_key: The API key for authentication
-    :param model: The model to use for the request
-    :param messages: The conversation history
-    :return: The AI's response
+    :return: A dictionary of headers
     """
-    headers = {
+    return {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
 
+def build_payload(model, messages, stream=False):
+    """
+    Build the JSON body for a chat completion request.
+
+    :param model: The model to use for the request
+    :param messages: The conversation history
+    :param stream: Whether to ask the API for a server-sent event stream
+    :return: A dictionary ready to be sent as JSON
+    """
     data = {
         "model": model,
         "messages": messages,
         "temperature": 0.7,
-        "max_tokens": 1000,
+        "max_tokens": get_completion_tokens(model),
         "top_p": 1,
         "frequency_penalty": 0,
         "presence_penalty": 0
     }
+    if stream:
+        data["stream"] = True
+    return data
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Get how long to wait before retrying a failed attempt.
+
+    Uses exponential backoff with full jitter, so clients that failed at the
+    same moment do not retry in lockstep. A Retry-After from the server takes
+    precedence, with a little jitter added on top.
+
+    :param attempt: Number of the attempt that failed, starting at 0
+    :param retry_after: Optional. Seconds from the response's Retry-After header.
+    :return: Seconds to wait
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def attempt_timeout(session, remaining, stream):
+    """
+    Build the aiohttp timeout for one attempt of a request.
+
+    A regular request must complete within the time left before its deadline.
+    A stream may run for longer than that, as long as it keeps making progress:
+    the deadline bounds the wait for the response and for each chunk instead.
+
+    :param session: The aiohttp session, whose own timeouts are kept
+    :param remaining: Seconds left before the request's deadline, or None
+    :param stream: Whether the response is streamed
+    :return: An aiohttp.ClientTimeout
+    """
+    import aiohttp
+
+    default = session.timeout
+    if remaining is None:
+        return default
+
+    def bounded(value):
+        return remaining if value is None else min(value, remaining)
+
+    return aiohttp.ClientTimeout(
+        total=None if stream else remaining,
+        sock_connect=bounded(default.sock_connect),
+        sock_read=bounded(default.sock_read)
+    )
+
+@asynccontextmanager
+async def post_chat_completion(session, model, data, headers, scheduler=None, on_wait=None, deadline=None,
+                               timing=None, breaker=None, prompt_tokens=None):
+    """
+    Send a chat completion request, retrying failures that are worth retrying.
+
+    429 and 5xx responses and failed connections are retried up to MAX_RETRIES
+    times with jittered exponential backoff, honouring Retry-After. When a
+    scheduler is used, each attempt waits for its turn in the model's queue,
+    and a 429 pauses the whole model instead of just this request. When a
+    circuit breaker is used, each attempt first waits for it while the API is
+    unreachable, and every answer or failed connection is reported to it.
+
+    :param session: The aiohttp session to send the request with
+    :param model: The model to use for the request
+    :param data: The JSON body of the request
+    :param headers: The HTTP headers of the request
+    :param scheduler: Optional RequestScheduler enforcing the model's limits
+    :param on_wait: Optional callback called as on_wait(position, seconds) while queued
+    :param deadline: Optional time.monotonic() value by which the request must have completed
+    :param timing: Optional RequestTiming that receives the retry count and connection timings
+    :param breaker: Optional CircuitBreaker shared by the requests to the API
+    :param prompt_tokens: Optional. The prompt's token count, if already known; the messages
+                          are only tokenized for the scheduler otherwise.
+    :return: An async context manager yielding (response, reservation) for a 200 response
+    """
+    import aiohttp
+
+    estimated_tokens = 0
+    if scheduler:
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens_from_messages(data["messages"], model)
+        estimated_tokens = prompt_tokens + data["max_tokens"]
+
+    for attempt in range(MAX_RETRIES + 1):
+        if timing:
+            timing.retries = attempt
+        if breaker:
+            await breaker.acquire(deadline, model)
+        reservation = None
+        if scheduler:
+            reservation = await scheduler.acquire(model, estimated_tokens, on_wait)
+
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if scheduler:
+                    scheduler.reconcile(reservation, 0)
+                raise RequestTimeoutError(f"Request timed out after {attempt} attempts", model)
+
+        attempt_start = time.monotonic()
+        yielded = False
+        try:
+            async with session.post(GROQ_API_ENDPOINT, json=data, headers=headers,
+                                    timeout=attempt_timeout(session, remaining, data.get("stream")),
+                                    trace_request_ctx=timing) as response:
+                if breaker:
+                    if response.status >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                if response.status == 200:
+                    yielded = True
+                    try:
+                        yield response, reservation
+                    except BaseException:
+                        # The caller failed or was cancelled before it could reconcile
+                        if scheduler:
+                            scheduler.reconcile(reservation, 0)
+                        raise
+                    return
+
+                error_message = await response.text()
+                record_request(model, latency=time.monotonic() - attempt_start, status=f"http_{response.status}")
+                error = error_for_status(response.status, error_message, model,
+                                         parse_retry_after(response.headers, default=None))
+        except aiohttp.ClientConnectionError as e:
+            if breaker and not yielded:
+                breaker.record_failure()
+            if yielded or isinstance(e, aiohttp.ServerTimeoutError):
+                raise
+            record_request(model, latency=time.monotonic() - attempt_start, status="network_error")
+            error = NetworkError(f"Network error: {str(e)}", model)
+        finally:
+            if scheduler and not yielded:
+                scheduler.reconcile(reservation, 0)
+
+        retryable = isinstance(error, (RateLimitError, ServerError, NetworkError))
+        if not retryable or attempt == MAX_RETRIES:
+            logger.error("API request failed. Model: %s, Error: %s", model, error)
+            raise error
+
+        delay = backoff_delay(attempt, getattr(error, "retry_after", None))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            logger.error("API request failed. Model: %s, Error: %s (no time left to retry)", model, error)
+            raise error
+
+        logger.warning("Request failed (%s). Model: %s, retrying in %.1fs (%d/%d)",
+                       error, model, delay, attempt + 1, MAX_RETRIES)
+        if scheduler and isinstance(error, RateLimitError):
+            # Holds every request for this model, and the next acquire() waits it out
+            scheduler.hold(model, delay)
+        else:
+            await asyncio.sleep(delay)
+
+async def process_request(api_key, model, messages, client=None, scheduler=None, on_wait=None,
+                          cache=None, use_cache=True, timeout=REQUEST_TIMEOUT, hedge=None, breaker=None,
+                          prompt_tokens=None):
+    """
+    Process a request to the Groq API, answering from the response cache when possible.
+
+    :param api_key: The API key for authentication
+    :param model: The model to use for the request
+    :param messages: The conversation history
+    :param client: Optional shared HTTPClient. If omitted, a temporary client is
+                   created and closed for this single request.
+    :param scheduler: Optional RequestScheduler enforcing MODEL_LIMITS
+    :param on_wait: Optional callback called as on_wait(position, seconds) while queued
+    :param cache: Optional ResponseCache. Identical requests already in flight share one upstream call.
+    :param use_cache: Set to False to bypass the cache for this request
+    :param timeout: Seconds the request, including retries, may take; None for no deadline
+    :param hedge: Optional HedgePolicy. Slow requests get a second copy and the first answer wins.
+    :param breaker: Optional CircuitBreaker. While the API is down the request is queued, then
+                    fails with CircuitOpenError instead of being sent.
+    :param prompt_tokens: Optional. The prompt's token count, if already known, e.g. from
+                          ConversationHistory; the messages are tokenized otherwise.
+    :return: The AI's response
+    :raises RequestError: If the request failed, timed out or was rejected by the API
+    """
+    if cache is None or not use_cache:
+        return await send_request(api_key, model, messages, client, scheduler, on_wait, timeout, hedge, breaker,
+                                  prompt_tokens)
+
+    start_time = time.monotonic()
+    key = make_cache_key(build_payload(model, messages))
+    response, hit = await cache.get_or_fetch(
+        key, lambda: send_request(api_key, model, messages, client, scheduler, on_wait, timeout, hedge, breaker,
+                                  prompt_tokens),
+        model
+    )
+    if hit:
+        record_request(model, latency=time.monotonic() - start_time, status="cache_hit")
+        logger.info("Request served from cache. Model: %s", model)
+    return response
+
+async def send_request(api_key, model, messages, client=None, scheduler=None, on_wait=None,
+                       timeout=REQUEST_TIMEOUT, hedge=None, breaker=None, prompt_tokens=None):
+    """
+    Send a request to the Groq API, bypassing any response cache.
+
+    :param api_key: The API key for authentication
+    :param model: The model to use for the request
+    :param messages: The conversation history
+    :param client: Optional shared HTTPClient. If omitted, a temporary client is
+                   created and closed for this single request.
+    :param scheduler: Optional RequestScheduler enforcing MODEL_LIMITS
+    :param on_wait: Optional callback called as on_wait(position, seconds) while queued
+    :param timeout: Seconds the request, including retries, may take; None for no deadline
+    :param hedge: Optional HedgePolicy. Slow requests get a second copy and the first answer wins.
+    :param breaker: Optional CircuitBreaker. While the API is down the request is queued, then
+                    fails with CircuitOpenError instead of being sent.
+    :param prompt_tokens: Optional. The prompt's token count, if already known, e.g. from
+                          ConversationHistory; the messages are tokenized otherwise.
+    :return: The AI's response
+    :raises RequestError: If the request failed, timed out or was rejected by the API
+    """
+    import aiohttp
+
+    headers = build_headers(api_key)
+    data = build_payload(model, messages)
 
     model_limits = get_model_limit(model)
     if not model_limits:
         raise ValueError(f"Unsupported model: {model}")
 
+    owns_client = client is None
+    if owns_client:
+        client = HTTPClient()
+
+    start_time = time.monotonic()
+    deadline = start_time + timeout if timeout else None
+    timing = RequestTiming(model)
+
+    async def attempt():
+        attempt_start = time.monotonic()
+        async with post_chat_completion(session, model, data, headers, scheduler, on_wait,
+                                        deadline, timing, breaker, prompt_tokens) as (response, reservation):
+            result = await response.json()
+            timing.first_token()
+            ai_response = result['choices'][0]['message']['content']
+
+            # Update usage statistics
+            usage = result['usage']
+            tokens_used = usage['total_tokens']
+            update_usage(model, tokens_used)
+            record_request(model, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0),
+                           time.monotonic() - attempt_start)
+            timing.prompt_tokens = usage.get('prompt_tokens', 0)
+            timing.completion_tokens = usage.get('completion_tokens', 0)
+            if scheduler:
+                scheduler.reconcile(reservation, tokens_used)
+
+            logger.info("Request processed successfully. Model: %s, Tokens used: %s", model, tokens_used)
+        if hedge:
+            hedge.observe(model, time.monotonic() - attempt_start)
+        return ai_response
+
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(GROQ_API_ENDPOINT, json=data, headers=headers) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    ai_response = result['choices'][0]['message']['content']
-                    
-                    # Update usage statistics
-                    tokens_used = result['usage']['total_tokens']
-                    update_usage(model, tokens_used)
-                    
-                    logger.info(f"Request processed successfully. Model: {model}, Tokens used: {tokens_used}")
-                    return ai_response
-                else:
-                    error_message = await response.text()
-                    logger.error(f"API request failed. Status: {response.status}, Error: {error_message}")
-                    raise Exception(f"API request failed: {error_message}")
+        session = await client.get_session()
+        hedge_delay = hedge.delay_for(model) if hedge else None
+        if hedge_delay is None:
+            return await attempt()
+        return await run_hedged(attempt, hedge_delay, hedge, model)
+
+    except RequestError as e:
+        timing.status = "timeout" if isinstance(e, RequestTimeoutError) else "error"
+        raise
+
+    except asyncio.CancelledError:
+        timing.status = "cancelled"
+        record_request(model, latency=time.monotonic() - start_time, status="cancelled")
+        raise
+
+    except asyncio.TimeoutError:
+        timing.status = "timeout"
+        logger.error("Request timed out. Model: %s", model)
+        record_request(model, latency=time.monotonic() - start_time, status="timeout")
+        raise RequestTimeoutError(f"Request timed out after {time.monotonic() - start_time:.1f}s", model)
+
+    except aiohttp.ClientError as e:
+        timing.status = "error"
+        logger.error("Network error occurred: %s", e)
+        record_request(model, latency=time.monotonic() - start_time, status="network_error")
+        raise NetworkError(f"Network error: {str(e)}", model)
+
+    except Exception as e:
+        timing.status = "error"
+        logger.error("Unexpected error occurred: %s", e)
+        raise RequestError(f"Unexpected error: {str(e)}", model)
+
+    finally:
+        timing.finish()
+        get_metrics().record(timing)
+        if owns_client:
+            await client.close()
+
+def parse_sse_line(raw_line):
+    """
+    Parse one line of a server-sent event stream.
+
+    :param raw_line: The raw bytes of the line
+    :return: The decoded JSON event, the string "[DONE]", or None for lines
+             that carry no data (comments, keep-alives, blank separators)
+    """
+    line = raw_line.decode('utf-8').strip()
+    if not line.startswith("data:"):
+        return None
+    payload = line[len("data:"):].strip()
+    if payload == "[DONE]":
+        return payload
+    return json.loads(payload)
+
+async def stream_request(api_key, model, messages, client=None, scheduler=None, on_wait=None,
+                         cache=None, use_cache=True, usage_out=None, timeout=REQUEST_TIMEOUT, breaker=None,
+                         prompt_tokens=None):
+    """
+    Stream a response from the Groq API chunk by chunk.
+
+    Usage statistics are recorded once the stream has ended, using the usage
+    block Groq attaches to the final event, or a local estimate if the stream
+    did not include one.
+
+    :param api_key: The API key for authentication
+    :param model: The model to use for the request
+    :param messages: The conversation history
+    :param client: Optional shared HTTPClient. If omitted, a temporary client is
+                   created and closed when the stream ends.
+    :param scheduler: Optional RequestScheduler enforcing MODEL_LIMITS
+    :param on_wait: Optional callback called as on_wait(position, seconds) while queued
+    :param cache: Optional ResponseCache. A hit is yielded as a single chunk, and
+                  a completed stream is stored for later requests.
+    :param use_cache: Set to False to bypass the cache for this request
+    :param usage_out: Optional dictionary that receives prompt_tokens, completion_tokens,
+                      total_tokens and estimated once the stream has ended
+    :param timeout: Seconds to wait for the response, and at most for each chunk of it;
+                    None for no deadline
+    :param breaker: Optional CircuitBreaker. While the API is down the request is queued, then
+                    fails with CircuitOpenError instead of being sent.
+    :param prompt_tokens: Optional. The prompt's token count, if already known, e.g. from
+                          ConversationHistory; the messages are tokenized otherwise.
+    :return: An async generator yielding the response text as it arrives
+    :raises RequestError: If the request failed, timed out or was rejected by the API
+    """
+    import aiohttp
+
+    headers = build_headers(api_key)
+    data = build_payload(model, messages, stream=True)
+
+    model_limits = get_model_limit(model)
+    if not model_limits:
+        raise ValueError(f"Unsupported model: {model}")
+
+    cache_key = None
+    if cache is not None and use_cache:
+        lookup_start = time.monotonic()
+        cache_key = make_cache_key(data)
+        cached = await cache.lookup(cache_key)
+        if cached is not None:
+            record_request(model, latency=time.monotonic() - lookup_start, status="cache_hit")
+            logger.info("Streamed request served from cache. Model: %s", model)
+            yield cached
+            return
+
+    owns_client = client is None
+    if owns_client:
+        client = HTTPClient()
+
+    start_time = time.monotonic()
+    deadline = start_time + timeout if timeout else None
+    timing = RequestTiming(model, stream=True)
+
+    try:
+        session = await client.get_session()
+        async with post_chat_completion(session, model, data, headers, scheduler, on_wait,
+                                        deadline, timing, breaker, prompt_tokens) as (response, reservation):
+            parts = []
+            usage = None
+            async for raw_line in response.content:
+                event = parse_sse_line(raw_line)
+                if event is None:
+                    continue
+                if event == "[DONE]":
+                    break
+
+                # Groq reports usage in "x_groq" on the last chunk; the OpenAI
+                # style top-level "usage" field is accepted as well.
+                usage = event.get('usage') or event.get('x_groq', {}).get('usage') or usage
+
+                choices = event.get('choices') or []
+                if choices:
+                    content = choices[0].get('delta', {}).get('content')
+                    if content:
+                        timing.first_token()
+                        parts.append(content)
+                        yield content
+
+        # Update usage statistics
+        if usage:
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            completion_tokens = usage.get('completion_tokens', 0)
+            tokens_used = usage['total_tokens']
+        else:
+            if prompt_tokens is None:
+                prompt_tokens = estimate_tokens_from_messages(messages, model)
+            completion_tokens = count_tokens("".join(parts), model)
+            tokens_used = prompt_tokens + completion_tokens
+        timing.prompt_tokens = prompt_tokens
+        timing.completion_tokens = completion_tokens
+        if usage_out is not None:
+            usage_out.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                             total_tokens=tokens_used, estimated=not usage)
+        update_usage(model, tokens_used)
+        record_request(model, prompt_tokens, completion_tokens, time.monotonic() - start_time)
+        if cache_key:
+            await cache.put(cache_key, "".join(parts), model)
+        if scheduler:
+            scheduler.reconcile(reservation, tokens_used)
+
+        logger.info("Streamed request processed successfully. Model: %s, Tokens used: %s", model, tokens_used)
+
+    except RequestError as e:
+        timing.status = "timeout" if isinstance(e, RequestTimeoutError) else "error"
+        raise
+
+    except (asyncio.CancelledError, GeneratorExit):
+        timing.status = "cancelled"
+        record_request(model, latency=time.monotonic() - start_time, status="cancelled")
+        raise
+
+    except asyncio.TimeoutError:
+        timing.status = "timeout"
+        logger.error("Streamed request timed out. Model: %s", model)
+        record_request(model, latency=time.monotonic() - start_time, status="timeout")
+        raise RequestTimeoutError(f"Request timed out after {time.monotonic() - start_time:.1f}s", model)
 
     except aiohttp.ClientError as e:
-        logger.error(f"Network error occurred: {str(e)}")
-        raise Exception(f"Network error: {str(e)}")
+        timing.status = "error"
+        logger.error("Network error occurred: %s", e)
+        record_request(model, latency=time.monotonic() - start_time, status="network_error")
+        raise NetworkError(f"Network error: {str(e)}", model)
 
     except Exception as e:
-        logger.error(f"Unexpected error occurred: {str(e)}")
-        raise Exception(f"Unexpected error: {str(e)}")
+        timing.status = "error"
+        logger.error("Unexpected error occurred: %s", e)
+        raise RequestError(f"Unexpected error: {str(e)}", model)
+
+    finally:
+        timing.finish()
+        get_metrics().record(timing)
+        if owns_client:
+            await client.close()
 
 async def test_process_request():
     """
@@ -79,5 +528,15 @@ async def test_process_request():
     except Exception as e:
         print(f"Error occurred: {str(e)}")
 
+    try:
+        print("Streamed AI Response: ", end="")
+        async for chunk in stream_request(GROQ_API_KEY, "gemma-7b-it", test_messages):
+            print(chunk, end="", flush=True)
+        print()
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+
 if __name__ == "__main__":
+    from .logging_config import setup_logging
+    setup_logging()
     asyncio.run(test_process_request())
\ No newline at end of file
@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'response_cache')
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 24 * 3600  # seconds
+
+# Request fields that change the response and therefore belong in the key
+# Result of an in-flight fetch whose request was cancelled; waiters fetch for themselves
+_ABANDONED = object()
+
+SAMPLING_PARAMS = ("temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty")
+
+def make_cache_key(payload):
+    """
+    Build a canonical cache key for a chat completion request.
+
+    :param payload: The request body, as built by request_processor.build_payload
+    :return: A hex SHA-256 digest of the model, messages and sampling parameters
+    """
+    canonical = {
+        "model": payload["model"],
+        "messages": [{"role": m["role"], "content": m["content"]} for m in payload["messages"]],
+        "params": {name: payload[name] for name in SAMPLING_PARAMS if name in payload},
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache of API responses keyed by make_cache_key().
+
+    Entries live in a bounded in-memory LRU and, if persistence is enabled, in
+    one JSON file per key on disk. Both tiers honour a per-entry TTL. Disk
+    reads and writes run in the event loop's default executor. Concurrent
+    identical non-streamed requests share a single upstream call, through
+    get_or_fetch(); streamed requests are not registered as in flight, and
+    only join a non-streamed one through lookup().
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, directory=CACHE_DIR, persist=True):
+        """
+        :param max_entries: Maximum number of responses kept in memory
+        :param ttl: Default lifetime of an entry in seconds
+        :param directory: Directory for the on-disk tier
+        :param persist: Whether to use the on-disk tier at all
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _path_for(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return response
+
+    def _put_memory(self, key, response, expires_at):
+        with self._lock:
+            self._memory[key] = (expires_at, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        path = self._path_for(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", path, e)
+            return None
+
+        if entry.get("expires_at", 0) < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key, response, model, expires_at):
+        path = self._path_for(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"model": model, "expires_at": expires_at, "response": response}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not persist cache entry %s: %s", path, e)
+
+    async def get(self, key):
+        """
+        Look a response up in memory, then on disk.
+
+        :param key: The cache key
+        :return: The cached response, or None on a miss
+        """
+        response = self._get_memory(key)
+        if response is not None or not self.persist:
+            return response
+
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self._read_disk, key)
+        if entry is None:
+            return None
+        self._put_memory(key, entry["response"], entry["expires_at"])
+        return entry["response"]
+
+    async def put(self, key, response, model=None, ttl=None):
+        """
+        Store a response in both tiers.
+
+        :param key: The cache key
+        :param response: The response text
+        :param model: Optional. The model that produced the response, kept for inspection.
+        :param ttl: Optional. Lifetime in seconds, defaults to the cache's TTL.
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._put_memory(key, response, expires_at)
+        if self.persist:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_disk, key, response, model, expires_at)
+
+    async def lookup(self, key):
+        """
+        Look a response up, joining an identical request that is already in flight.
+
+        Hit and miss counters are updated.
+
+        :param key: The cache key
+        :return: The response, or None on a miss
+        """
+        response = await self.get(key)
+        if response is None and key in self._inflight:
+            try:
+                response = await asyncio.shield(self._inflight[key])
+            except Exception:
+                response = None
+            if response is _ABANDONED:
+                response = None
+
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    async def get_or_fetch(self, key, fetch, model=None):
+        """
+        Return a cached response or fetch, cache and return a fresh one.
+
+        An identical request already in flight is waited for instead. If that
+        request is cancelled, only it is: its waiters fetch for themselves.
+
+        :param key: The cache key
+        :param fetch: A coroutine function producing the response on a miss
+        :param model: Optional. The model the request is for.
+        :return: A tuple (response, hit)
+        """
+        response = await self.get(key)
+        if response is not None:
+            self.hits += 1
+            return response, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            response = await asyncio.shield(inflight)
+            if response is not _ABANDONED:
+                self.hits += 1
+                return response, True
+            return await self.get_or_fetch(key, fetch, model)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await fetch()
+        except asyncio.CancelledError:
+            future.set_result(_ABANDONED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters, if any, re-raise it; otherwise mark it retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(response)
+            await self.put(key, response, model)
+            return response, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self):
+        """
+        Get the cache's hit and miss counters.
+
+        :return: A dictionary with hits, misses, hit_rate and the number of in-memory entries
+        """
+        total = self.hits + self.misses
+        with self._lock:
+            entries = len(self._memory)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        """
+        Drop all in-memory entries. Files on disk expire through their TTL.
+        """
+        with self._lock:
+            self._memory.clear()
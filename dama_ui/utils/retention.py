@@ -0,0 +1,281 @@
+import os
+import sys
+import threading
+import time
+from .logging_config import get_logger, LOG_DIR
+from config.retention import RETENTION_POLICIES
+
+logger = get_logger(__name__)
+
+# Groups of files deleted between two short pauses, so cleanup leaves disk bandwidth to the app
+PAUSE_EVERY = 100
+PAUSE_SECONDS = 0.01
+
+DAY = 24 * 3600
+
+class RetentionReport:
+    """
+    What a retention run deleted and kept, per target.
+    """
+
+    def __init__(self):
+        self.targets = {}
+        self.elapsed = 0.0
+
+    def add(self, target, files=0, reclaimed=0, kept=0):
+        """
+        Count the work done on a target.
+
+        :param target: The target's name
+        :param files: Files deleted
+        :param reclaimed: Bytes freed
+        :param kept: Bytes the target still uses
+        """
+        counts = self.targets.setdefault(target, {"files": 0, "bytes_reclaimed": 0, "bytes_kept": 0})
+        counts["files"] += files
+        counts["bytes_reclaimed"] += reclaimed
+        counts["bytes_kept"] = kept
+
+    @property
+    def files(self):
+        return sum(counts["files"] for counts in self.targets.values())
+
+    @property
+    def bytes_reclaimed(self):
+        return sum(counts["bytes_reclaimed"] for counts in self.targets.values())
+
+    def as_dict(self):
+        return {"elapsed": round(self.elapsed, 3), "files": self.files, "bytes_reclaimed": self.bytes_reclaimed,
+                "targets": self.targets}
+
+    def summary(self):
+        details = ", ".join(f"{target}: {counts['files']} files, {counts['bytes_reclaimed'] / 1024 / 1024:.1f} MB"
+                            for target, counts in self.targets.items())
+        return (f"Reclaimed {self.bytes_reclaimed / 1024 / 1024:.1f} MB from {self.files} files "
+                f"in {self.elapsed:.2f}s ({details})")
+
+def lower_thread_priority():
+    """
+    Lower the scheduling priority of the calling thread as far as possible.
+
+    Only done on Linux, where the nice value is per thread; elsewhere it would
+    slow down the whole process, UI included.
+    """
+    if not sys.platform.startswith('linux') or not hasattr(os, 'setpriority'):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except OSError as e:
+        logger.debug("Could not lower the cleanup thread's priority: %s", e)
+
+def scan_groups(directory):
+    """
+    Walk a directory tree with os.scandir and group its files by name stem.
+
+    Files sharing the part of their name before the first dot belong
+    together, such as a session's journal and index or a log and its rotated
+    backups, and are kept or deleted together.
+
+    :param directory: The directory to walk
+    :return: A list of [last modified, total size, paths], in no particular order
+    """
+    groups = {}
+    pending = [directory]
+    while pending:
+        try:
+            iterator = os.scandir(pending.pop())
+        except FileNotFoundError:
+            continue
+        with iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                key = os.path.join(os.path.dirname(entry.path), entry.name.split('.', 1)[0])
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [0.0, 0, []]
+                group[0] = max(group[0], stat.st_mtime)
+                group[1] += stat.st_size
+                group[2].append(entry.path)
+    return list(groups.values())
+
+def expire_groups(groups, max_age_days=None, max_bytes=None, now=None, keep_latest=1, on_delete=None):
+    """
+    Delete groups of files, oldest first, until the rest is within both budgets.
+
+    :param groups: Groups of files as returned by scan_groups()
+    :param max_age_days: Optional. Groups last modified longer ago than this are deleted.
+    :param max_bytes: Optional. Oldest groups are deleted until the total size fits.
+    :param now: Optional. Unix timestamp to measure ages from, defaults to now.
+    :param keep_latest: Number of most recent groups never deleted, e.g. the log being written
+    :param on_delete: Optional callback called with the paths of every deleted group
+    :return: (files deleted, bytes freed, bytes kept)
+    """
+    now = time.time() if now is None else now
+    cutoff = now - max_age_days * DAY if max_age_days is not None else None
+    groups = sorted(groups, key=lambda group: group[0])
+    total = sum(group[1] for group in groups)
+    files = reclaimed = 0
+    deletions = 0
+
+    for mtime, size, paths in groups[:max(0, len(groups) - keep_latest)]:
+        expired = cutoff is not None and mtime < cutoff
+        over_budget = max_bytes is not None and total > max_bytes
+        if not expired and not over_budget:
+            break
+        deleted = []
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Typically a file still open elsewhere on Windows; tried again next run
+                logger.warning("Could not delete %s: %s", path, e)
+                continue
+            deleted.append(path)
+        if len(deleted) == len(paths):
+            total -= size
+            reclaimed += size
+        files += len(deleted)
+        if deleted and on_delete:
+            on_delete(deleted)
+        deletions += 1
+        if deletions % PAUSE_EVERY == 0:
+            time.sleep(PAUSE_SECONDS)
+    return files, reclaimed, total
+
+def clean_directory(directory, policy, now=None, keep_latest=1, on_delete=None):
+    """
+    Apply a retention policy to the files of a directory tree.
+
+    :param directory: The directory to clean
+    :param policy: A dictionary with max_age_days and max_bytes
+    :return: (files deleted, bytes freed, bytes kept)
+    """
+    return expire_groups(scan_groups(directory), policy.get("max_age_days"), policy.get("max_bytes"), now,
+                         keep_latest, on_delete)
+
+def clean_artifacts(policy, now=None, store=None, search_index=None):
+    """
+    Apply a retention policy to the artifact store, through its index.
+
+    Contents are deleted by when they were last produced, oldest first, so
+    the store and its index stay consistent and no directory is walked.
+
+    :param policy: A dictionary with max_age_days and max_bytes
+    :param store: Optional. The ArtifactStore, defaults to the application's.
+    :param search_index: Optional. A SearchIndex to remove deleted artifacts from.
+    :return: (files deleted, bytes freed, bytes kept)
+    """
+    from .artifact_store import get_artifact_store
+
+    store = store or get_artifact_store()
+    now = time.time() if now is None else now
+    max_age_days, max_bytes = policy.get("max_age_days"), policy.get("max_bytes")
+    cutoff = now - max_age_days * DAY if max_age_days is not None else None
+    total = store.stats()["bytes"]
+    files = reclaimed = 0
+
+    for digest, last_ts, _ in store.blobs_by_age():
+        expired = cutoff is not None and last_ts < cutoff
+        over_budget = max_bytes is not None and total > max_bytes
+        if not expired and not over_budget:
+            break
+        freed = store.delete(digest)
+        if search_index is not None:
+            search_index.remove_artifact(digest)
+        # Nothing was freed if the content was already gone, e.g. deleted concurrently
+        total -= freed
+        reclaimed += freed
+        files += 1
+        if files % PAUSE_EVERY == 0:
+            time.sleep(PAUSE_SECONDS)
+    return files, reclaimed, total
+
+def clean_usage(policy, now=None, ledger=None):
+    """
+    Delete usage ledger records older than the policy's age budget.
+
+    :return: The number of records deleted
+    """
+    from .usage_ledger import get_ledger
+
+    max_age_days = policy.get("max_age_days")
+    if max_age_days is None:
+        return 0
+    now = time.time() if now is None else now
+    return (ledger or get_ledger()).prune(now - max_age_days * DAY)
+
+def run_retention(policies=None, now=None, low_priority=True):
+    """
+    Apply the retention policies to logs, artifacts, cached responses, sessions and usage records.
+
+    Meant to run on a background thread. A target that fails is logged and
+    skipped, so the others are still cleaned.
+
+    :param policies: Optional. Policies by target, defaults to config.retention.RETENTION_POLICIES.
+    :param now: Optional. Unix timestamp to measure ages from, defaults to now.
+    :param low_priority: Whether to lower the calling thread's priority first
+    :return: A RetentionReport
+    """
+    from .response_cache import CACHE_DIR
+    from .session_store import SESSIONS_DIR
+    from .search_index import get_search_index
+
+    if low_priority:
+        lower_thread_priority()
+    policies = RETENTION_POLICIES if policies is None else policies
+    now = time.time() if now is None else now
+    report = RetentionReport()
+    start_time = time.perf_counter()
+
+    def forget_sessions(paths):
+        for session_id in {os.path.basename(path).split('.', 1)[0] for path in paths}:
+            get_search_index().remove_session(session_id)
+
+    targets = {
+        "logs": lambda policy: clean_directory(LOG_DIR, policy, now),
+        "response_cache": lambda policy: clean_directory(CACHE_DIR, policy, now, keep_latest=0),
+        # The newest session is the one resumed at startup, and may be open
+        "sessions": lambda policy: clean_directory(SESSIONS_DIR, policy, now, on_delete=forget_sessions),
+        "artifacts": lambda policy: clean_artifacts(policy, now, search_index=get_search_index()),
+    }
+    for target, clean in targets.items():
+        policy = policies.get(target)
+        if not policy:
+            continue
+        try:
+            report.add(target, *clean(policy))
+        except Exception as e:
+            logger.error("Error applying the %s retention policy: %s", target, e)
+
+    if policies.get("usage"):
+        try:
+            pruned = clean_usage(policies["usage"], now)
+            if pruned:
+                logger.info("Pruned %d usage records", pruned)
+        except Exception as e:
+            logger.error("Error applying the usage retention policy: %s", e)
+
+    report.elapsed = time.perf_counter() - start_time
+    logger.info("%s", report.summary())
+    return report
+
+# Example usage and testing
+if __name__ == "__main__":
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    for day in range(10):
+        path = os.path.join(directory, f"dama_ui_2024-01-{day + 1:02d}.log")
+        with open(path, 'wb') as f:
+            f.write(b"x" * 1024 * 1024)
+        os.utime(path, (time.time() - (10 - day) * DAY,) * 2)
+    files, reclaimed, kept = clean_directory(directory, {"max_age_days": 7, "max_bytes": 4 * 1024 * 1024})
+    print(f"Deleted {files} files, freed {reclaimed} bytes, kept {kept} bytes")
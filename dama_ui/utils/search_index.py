@@ -0,0 +1,411 @@
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SEARCH_INDEX_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'search_index.db')
+
+# Seconds between background writes of buffered documents
+FLUSH_INTERVAL = 1
+
+# Buffered documents that trigger an immediate write
+FLUSH_BATCH_SIZE = 200
+
+# Messages read per step when catching up with a session journal
+CATCH_UP_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    content, title,
+    kind UNINDEXED, session_id UNINDEXED, position UNINDEXED, ref UNINDEXED, ts UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS indexed_sessions (
+    session_id TEXT PRIMARY KEY,
+    messages INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indexed_messages (
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (session_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS indexed_artifacts (
+    digest TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+RESULT_COLUMNS = ("kind", "session_id", "position", "ref", "title", "ts")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as a prefix.
+
+    Words are quoted, so FTS5 operators typed by the user are searched as text.
+
+    :return: The query, or None if the text has no words
+    """
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+class SearchIndex:
+    """
+    Full-text index of past messages and artifacts, stored in SQLite FTS5.
+
+    Documents are buffered in memory and written in batches by a background
+    thread, so indexing never waits for disk. Each message position and each
+    artifact content is written once, however often it is added, so live
+    indexing and catch_up() may overlap. Searches flush the buffer first and
+    return results ranked by BM25. If this SQLite build has no FTS5, the
+    index is disabled and searches return nothing.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_FILE, flush_interval=FLUSH_INTERVAL):
+        """
+        :param path: The SQLite database file
+        :param flush_interval: Seconds between background writes
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.enabled = True
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        except sqlite3.OperationalError as e:
+            logger.error("Full-text search is unavailable: %s", e)
+            self.enabled = False
+
+    def add_message(self, session_id, position, sender, content, ts=None):
+        """
+        Index a message of a session. Written on the next background flush.
+
+        :param session_id: The session the message belongs to
+        :param position: The message's index in the session transcript
+        :param sender: Who sent the message, as displayed
+        :param content: The message text
+        :param ts: Optional. Unix timestamp of the message, defaults to now.
+        """
+        self._add((content, sender, "message", session_id, position, None, time.time() if ts is None else ts))
+
+    def add_artifact(self, digest, title, content, session_id=None, ts=None):
+        """
+        Index an artifact. Written on the next background flush.
+
+        :param digest: The artifact's content hash in the artifact store
+        :param title: The artifact's title
+        :param content: The artifact's text
+        :param session_id: Optional. The session the artifact was produced in.
+        :param ts: Optional. Unix timestamp of the artifact, defaults to now.
+        """
+        self._add((content, title, "artifact", session_id, None, digest, time.time() if ts is None else ts))
+
+    def search(self, text, limit=50, kind=None):
+        """
+        Search the index.
+
+        :param text: Free text; every word must match, the last one as a prefix
+        :param limit: Maximum number of results
+        :param kind: Optional. "message" or "artifact" to search only one kind.
+        :return: A list of result dictionaries, best first, each with a snippet
+        """
+        query = build_match_query(text)
+        if not query or not self.enabled:
+            return []
+        sql = (f"SELECT {', '.join(RESULT_COLUMNS)}, "
+               "snippet(documents, 0, '[', ']', '...', 12) AS snippet, bm25(documents, 1.0, 2.0) AS score "
+               "FROM documents WHERE documents MATCH ?")
+        params = [query]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        self.flush()
+        with self._db_lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def catch_up(self, sessions_dir=None, artifact_store=None):
+        """
+        Index the messages and artifacts persisted while the index was not being fed.
+
+        Each session journal is read from the position a previous catch-up
+        reached, and the artifact store from the last artifact it saw; what
+        was indexed live in the meantime is skipped when written. Meant to
+        run in the background.
+
+        :param sessions_dir: Optional. Directory of the session journals.
+        :param artifact_store: Optional. The ArtifactStore to index.
+        :return: The number of messages and artifacts read; already indexed ones are not written again
+        """
+        from .session_store import SESSIONS_DIR, SessionTranscript
+
+        if not self.enabled:
+            return 0
+        self.flush()
+        added = 0
+        sessions_dir = sessions_dir or SESSIONS_DIR
+        with self._db_lock:
+            indexed = dict(self._conn.execute("SELECT session_id, messages FROM indexed_sessions").fetchall())
+        try:
+            entries = [entry for entry in os.scandir(sessions_dir) if entry.name.endswith('.jsonl')]
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            transcript = SessionTranscript(entry.name[:-len('.jsonl')], sessions_dir, read_only=True)
+            try:
+                start = position = indexed.get(transcript.session_id, 0)
+                while position < len(transcript):
+                    records = transcript.read_records(position, position + CATCH_UP_BATCH_SIZE)
+                    if not records:
+                        break
+                    for offset, record in enumerate(records):
+                        self.add_message(transcript.session_id, position + offset, record["sender"],
+                                         record["content"], record.get("ts"))
+                    position += len(records)
+            finally:
+                transcript.close()
+            if position > start:
+                # Every message before `position` is now indexed, whether by this
+                # catch-up or live, so the next catch-up starts from there
+                self.flush()
+                self._set_watermark("INSERT INTO indexed_sessions (session_id, messages) VALUES (?, ?) "
+                                    "ON CONFLICT (session_id) DO UPDATE SET messages = excluded.messages",
+                                    (transcript.session_id, position))
+                added += position - start
+
+        if artifact_store is not None:
+            with self._db_lock:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'artifact_ts'").fetchone()
+            since = float(row["value"]) if row else None
+            latest = since
+            for handle in artifact_store.list(since=since):
+                latest = handle.ts if latest is None else max(latest, handle.ts)
+                try:
+                    self.add_artifact(handle.digest, handle.title, handle.read(), handle.session_id, handle.ts)
+                    added += 1
+                except OSError as e:
+                    logger.warning("Skipping artifact %s: %s", handle.path, e)
+            self.flush()
+            if latest is not None and latest != since:
+                self._set_watermark("INSERT INTO meta (key, value) VALUES ('artifact_ts', ?) "
+                                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (latest,))
+        self.flush()
+        logger.info("Search index caught up with %d documents", added)
+        return added
+
+    def remove_session(self, session_id):
+        """
+        Remove the messages of a deleted session from the index.
+        """
+        if not self.enabled:
+            return
+        self.flush()
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE kind = 'message' AND session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM indexed_messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM indexed_sessions WHERE session_id = ?", (session_id,))
+
+    def remove_artifact(self, digest):
+        """
+        Remove a deleted artifact from the index.
+        """
+        if not self.enabled:
+            return
+        self.flush()
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE kind = 'artifact' AND ref = ?", (digest,))
+            self._conn.execute("DELETE FROM indexed_artifacts WHERE digest = ?", (digest,))
+
+    def flush(self):
+        """
+        Write all buffered documents in a single transaction.
+        """
+        # The database lock is taken first so that a flush returns only once
+        # everything buffered before it, even rows another flush took, is written
+        with self._db_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if rows and self.enabled:
+                self._write(rows)
+
+    def _set_watermark(self, sql, params):
+        with self._db_lock, self._conn:
+            self._conn.execute(sql, params)
+
+    def _write(self, rows):
+        try:
+            with self._conn:
+                documents = []
+                for row in rows:
+                    _, _, kind, session_id, position, ref, _ = row
+                    if kind == "message":
+                        cursor = self._conn.execute(
+                            "INSERT OR IGNORE INTO indexed_messages (session_id, position) VALUES (?, ?)",
+                            (session_id, position)
+                        )
+                    else:
+                        cursor = self._conn.execute("INSERT OR IGNORE INTO indexed_artifacts (digest) VALUES (?)",
+                                                    (ref,))
+                    if cursor.rowcount:
+                        documents.append(row)
+                self._conn.executemany(
+                    "INSERT INTO documents (content, title, kind, session_id, position, ref, ts) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    documents
+                )
+        except sqlite3.Error as e:
+            logger.error("Error indexing %d documents: %s", len(rows), e)
+            with self._pending_lock:
+                self._pending[:0] = rows
+
+    def start(self):
+        """
+        Start the background writer thread if it is not running yet.
+        """
+        if self._thread is not None:
+            return
+        with self._pending_lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Stop the writer thread, write pending documents and close the database.
+        """
+        thread = self._thread
+        if thread is not None:
+            self._stop_event.set()
+            self._wake_event.set()
+            thread.join()
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def _add(self, row):
+        if not self.enabled:
+            return
+        with self._pending_lock:
+            self._pending.append(row)
+            pending = len(self._pending)
+        self.start()
+        if pending >= FLUSH_BATCH_SIZE:
+            self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.flush_interval)
+            self._wake_event.clear()
+            self.flush()
+
+_index = None
+_index_lock = threading.Lock()
+# Documents added before the index was opened, as (method name, arguments)
+_queued = []
+_queued_lock = threading.Lock()
+
+def get_search_index():
+    """
+    Get the application's search index, opening it on first use.
+
+    Documents queued by index_message() and index_artifact() before then are
+    added once it is open.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = SearchIndex()
+                with _queued_lock:
+                    for method, args in _queued:
+                        getattr(index, method)(*args)
+                    _queued.clear()
+                    _index = index
+    return _index
+
+def _add_document(method, args):
+    # Never opens the index: callers such as the Tk thread must not wait for
+    # the database, so until warm-up has opened it documents are queued
+    with _queued_lock:
+        index = _index
+        if index is None:
+            _queued.append((method, args))
+            return
+    try:
+        getattr(index, method)(*args)
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Error indexing %s: %s", method, e)
+
+def index_message(session_id, position, sender, content):
+    """
+    Index a message in the search index.
+
+    Never blocks on the database and never raises, so sending a message
+    never waits or fails because of search.
+    """
+    _add_document("add_message", (session_id, position, sender, content))
+
+def index_artifact(digest, title, content, session_id=None, ts=None):
+    """
+    Index an artifact in the search index, without blocking like index_message().
+
+    :param ts: Optional. The artifact's timestamp in the artifact store.
+    """
+    _add_document("add_artifact", (digest, title, content, session_id, ts))
+
+def shutdown_search_index():
+    """
+    Write pending documents and close the search index.
+    """
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+            _index = None
+
+atexit.register(shutdown_search_index)
+
+# Example usage and testing
+if __name__ == "__main__":
+    import tempfile
+
+    index = SearchIndex(os.path.join(tempfile.mkdtemp(), 'search_index.db'))
+    index.add_message("example", 0, "You", "How do I match an email address with a regex?")
+    index.add_message("example", 1, "AI", "Use a regular expression such as [^@]+@[^@]+ for a loose match.")
+    index.add_artifact("0" * 64, "Python Artifact", "import re\nEMAIL = re.compile(r'[^@]+@[^@]+')", "example")
+    for query in ("regex", "email match", "re.comp"):
+        started = time.perf_counter()
+        results = index.search(query)
+        print(f"{query!r}: {len(results)} results in {(time.perf_counter() - started) * 1000:.2f} ms")
+        for result in results:
+            print(f"  {result['kind']} {result['title']}: {result['snippet']}")
+    index.close()
@@ -0,0 +1,466 @@
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SESSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'sessions')
+
+# Seconds between two fsyncs of a session's files; appends only write to the OS
+FSYNC_INTERVAL = 1.0
+
+# Superseded partial records that make the journal worth compacting
+COMPACT_MIN_BYTES = 1024 * 1024
+COMPACT_RATIO = 0.25
+
+# Messages read per step when walking the journal backwards
+TAIL_BATCH_SIZE = 64
+
+# One little-endian int64 journal offset per message in the .idx file
+_OFFSET = struct.Struct('<q')
+
+class SessionTranscript:
+    """
+    Append-only journal of the messages of one chat session.
+
+    Each message is one JSON line in <session>.jsonl, with its role and
+    cached token count when it is part of the conversation history. Its byte
+    offset goes to <session>.idx, so any range of messages, and the tail
+    of the session in particular, is read back without scanning the journal
+    or keeping its offsets in memory.
+
+    Appends are written to the OS right away and fsynced in batches every
+    FSYNC_INTERVAL seconds by a background thread. Text that is still
+    streaming is journaled as partial records tagged with their stream, so
+    several answers can stream at once; the complete message of a stream
+    supersedes its partial records, and compact() drops them once they are a
+    large share of the file. Reopening a session repairs what a crash left
+    behind: a torn last line, messages missing from the index, and answers
+    cut off mid-stream.
+    """
+
+    def __init__(self, session_id=None, directory=SESSIONS_DIR, read_only=False):
+        """
+        :param session_id: Optional. Identifier of the session, defaults to the current time.
+                           An existing session with this identifier is reopened.
+        :param directory: Directory the session files are stored in
+        :param read_only: Open an existing session for reading only, e.g. while another
+                          instance writes to it. Only the messages in its index are visible
+                          and nothing is repaired.
+        """
+        self.session_id = session_id or datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        self.path = os.path.join(directory, f"{self.session_id}.jsonl")
+        self.index_path = os.path.join(directory, f"{self.session_id}.idx")
+        self._count = 0
+        self._size = 0
+        self._partial_bytes = 0
+        # Streams with partial records not yet superseded by their message
+        self._open_streams = set()
+        self._dirty = False
+        self._writer = None
+        self._index_writer = None
+        self._reader = None
+        self._index_reader = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        if read_only:
+            if os.path.exists(self.index_path):
+                self._count = os.path.getsize(self.index_path) // _OFFSET.size
+        elif os.path.exists(self.path):
+            self._recover()
+
+    @classmethod
+    def latest(cls, directory=SESSIONS_DIR):
+        """
+        Reopen the most recently written session.
+
+        :param directory: Directory the session files are stored in
+        :return: A SessionTranscript, or None if there is no session with messages
+        """
+        try:
+            entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.jsonl')]
+        except FileNotFoundError:
+            return None
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime, reverse=True):
+            transcript = cls(entry.name[:-len('.jsonl')], directory)
+            if len(transcript):
+                return transcript
+            transcript.close()
+        return None
+
+    def __len__(self):
+        return self._count
+
+    def append(self, sender, message, role=None, tokens=None, stream=None):
+        """
+        Append a message to the journal.
+
+        :param sender: Who sent the message, as displayed (e.g. "You" or "AI")
+        :param message: The message text
+        :param role: Optional. "user" or "assistant" if the message is part of the conversation history.
+        :param tokens: Optional. The message's token count, kept so it is never tokenized again.
+        :param stream: Optional. The stream this message completes; its partial records are superseded.
+        :return: The index of the message in the transcript
+        """
+        with self._lock:
+            record = {"type": "message", "seq": self._count, "sender": sender, "content": message,
+                      "role": role, "tokens": tokens, "ts": time.time()}
+            if stream is not None:
+                record["stream"] = stream
+            # Untagged partial records are superseded by any message
+            self._open_streams.difference_update((None, stream))
+            if self._open_streams:
+                # Other streams' partial records may precede this message; recovery reads back past it
+                record["open_streams"] = True
+            self._write_message(record)
+            return self._count - 1
+
+    def append_partial(self, sender, text, stream=None):
+        """
+        Journal a piece of a message that is still streaming.
+
+        The pieces of a stream are replaced by the append() of its complete
+        message, and are turned into a message when the session is reopened
+        without one.
+
+        :param stream: Optional. Identifies the stream, e.g. the request, when several run at once.
+        """
+        data = (json.dumps({"type": "partial", "sender": sender, "content": text, "stream": stream},
+                           ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            self._write(data)
+            self._partial_bytes += len(data)
+            self._open_streams.add(stream)
+
+    def read(self, start, end):
+        """
+        Read a range of messages back from disk.
+
+        :param start: Index of the first message to read
+        :param end: Index one past the last message to read
+        :return: A list of (sender, message) tuples
+        """
+        return [(record["sender"], record["content"]) for record in self.read_records(start, end)]
+
+    def read_records(self, start, end):
+        """
+        Read a range of message records, with their role and token count.
+
+        :param start: Index of the first message to read
+        :param end: Index one past the last message to read
+        :return: A list of record dictionaries
+        """
+        start = max(0, start)
+        with self._lock:
+            end = min(end, self._count)
+            if start >= end:
+                return []
+            if self._reader is None:
+                self._reader = open(self.path, 'rb')
+                self._index_reader = open(self.index_path, 'rb')
+            self._index_reader.seek(start * _OFFSET.size)
+            first = _OFFSET.unpack(self._index_reader.read(_OFFSET.size))[0]
+            self._reader.seek(first)
+            records = []
+            while len(records) < end - start:
+                record = json.loads(self._reader.readline())
+                if record.get("type", "message") == "message":
+                    records.append(record)
+            return records
+
+    def history_tail(self, max_tokens):
+        """
+        Read the newest history messages, back to max_tokens, without reading the rest.
+
+        :param max_tokens: Tokens to read at most; the newest message is always included
+        :return: A list of (role, content, tokens) tuples, oldest first; tokens is None if unknown
+        """
+        tail = []
+        used = 0
+        end = len(self)
+        while end > 0:
+            start = max(0, end - TAIL_BATCH_SIZE)
+            for record in reversed(self.read_records(start, end)):
+                if not record.get("role"):
+                    continue
+                tokens = record.get("tokens")
+                if tail and used + (tokens or 0) > max_tokens:
+                    return tail[::-1]
+                tail.append((record["role"], record["content"], tokens))
+                used += tokens or 0
+            end = start
+        return tail[::-1]
+
+    def compact(self):
+        """
+        Rewrite the journal without its superseded partial records.
+
+        The bulk of the copy runs without the lock, since the journal before
+        its current end never changes; only what was appended meanwhile is
+        copied while appends wait.
+
+        :return: The number of bytes saved
+        """
+        with self._compact_lock:
+            return self._compact()
+
+    def _compact(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+            snapshot = self._size
+        tmp_path, tmp_index_path = f"{self.path}.tmp", f"{self.index_path}.tmp"
+        with open(self.path, 'rb') as source, open(tmp_path, 'wb') as journal, \
+                open(tmp_index_path, 'wb') as index:
+            pending = self._copy_messages(source, snapshot, journal, index, [])
+            with self._lock:
+                if self._writer is not None:
+                    self._writer.flush()
+                pending = self._copy_messages(source, self._size, journal, index, pending)
+                # Partial records not superseded belong to streams in progress
+                journal.writelines(line for _, line in pending)
+                journal.flush()
+                index.flush()
+                os.fsync(journal.fileno())
+                os.fsync(index.fileno())
+                saved = self._size - journal.tell()
+                self._close_files()
+                # A crash between the two renames leaves an index that recovery rebuilds
+                os.replace(tmp_path, self.path)
+                os.replace(tmp_index_path, self.index_path)
+                self._size = os.path.getsize(self.path)
+                self._partial_bytes = sum(len(line) for _, line in pending)
+        logger.info("Compacted session %s, saving %d bytes", self.session_id, saved)
+        return saved
+
+    def flush(self, sync=True):
+        """
+        Write buffered data to the OS and, if sync, to disk.
+        """
+        with self._lock:
+            if self._writer is None:
+                return
+            self._writer.flush()
+            self._index_writer.flush()
+            if not (sync and self._dirty):
+                return
+            self._dirty = False
+            # fsync duplicates so the lock is not held while the disk catches up
+            fds = [os.dup(handle.fileno()) for handle in (self._writer, self._index_writer)]
+        for fd in fds:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def close(self):
+        thread = self._thread
+        if thread is not None:
+            self._stop_event.set()
+            thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            self._close_files()
+
+    def _write_message(self, record):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        offset = self._size
+        self._write(data)
+        self._index_writer.write(_OFFSET.pack(offset))
+        self._index_writer.flush()
+        self._count += 1
+
+    def _write(self, data):
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._writer = open(self.path, 'ab')
+            self._index_writer = open(self.index_path, 'ab')
+            self._size = self._writer.tell()
+        self._writer.write(data)
+        self._writer.flush()
+        self._size += len(data)
+        self._dirty = True
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=f"session-{self.session_id}", daemon=True)
+            self._thread.start()
+
+    def _close_files(self):
+        for handle in (self._writer, self._index_writer, self._reader, self._index_reader):
+            if handle is not None:
+                handle.close()
+        self._writer = self._index_writer = self._reader = self._index_reader = None
+
+    def _run(self):
+        while not self._stop_event.wait(FSYNC_INTERVAL):
+            try:
+                self.flush()
+                if self._partial_bytes >= COMPACT_MIN_BYTES and not self._open_streams \
+                        and self._partial_bytes >= COMPACT_RATIO * self._size:
+                    self.compact()
+            except OSError as e:
+                logger.error("Error syncing session %s: %s", self.session_id, e)
+
+    @staticmethod
+    def _copy_messages(source, end, journal, index, pending):
+        """
+        Copy the message records up to offset end from source, indexing them.
+
+        Partial records are held back in pending and dropped once the message
+        of their stream follows them.
+
+        :return: The partial records not yet superseded, as (stream, line)
+        """
+        while source.tell() < end:
+            line = source.readline()
+            if not line.endswith(b"\n"):
+                break
+            if line.startswith(b'{"type": "partial"'):
+                pending.append((json.loads(line).get("stream"), line))
+                continue
+            if pending:
+                stream = json.loads(line).get("stream")
+                pending = [(other, partial) for other, partial in pending if other not in (None, stream)]
+            index.write(_OFFSET.pack(journal.tell()))
+            journal.write(line)
+        return pending
+
+    def _recover(self):
+        """
+        Check the journal against its index and repair what a crash left behind.
+
+        Only the journal after the last indexed message is read, unless the
+        index is missing or does not match, in which case it is rebuilt.
+        """
+        size = os.path.getsize(self.path)
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        count = index_size // _OFFSET.size
+
+        with open(self.path, 'rb') as journal:
+            start = scan_from = 0
+            if count:
+                with open(self.index_path, 'rb') as index:
+                    index.seek((count - 1) * _OFFSET.size)
+                    start = _OFFSET.unpack(index.read(_OFFSET.size))[0]
+                journal.seek(start)
+                try:
+                    record = json.loads(journal.readline())
+                    valid = record.get("seq", count - 1) == count - 1
+                except ValueError:
+                    valid = False
+                if valid:
+                    last = start
+                    start = journal.tell()
+                    scan_from = self._partials_start(journal, count, record, last)
+                else:
+                    logger.warning("Rebuilding the index of session %s", self.session_id)
+                    count, start = 0, 0
+            offsets, streams, good_end = self._scan(journal, start, size, scan_from)
+
+        with open(self.index_path, 'r+b' if count else 'wb') as index:
+            index.truncate(count * _OFFSET.size)
+            index.seek(0, os.SEEK_END)
+            for offset in offsets:
+                index.write(_OFFSET.pack(offset))
+        if good_end < size:
+            logger.warning("Dropping %d bytes of a torn record at the end of session %s",
+                           size - good_end, self.session_id)
+            with open(self.path, 'r+b') as journal:
+                journal.truncate(good_end)
+
+        self._count = count + len(offsets)
+        self._size = good_end
+        self._partial_bytes = sum(len(text) for _, texts in streams.values() for text in texts)
+        # The app stopped while answers were streaming; keep what had arrived, one message per stream
+        for stream, (sender, texts) in streams.items():
+            content = "".join(texts) + "\n\n[Interrupted]"
+            with self._lock:
+                record = {"type": "message", "seq": self._count, "sender": sender, "content": content,
+                          "role": None, "tokens": None, "ts": time.time()}
+                if stream is not None:
+                    record["stream"] = stream
+                self._write_message(record)
+
+    def _partials_start(self, journal, count, record, offset):
+        """
+        Find where the partial records of streams open at the last message may start.
+
+        Walks the index back from the last message, at offset, to the newest
+        message appended while no stream was open.
+
+        :param record: The last message's record
+        :return: The offset to read partial records from
+        """
+        position = count - 1
+        with open(self.index_path, 'rb') as index:
+            while record.get("open_streams") and position > 0:
+                position -= 1
+                index.seek(position * _OFFSET.size)
+                offset = _OFFSET.unpack(index.read(_OFFSET.size))[0]
+                journal.seek(offset)
+                record = json.loads(journal.readline())
+        return 0 if record.get("open_streams") else offset
+
+    @staticmethod
+    def _scan(journal, start, size, scan_from):
+        """
+        Read the journal, collecting the message offsets from start and the partial records not superseded.
+
+        :param scan_from: Where to start reading partial records, at or before start
+        :return: (offsets, {stream: (sender, [text])} of open streams, end of the last good line)
+        """
+        offsets, streams = [], {}
+        journal.seek(scan_from)
+        position = good_end = scan_from
+        while position < size:
+            line = journal.readline()
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                record = json.loads(line)
+            except ValueError:
+                if position < start:  # Indexed already, so not torn
+                    position += len(line)
+                    continue
+                break
+            if record.get("type", "message") == "partial":
+                streams.setdefault(record.get("stream"), (record["sender"], []))[1].append(record["content"])
+            else:
+                if position >= start:
+                    offsets.append(position)
+                streams.pop(None, None)
+                streams.pop(record.get("stream"), None)
+            position += len(line)
+            good_end = position
+        return offsets, streams, max(good_end, start)
+
+# Example usage and testing
+if __name__ == "__main__":
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    transcript = SessionTranscript("example", directory)
+    for i in range(1000):
+        transcript.append("You", f"Question {i}", "user", 3)
+        for piece in ("The ", "answer ", f"is {i}."):
+            transcript.append_partial("AI", piece)
+        transcript.append("AI", f"The answer is {i}.", "assistant", 5)
+    transcript.append_partial("AI", "Cut off mid-")
+    transcript.close()
+
+    started = time.perf_counter()
+    resumed = SessionTranscript.latest(directory)
+    tail = resumed.history_tail(40)
+    print(f"Resumed {len(resumed)} messages in {(time.perf_counter() - started) * 1000:.1f} ms")
+    print("History tail:", tail[-3:])
+    print("Last messages:", resumed.read(len(resumed) - 2, len(resumed)))
+    print("Compaction saved", resumed.compact(), "bytes;", resumed.read(0, 2))
+    resumed.close()
@@ -0,0 +1,88 @@
+import threading
+import time
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class StartupProfiler:
+    """
+    Records how long each phase of application startup takes.
+
+    Phases are recorded with mark(), which closes the phase that started at
+    the previous mark, or with measure() for work that runs on another thread.
+    """
+
+    def __init__(self, start=None):
+        """
+        :param start: Optional. time.perf_counter() value at process start, defaults to now.
+        """
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self._phases = []
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """
+        End the current phase on the main startup path.
+
+        :param name: Name of the phase that just finished
+        """
+        now = time.perf_counter()
+        with self._lock:
+            self._phases.append((name, self._last - self.start, now - self._last, "main"))
+            self._last = now
+
+    def measure(self, name, func, *args):
+        """
+        Run func(*args) and record its duration as a background phase.
+
+        :return: Whatever func returns
+        """
+        began = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._phases.append((name, began - self.start, time.perf_counter() - began,
+                                     threading.current_thread().name))
+
+    def report(self):
+        """
+        Format the recorded phases as a table.
+
+        :return: A multi-line string with one row per phase
+        """
+        with self._lock:
+            phases = sorted(self._phases, key=lambda phase: phase[1])
+        lines = [f"{'phase':<28} {'start ms':>9} {'took ms':>9}  thread"]
+        for name, offset, duration, thread in phases:
+            lines.append(f"{name:<28} {offset * 1000:>9.1f} {duration * 1000:>9.1f}  {thread}")
+        return "\n".join(lines)
+
+def start_warmup(tasks, profiler=None, on_done=None):
+    """
+    Run slow initialization work on a background thread.
+
+    Failures are logged and do not stop the remaining tasks; whatever was not
+    warmed up is simply loaded on first use instead.
+
+    :param tasks: A list of (name, callable) pairs, run in order
+    :param profiler: Optional. A StartupProfiler that records each task.
+    :param on_done: Optional. Called without arguments, on the warm-up thread, once all tasks ran.
+    :return: The started thread
+    """
+    def run():
+        for name, func in tasks:
+            try:
+                if profiler:
+                    profiler.measure(name, func)
+                else:
+                    func()
+            except Exception as e:
+                logger.warning("Warm-up task '%s' failed: %s", name, e)
+        if on_done:
+            on_done()
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
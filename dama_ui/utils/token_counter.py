@@ -1,8 +1,62 @@
-import tiktoken
+import threading
+import time
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# For gemma, llama and mixtral models we use the cl100k_base encoding.
+# This is an approximation, as the exact tokenizers for these models differ.
+ENCODING_NAME = "cl100k_base"
+
+# Seconds to wait before trying to load the encoding again after a failure
+ENCODING_RETRY_INTERVAL = 300
+
+# Rough characters-per-token ratio used while the encoding is unavailable
+FALLBACK_CHARS_PER_TOKEN = 4
+
+# Tokens each model family's chat template adds around a single message
+MESSAGE_OVERHEAD = {
+    "gemma": 5,    # <start_of_turn>{role}\n ... <end_of_turn>\n
+    "llama": 5,    # <|start_header_id|>{role}<|end_header_id|>\n\n ... <|eot_id|>
+    "mixtral": 4,  # [INST] ... [/INST]
+}
+DEFAULT_MESSAGE_OVERHEAD = 4
+
+_encoding = None
+_encoding_failed_at = None
+_encoding_lock = threading.Lock()
+
+def get_encoding():
+    """
+    Get the shared tokenizer, loading it on first use.
+
+    The encoding is loaded once per process and shared between threads. If
+    loading fails, None is returned and loading is retried only after
+    ENCODING_RETRY_INTERVAL seconds.
+
+    :return: A tiktoken Encoding, or None if it is unavailable
+    """
+    global _encoding, _encoding_failed_at
+    if _encoding is not None:
+        return _encoding
+
+    with _encoding_lock:
+        if _encoding is not None:
+            return _encoding
+        if _encoding_failed_at is not None and time.monotonic() - _encoding_failed_at < ENCODING_RETRY_INTERVAL:
+            return None
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            _encoding_failed_at = None
+        except Exception as e:
+            logger.error("Error loading %s encoding: %s", ENCODING_NAME, e)
+            _encoding_failed_at = time.monotonic()
+    return _encoding
+
+def _approximate_tokens(text):
+    return (len(text) + FALLBACK_CHARS_PER_TOKEN - 1) // FALLBACK_CHARS_PER_TOKEN
+
 def count_tokens(text, model="gemma-7b-it"):
     """
     Count the number of tokens in the given text for the specified model.
@@ -11,40 +65,66 @@ def count_tokens(text, model="gemma-7b-it"):
     :param model: The model to use for tokenization (default: "gemma-7b-it").
     :return: The number of tokens in the text.
     """
+    encoding = get_encoding()
+    if encoding is None:
+        return _approximate_tokens(text)
+
     try:
-        # For gemma models, we'll use the cl100k_base encoding
-        # This is an approximation, as the exact tokenizer for Gemma might differ
-        encoding = tiktoken.get_encoding("cl100k_base")
-        
         # Encode the text and count the tokens
         token_count = len(encoding.encode(text))
-        
-        logger.debug(f"Token count for '{text[:20]}...': {token_count}")
+
+        logger.debug("Token count for '%s...': %d", text[:20], token_count)
         return token_count
-    
+
     except Exception as e:
-        logger.error(f"Error counting tokens: {str(e)}")
-        # Return a default value or raise the exception
-        return 0  # or you could re-raise the exception: raise
+        logger.error("Error counting tokens: %s", e)
+        return _approximate_tokens(text)
 
-def estimate_tokens_from_messages(messages):
+def get_message_overhead(model=None):
+    """
+    Get the number of tokens a model's chat template adds to each message.
+
+    :param model: The model name, or None for a generic estimate
+    :return: The per-message overhead in tokens
+    """
+    if model:
+        for family, overhead in MESSAGE_OVERHEAD.items():
+            if model.startswith(family):
+                return overhead
+    return DEFAULT_MESSAGE_OVERHEAD
+
+def estimate_tokens_from_messages(messages, model=None):
     """
     Estimate the total number of tokens in a list of messages.
 
+    Messages that already carry a cached "tokens" count are not tokenized
+    again; the remaining contents are encoded in a single batch.
+
     :param messages: A list of message dictionaries, each containing 'role' and 'content'.
+    :param model: Optional. The model the messages are for, used for the per-message overhead.
     :return: The estimated total number of tokens.
     """
-    total_tokens = 0
+    overhead = get_message_overhead(model)
+    total_tokens = overhead * len(messages)
+
+    uncounted = []
     for message in messages:
-        # Count tokens in the content
-        content_tokens = count_tokens(message['content'])
-        
-        # Add tokens for role (approximation)
-        role_tokens = 1  # Assuming 1 token for the role
-        
-        total_tokens += content_tokens + role_tokens
-    
-    logger.info(f"Estimated total tokens for messages: {total_tokens}")
+        if "tokens" in message:
+            total_tokens += message["tokens"]
+        else:
+            uncounted.append(message['content'])
+
+    if uncounted:
+        encoding = get_encoding()
+        try:
+            if encoding is None:
+                raise RuntimeError(f"{ENCODING_NAME} encoding is unavailable")
+            total_tokens += sum(len(tokens) for tokens in encoding.encode_batch(uncounted))
+        except Exception as e:
+            logger.debug("Falling back to approximate token counts: %s", e)
+            total_tokens += sum(_approximate_tokens(text) for text in uncounted)
+
+    logger.debug("Estimated total tokens for messages: %d", total_tokens)
     return total_tokens
 
 # Example usage and testing
@@ -59,5 +139,5 @@ if __name__ == "__main__":
         {"role": "assistant", "content": "The capital of France is Paris."},
         {"role": "user", "content": "Can you tell me more about Paris?"}
     ]
-    estimated_tokens = estimate_tokens_from_messages(test_messages)
+    estimated_tokens = estimate_tokens_from_messages(test_messages, "llama-3.1-8b-instant")
     print(f"Estimated tokens for test messages: {estimated_tokens}")
\ No newline at end of file
@@ -0,0 +1,369 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from .logging_config import get_logger
+from .usage_tracking import USAGE_FILE, flush_usage, load_usage_data
+
+logger = get_logger(__name__)
+
+LEDGER_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'usage_ledger.db')
+
+# Seconds between background writes of buffered records
+FLUSH_INTERVAL = 2
+
+# Buffered records that trigger an immediate write
+FLUSH_BATCH_SIZE = 500
+
+# Statuses that do not count as failed requests in rollups
+SUCCESS_STATUSES = ("ok", "imported", "cache_hit")
+
+# Bucket sizes, in seconds, for rollup queries
+ROLLUP_GRANULARITIES = {
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    total_tokens INTEGER NOT NULL DEFAULT 0,
+    latency REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_requests_model_ts ON requests (model, ts);
+CREATE INDEX IF NOT EXISTS idx_requests_ts ON requests (ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = ("id", "ts", "model", "prompt_tokens", "completion_tokens", "total_tokens", "latency", "status")
+
+class UsageLedger:
+    """
+    Per-request usage ledger stored in SQLite.
+
+    Records are buffered in memory and written in batches by a background
+    thread, so recording a request never waits for disk. Queries flush the
+    buffer first and are answered from the (model, ts) and ts indexes.
+    """
+
+    def __init__(self, path=LEDGER_FILE, flush_interval=FLUSH_INTERVAL, import_json=True):
+        """
+        :param path: The SQLite database file
+        :param flush_interval: Seconds between background writes
+        :param import_json: Whether to import usage_stats.json the first time the ledger is opened
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        if import_json:
+            self.import_usage_json()
+
+    def record(self, model, prompt_tokens=0, completion_tokens=0, latency=None, status="ok", ts=None):
+        """
+        Record one request. The row is written on the next background flush.
+
+        :param model: The model the request was sent to
+        :param prompt_tokens: Tokens in the prompt
+        :param completion_tokens: Tokens in the completion
+        :param latency: Seconds from sending the request to the end of the response
+        :param status: "ok", "cache_hit" or a short description of the failure
+        :param ts: Optional. Unix timestamp of the request, defaults to now.
+        """
+        ts = time.time() if ts is None else ts
+        row = (ts, model, prompt_tokens, completion_tokens, prompt_tokens + completion_tokens, latency, status)
+        with self._pending_lock:
+            self._pending.append(row)
+            pending = len(self._pending)
+        self.start()
+        if pending >= FLUSH_BATCH_SIZE:
+            self._wake_event.set()
+
+    def flush(self):
+        """
+        Write all buffered records in a single transaction.
+        """
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        with self._db_lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO requests (ts, model, prompt_tokens, completion_tokens, total_tokens, latency, status) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logger.error("Error writing %d usage records: %s", len(rows), e)
+                with self._pending_lock:
+                    self._pending[:0] = rows
+
+    def query_range(self, start=None, end=None, model=None, limit=None):
+        """
+        Get the individual requests recorded in a time range.
+
+        :param start: Optional. Unix timestamp of the start of the range (inclusive).
+        :param end: Optional. Unix timestamp of the end of the range (exclusive).
+        :param model: Optional. If provided, only return requests for this model.
+        :param limit: Optional. Maximum number of rows to return, newest first.
+        :return: A list of dictionaries, one per request
+        """
+        where, params = self._where(start, end, model)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM requests{where} ORDER BY ts DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._query(sql, params)]
+
+    def rollup(self, granularity="hour", start=None, end=None, model=None):
+        """
+        Aggregate requests into fixed-size time buckets per model.
+
+        :param granularity: "minute", "hour" or "day" (UTC days)
+        :param start: Optional. Unix timestamp of the start of the range (inclusive).
+        :param end: Optional. Unix timestamp of the end of the range (exclusive).
+        :param model: Optional. If provided, only aggregate requests for this model.
+        :return: A list of dictionaries ordered by bucket, then model
+        """
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        size = ROLLUP_GRANULARITIES[granularity]
+        where, params = self._where(start, end, model)
+        sql = (
+            f"SELECT CAST(ts / {size} AS INTEGER) * {size} AS bucket, model, "
+            "COUNT(*) AS requests, SUM(prompt_tokens) AS prompt_tokens, "
+            "SUM(completion_tokens) AS completion_tokens, SUM(total_tokens) AS total_tokens, "
+            "AVG(latency) AS avg_latency, SUM(status = 'cache_hit') AS cache_hits, "
+            f"SUM(status NOT IN ({', '.join('?' for _ in SUCCESS_STATUSES)})) AS failures "
+            f"FROM requests{where} GROUP BY bucket, model ORDER BY bucket, model"
+        )
+        return [dict(row) for row in self._query(sql, list(SUCCESS_STATUSES) + params)]
+
+    def prune(self, before):
+        """
+        Delete the requests recorded before a point in time.
+
+        :param before: Unix timestamp; older records are deleted
+        :return: The number of records deleted
+        """
+        self.flush()
+        with self._db_lock, self._conn:
+            return self._conn.execute("DELETE FROM requests WHERE ts < ?", (before,)).rowcount
+
+    def import_usage_json(self, path=USAGE_FILE, force=False, recorded=()):
+        """
+        Import the daily totals from usage_stats.json, once.
+
+        Each model/day total becomes a single row at UTC midnight of its date,
+        so rollup("day") puts it on the same day, with status "imported". Only
+        total_tokens is known for these rows. Today's total is imported as it
+        stands now, and the import time is kept as a watermark in the meta
+        table: the totals cover usage before it, requests from then on are
+        recorded individually.
+
+        :param path: The JSON usage file to import
+        :param force: Import again even if an import was already recorded
+        :param recorded: Requests already counted in the JSON totals that are recorded individually as well,
+                         as (model, total tokens, ts) tuples. Their tokens are taken off the imported totals.
+        :return: The number of rows imported
+        """
+        with self._db_lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+        if done and not force:
+            return 0
+
+        watermark = time.time()
+        usage_data = load_usage_data(path)
+        # usage_stats.json is keyed by local dates
+        for model, tokens, ts in recorded:
+            date = datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+            days = usage_data.get(model, {})
+            if date in days:
+                days[date] -= tokens
+        rows = []
+        for model, days in usage_data.items():
+            for date, tokens in days.items():
+                if tokens <= 0:
+                    continue
+                try:
+                    ts = datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+                except ValueError:
+                    logger.warning("Skipping usage entry with invalid date %r for %s", date, model)
+                    continue
+                rows.append((ts, model, 0, 0, tokens, None, "imported"))
+
+        with self._db_lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO requests (ts, model, prompt_tokens, completion_tokens, total_tokens, latency, status) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [('json_imported', datetime.fromtimestamp(watermark).isoformat()),
+                     ('json_watermark', repr(watermark))]
+                )
+        logger.info("Imported %d usage entries from %s", len(rows), path)
+        return len(rows)
+
+    def start(self):
+        """
+        Start the background writer thread if it is not running yet.
+        """
+        if self._thread is not None:
+            return
+        with self._pending_lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="usage-ledger", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Stop the writer thread, write pending records and close the database.
+        """
+        thread = self._thread
+        if thread is not None:
+            self._stop_event.set()
+            self._wake_event.set()
+            thread.join()
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.flush_interval)
+            self._wake_event.clear()
+            self.flush()
+
+    def _query(self, sql, params):
+        self.flush()
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _where(start, end, model):
+        clauses, params = [], []
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+_ledger = None
+_ledger_lock = threading.Lock()
+# Requests recorded before the ledger was opened, as record() arguments
+_queued = []
+_queued_lock = threading.Lock()
+
+def get_ledger():
+    """
+    Get the application's usage ledger, opening it on first use.
+
+    Requests queued by record_request() before then are recorded once it is
+    open. Their tokens are already in usage_stats.json, so they are left out
+    of the totals imported from it.
+    """
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                ledger = UsageLedger(import_json=False)
+                # Put every update so far on disk, so the file matches the queue
+                flush_usage()
+                with _queued_lock:
+                    counted = [(args[0], args[1] + args[2], args[5]) for args in _queued if args[4] == "ok"]
+                ledger.import_usage_json(recorded=counted)
+                with _queued_lock:
+                    for args in _queued:
+                        ledger.record(*args)
+                    _queued.clear()
+                    _ledger = ledger
+    return _ledger
+
+def record_request(model, prompt_tokens=0, completion_tokens=0, latency=None, status="ok"):
+    """
+    Record one request in the usage ledger.
+
+    Never opens the ledger: it is called on the event loop, which must not
+    wait for the database or the usage_stats.json import, so until warm-up
+    has opened it requests are queued. Failures are logged and otherwise
+    ignored, so the request path never fails because of bookkeeping.
+    """
+    with _queued_lock:
+        ledger = _ledger
+        if ledger is None:
+            _queued.append((model, prompt_tokens, completion_tokens, latency, status, time.time()))
+            return
+    try:
+        ledger.record(model, prompt_tokens, completion_tokens, latency, status)
+    except (sqlite3.Error, OSError) as e:
+        logger.error("Error recording request in usage ledger: %s", e)
+
+def shutdown_ledger():
+    """
+    Write pending ledger records and close the database.
+
+    The ledger is opened first if requests are still queued, so they are not lost.
+    """
+    global _ledger
+    if _queued:
+        try:
+            get_ledger()
+        except (sqlite3.Error, OSError) as e:
+            logger.error("Error opening usage ledger for %d queued records: %s", len(_queued), e)
+    with _ledger_lock:
+        if _ledger is not None:
+            _ledger.close()
+            _ledger = None
+
+atexit.register(shutdown_ledger)
+
+# Example usage and testing
+if __name__ == "__main__":
+    ledger = get_ledger()
+    for i in range(5):
+        ledger.record("gemma-7b-it", prompt_tokens=20 + i, completion_tokens=50, latency=0.4 + i / 10)
+    ledger.record("llama3-8b-8192", prompt_tokens=12, completion_tokens=0, latency=1.2, status="http_429")
+
+    print("Last hour by minute:", ledger.rollup("minute", start=time.time() - 3600))
+    print("Daily totals:", ledger.rollup("day"))
+    print("Recent gemma-7b-it requests:", ledger.query_range(model="gemma-7b-it", limit=3))
+
+    shutdown_ledger()
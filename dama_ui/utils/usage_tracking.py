@@ -1,5 +1,8 @@
+import atexit
 import json
 import os
+import tempfile
+import threading
 from datetime import datetime
 from .logging_config import get_logger
 
@@ -7,47 +10,156 @@ logger = get_logger(__name__)
 
 USAGE_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'usage_stats.json')
 
-def load_usage_data():
+# Seconds between background flushes of pending usage to disk
+FLUSH_INTERVAL = 5
+
+def load_usage_data(path=USAGE_FILE):
     """
     Load usage data from the JSON file.
     """
-    if os.path.exists(USAGE_FILE):
+    if os.path.exists(path):
         try:
-            with open(USAGE_FILE, 'r') as f:
+            with open(path, 'r') as f:
                 return json.load(f)
         except json.JSONDecodeError:
-            logger.error(f"Error decoding JSON from {USAGE_FILE}. Starting with empty usage data.")
+            logger.error("Error decoding JSON from %s. Starting with empty usage data.", path)
     return {}
 
-def save_usage_data(data):
+def save_usage_data(data, path=USAGE_FILE):
     """
     Save usage data to the JSON file.
+
+    The data is written to a temporary file in the same directory which then
+    atomically replaces the old file, so readers never see a partial write.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.usage_stats.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class UsageAggregator:
+    """
+    In-memory, thread-safe usage statistics with write-behind persistence.
+
+    Increments only touch memory. A background thread writes the totals to
+    disk every `flush_interval` seconds when something changed, and a final
+    flush happens on shutdown.
     """
-    os.makedirs(os.path.dirname(USAGE_FILE), exist_ok=True)
-    with open(USAGE_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+
+    def __init__(self, path=USAGE_FILE, flush_interval=FLUSH_INTERVAL):
+        """
+        :param path: The JSON file usage is persisted to
+        :param flush_interval: Seconds between background flushes
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self._data = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _ensure_loaded(self):
+        # Must be called with self._lock held
+        if self._data is None:
+            self._data = load_usage_data(self.path)
+
+    def add(self, model, tokens_used, date=None):
+        """
+        Add tokens to a model's total for a day.
+
+        :param model: The name of the model used.
+        :param tokens_used: The number of tokens to add.
+        :param date: Optional. The day to add to (format: 'YYYY-MM-DD'), defaults to today.
+        """
+        date = date or datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            self._ensure_loaded()
+            model_usage = self._data.setdefault(model, {})
+            model_usage[date] = model_usage.get(date, 0) + tokens_used
+            self._dirty = True
+        self.start()
+
+    def read(self, reader):
+        """
+        Run `reader` on the current usage data while holding the lock.
+
+        :param reader: A function taking the usage dictionary; it must not keep a reference to it
+        :return: Whatever `reader` returns
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return reader(self._data)
+
+    def flush(self):
+        """
+        Write pending usage to disk if anything changed since the last flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = {model: dict(days) for model, days in self._data.items()}
+                self._dirty = False
+            try:
+                save_usage_data(snapshot, self.path)
+            except OSError as e:
+                logger.error("Error saving usage data to %s: %s", self.path, e)
+                with self._lock:
+                    self._dirty = True
+
+    def start(self):
+        """
+        Start the background flush thread if it is not running yet.
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and flush whatever is still pending.
+        """
+        thread = self._thread
+        if thread is not None:
+            self._stop_event.set()
+            thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+_aggregator = UsageAggregator()
 
 def update_usage(model, tokens_used):
     """
     Update the usage statistics for a given model.
 
+    Only the in-memory totals are changed here; they reach disk on the next
+    background flush.
+
     :param model: The name of the model used.
     :param tokens_used: The number of tokens used in this request.
     """
-    usage_data = load_usage_data()
-    
     today = datetime.now().strftime('%Y-%m-%d')
-    
-    if model not in usage_data:
-        usage_data[model] = {}
-    
-    if today not in usage_data[model]:
-        usage_data[model][today] = 0
-    
-    usage_data[model][today] += tokens_used
-    
-    save_usage_data(usage_data)
-    logger.info(f"Updated usage for {model}: {tokens_used} tokens on {today}")
+    _aggregator.add(model, tokens_used, today)
+    logger.info("Updated usage for %s: %s tokens on %s", model, tokens_used, today)
 
 def get_usage(model=None, date=None):
     """
@@ -57,19 +169,20 @@ def get_usage(model=None, date=None):
     :param date: Optional. If provided, return usage for this specific date (format: 'YYYY-MM-DD').
     :return: A dictionary of usage statistics.
     """
-    usage_data = load_usage_data()
-    
-    if model:
-        if model not in usage_data:
-            return {model: {}}
+    def reader(usage_data):
+        if model:
+            if model not in usage_data:
+                return {model: {}}
+            if date:
+                return {model: {date: usage_data[model].get(date, 0)}}
+            return {model: dict(usage_data[model])}
+
         if date:
-            return {model: {date: usage_data[model].get(date, 0)}}
-        return {model: usage_data[model]}
-    
-    if date:
-        return {m: {date: data.get(date, 0)} for m, data in usage_data.items()}
-    
-    return usage_data
+            return {m: {date: data.get(date, 0)} for m, data in usage_data.items()}
+
+        return {m: dict(data) for m, data in usage_data.items()}
+
+    return _aggregator.read(reader)
 
 def get_total_usage(model=None):
     """
@@ -78,14 +191,29 @@ def get_total_usage(model=None):
     :param model: Optional. If provided, return total usage for this specific model.
     :return: Total token usage.
     """
-    usage_data = load_usage_data()
-    
-    if model:
-        if model not in usage_data:
-            return 0
-        return sum(usage_data[model].values())
-    
-    return sum(sum(data.values()) for data in usage_data.values())
+    def reader(usage_data):
+        if model:
+            if model not in usage_data:
+                return 0
+            return sum(usage_data[model].values())
+
+        return sum(sum(data.values()) for data in usage_data.values())
+
+    return _aggregator.read(reader)
+
+def flush_usage():
+    """
+    Write pending usage statistics to disk now.
+    """
+    _aggregator.flush()
+
+def shutdown_usage():
+    """
+    Stop background flushing and persist any pending usage statistics.
+    """
+    _aggregator.stop()
+
+atexit.register(shutdown_usage)
 
 # Example usage and testing
 if __name__ == "__main__":
@@ -97,4 +225,6 @@ if __name__ == "__main__":
     print("Usage for gemma-7b-it:", get_usage("gemma-7b-it"))
     print("Usage for today:", get_usage(date=datetime.now().strftime('%Y-%m-%d')))
     print("Total usage:", get_total_usage())
-    print("Total usage for gemma-7b-it:", get_total_usage("gemma-7b-it"))
\ No newline at end of file
+    print("Total usage for gemma-7b-it:", get_total_usage("gemma-7b-it"))
+
+    shutdown_usage()
\ No newline at end of file